@@ -1,4 +1,5 @@
 from flask import Flask, render_template, request
+from config import Config
 from .get_solution import get_llm_solution
 
 def create_app():
@@ -21,7 +22,12 @@ def create_app():
         if not clue:
             return render_template('index.html', error="Please enter a clue.")
         
-        solution = get_llm_solution(clue)
+        solution = get_llm_solution(clue, {})
         return render_template('index.html', clue=clue, solution=solution)
 
-    return app
\ No newline at end of file
+    # Build the solver in the background so the first requests are not held up by it
+    if Config.WARMUP_ON_BOOT:
+        from .warmup import start_warmup
+        start_warmup()
+
+    return app
@@ -1,7 +1,15 @@
-from flask import Flask, Blueprint, request, jsonify
-from app.get_solution import get_llm_solution
+import json
+import queue
+import threading
+import uuid
+
+from flask import Flask, Blueprint, Response, request, jsonify
+from app.get_solution import get_llm_solution, get_langgraph_solver
 from app.mock_state import get_mock_ui_response
-from app.state_transformer import transform_state_to_ui_format
+from app.state_transformer import transform_state_to_ui_format, IncrementalUITransformer
+from app.warmup import readiness, start_warmup
+from app.budget import parse_budget
+from app.cancellation import run_cancellable, cancel_solve, client_disconnected
 
 # Create a blueprint
 api_blueprint = Blueprint('api', __name__)
@@ -15,9 +23,15 @@ def submit_clue():
     clue = data.get('clue')
     length = data.get('length', None)
     use_mock = data.get('mock', False)  # Add mock parameter
+    solve_id = data.get('solve_id') or uuid.uuid4().hex  # Resubmit with the same ID to resume an interrupted solve
     
     if not clue:
         return jsonify({'error': 'No clue provided'}), 400
+
+    try:
+        budget = parse_budget(data.get('budget'))  # Optional per-request limits on time, LLM calls and tokens
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     if use_mock:
         # Use mock state for UI testing
@@ -27,46 +41,109 @@ def submit_clue():
             'solution': solution
         }), 200
     else:
-        # Use real LLM solver
-        raw_solution = get_llm_solution(clue, {}, length)
-    
-        # Handle both structured responses and error responses
-        if isinstance(raw_solution, dict):
-            if 'error' in raw_solution:
-                # Return error response
-                return jsonify(raw_solution), 500
-            else:
-                # Check if this is already a UI-formatted response or raw state
-                if 'attempted_solutions' in raw_solution and 'complete_solution' in raw_solution:
-                    # Already formatted for UI
-                    solution = raw_solution
-                else:
-                    # Transform raw state to UI format
-                    solution = transform_state_to_ui_format(raw_solution, clue)
-                
-                return jsonify({
-                    'clue': clue,
-                    'solution': solution
-                }), 200
+        # Use real LLM solver, cancelled if the client disconnects or the solve is cancelled by id
+        environ = request.environ
+        raw_solution = run_cancellable(
+            lambda: get_llm_solution(clue, {}, length, solve_id=solve_id, budget=budget),
+            solve_id,
+            is_disconnected=lambda: client_disconnected(environ)
+        )
+        body, status = _solution_response(raw_solution, clue, solve_id)
+        return jsonify(body), status
+
+def _solution_response(raw_solution, clue, solve_id):
+    """The response body and status code for a finished solve."""
+    # Handle both structured responses and error responses
+    if isinstance(raw_solution, dict):
+        if 'error' in raw_solution:
+            # Return error response
+            return raw_solution, 499 if raw_solution.get('error_code') == 'CANCELLED' else 500
         else:
-            # Fallback for string responses (legacy support)
-            return jsonify({
-                'clue': clue, 
-                'solution': {
-                    'attempted_solutions': [],
-                    'complete_solution': {
-                        'solution': str(raw_solution),
-                        'definition': 'Legacy response format',
-                        'wordplay_components': [
-                            {
-                                'indicator': 'legacy',
-                                'wordplay_type': 'other',
-                                'target': 'unstructured'
-                            }
-                        ]
-                    }
+            # Check if this is already a UI-formatted response or raw state
+            if 'attempted_solutions' in raw_solution and 'complete_solution' in raw_solution:
+                # Already formatted for UI
+                solution = raw_solution
+            else:
+                # Transform raw state to UI format
+                solution = transform_state_to_ui_format(raw_solution, clue)
+            
+            return {
+                'clue': clue,
+                'solve_id': solve_id,
+                'solution': solution,
+                'confidence': raw_solution.get('confidence'),
+                'stop_reason': raw_solution.get('stop_reason'),
+                'budget': raw_solution.get('budget')
+            }, 200
+    else:
+        # Fallback for string responses (legacy support)
+        return {
+            'clue': clue, 
+            'solution': {
+                'attempted_solutions': [],
+                'complete_solution': {
+                    'solution': str(raw_solution),
+                    'definition': 'Legacy response format',
+                    'wordplay_components': [
+                        {
+                            'indicator': 'legacy',
+                            'wordplay_type': 'other',
+                            'target': 'unstructured'
+                        }
+                    ]
                 }
-            }), 200
+            }
+        }, 200
+
+@api_blueprint.route('/api/submit_clue_stream', methods=['POST'])
+def submit_clue_stream():
+    """
+    Solve a clue like submit_clue, streaming its progress as newline-delimited JSON. Each line is either
+    {"solve_id", "delta"}, the changes to the UI response after a step of the LangGraph solver (see
+    IncrementalUITransformer, and apply_ui_delta for how to apply them), or, last, {"status", "response"}, what
+    submit_clue would have returned. Closing the stream cancels the solve.
+    """
+    data = request.json
+    if data is None:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+    clue = data.get('clue')
+    length = data.get('length', None)
+    solve_id = data.get('solve_id') or uuid.uuid4().hex
+    if not clue:
+        return jsonify({'error': 'No clue provided'}), 400
+    try:
+        budget = parse_budget(data.get('budget'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    updates = queue.Queue()
+    transformer = IncrementalUITransformer(clue)
+
+    def solve():
+        try:
+            raw_solution = run_cancellable(
+                lambda: get_llm_solution(clue, {}, length, solve_id=solve_id, budget=budget,
+                                         on_progress=lambda state: updates.put({'solve_id': solve_id, 'delta': transformer.update(state)})),
+                solve_id
+            )
+            body, status = _solution_response(raw_solution, clue, solve_id)
+        except Exception as e:
+            body, status = {'error': f'Unexpected error: {e}', 'error_code': 'UNKNOWN'}, 500
+        updates.put({'status': status, 'response': body})
+
+    threading.Thread(target=solve, name=f"stream-{solve_id[:8]}", daemon=True).start()
+
+    def stream():
+        try:
+            while True:
+                update = updates.get()
+                yield json.dumps(update, default=str) + '\n'
+                if 'response' in update:
+                    return
+        finally:
+            cancel_solve(solve_id, 'client disconnected')  # No-op once the solve has finished
+
+    return Response(stream(), mimetype='application/x-ndjson')
 
 @api_blueprint.route('/api/submit_clue_mock', methods=['POST'])
 def submit_clue_mock():
@@ -82,4 +159,38 @@ def submit_clue_mock():
 
 @api_blueprint.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy'}), 200
\ No newline at end of file
+    return jsonify({'status': 'healthy'}), 200
+
+@api_blueprint.route('/api/ready', methods=['GET'])
+def ready_check():
+    """Readiness probe: reports whether the solver and its supporting components have warmed up."""
+    start_warmup()  # No-op if already running, but covers workers forked from a preloaded master
+    status = readiness()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@api_blueprint.route('/api/solves', methods=['GET'])
+def list_solves():
+    """Recent checkpointed solves and their status (empty unless CHECKPOINT_DB is set)."""
+    solver = get_langgraph_solver()
+    if solver is None or solver.checkpointer is None:
+        return jsonify({'solves': []}), 200
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'solves': solver.checkpointer.list_solves(limit)}), 200
+
+@api_blueprint.route('/api/solves/<solve_id>/cancel', methods=['POST'])
+def cancel(solve_id):
+    """Cancel a running solve, which stops at its next step. Only reaches solves running in this worker process."""
+    if not cancel_solve(solve_id):
+        return jsonify({'error': f'No running solve {solve_id}'}), 404
+    return jsonify({'solve_id': solve_id, 'cancelled': True}), 200
+
+@api_blueprint.route('/api/solves/<solve_id>/history', methods=['GET'])
+def solve_history(solve_id):
+    """Checkpoint history of one solve, newest first."""
+    solver = get_langgraph_solver()
+    if solver is None or solver.checkpointer is None:
+        return jsonify({'error': 'Checkpointing is not enabled'}), 404
+    history = solver.solve_history(solve_id)
+    if not history:
+        return jsonify({'error': f'No checkpoints for solve {solve_id}'}), 404
+    return jsonify({'solve_id': solve_id, 'history': history}), 200
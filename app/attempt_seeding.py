@@ -0,0 +1,66 @@
+"""
+Seeds each new attempt with the analyses of the previous attempt that its failure does not contradict.
+An attempt fails in one of a few ways, each implicating part of its analysis:
+- it proposed no answer: no definition was found, so the components at either end of the clue (where the
+  definition sits) are redone
+- its answer has the wrong length or letters, or is not in the dictionary: the answer is the definition's
+  result, so the definition is redone
+An indicator and its target stand or fall together, and an indicator left without a target is redone.
+
+Every other component is carried over, so the next attempt only analyses the implicated words (the span
+scheduler and the batched analysis only see the words left unresolved), with the rejected answers in its prompts.
+"""
+from typing import Set
+
+from .state import Attempt, CurrentAttempt, SolverState
+
+
+def implicated_components(state: SolverState, attempt: Attempt) -> Set[int]:
+    """Ids of the attempt's components implicated in its failure."""
+    components = [state["components"][cid] for cid in attempt.component_ids]
+    if attempt.solution and attempt.definition_part:
+        implicated = {c.id for c in components if c.role == "definition"}
+    else:
+        last = len(state["clue_words"]) - 1
+        implicated = {c.id for c in components if c.start_pos == 0 or c.end_pos == last}
+
+    targeted = {c.targeted_by for c in components if c.targeted_by is not None}
+    for component in components:
+        if component.role == "indicator" and component.id not in targeted:
+            implicated.add(component.id)
+    # Indicators and their targets together
+    for component in components:
+        if component.targeted_by is not None and (component.id in implicated or component.targeted_by in implicated):
+            implicated.update((component.id, component.targeted_by))
+    return implicated
+
+
+def seed_attempt(state: SolverState, previous: CurrentAttempt) -> CurrentAttempt:
+    """A new attempt holding the previous attempt's components that are not implicated in its failure."""
+    clue_words = state["clue_words"]
+    attempt = Attempt(clue_with_synonyms=list(clue_words))
+    seeded = CurrentAttempt(
+        solution_attempt=attempt,
+        current_component=None,
+        remaining_word_idxs=list(range(len(clue_words))),
+        possible_target_idxs=list(range(len(clue_words))),
+    )
+    if previous is None or previous.solution_attempt is None:
+        return seeded
+
+    implicated = implicated_components(state, previous.solution_attempt)
+    for cid in previous.solution_attempt.component_ids:
+        if cid in implicated:
+            continue
+        component = state["components"][cid]
+        attempt.component_ids.append(cid)
+        if component.role == "synonym" and component.result:
+            attempt.clue_with_synonyms[component.start_pos] = component.result.upper()
+            for idx in range(component.start_pos + 1, component.end_pos + 1):
+                attempt.clue_with_synonyms[idx] = ""
+        for idx in range(component.start_pos, component.end_pos + 1):
+            if idx in seeded.remaining_word_idxs:
+                seeded.remaining_word_idxs.remove(idx)
+            if component.role != "synonym" and idx in seeded.possible_target_idxs:
+                seeded.possible_target_idxs.remove(idx)
+    return seeded
@@ -0,0 +1,70 @@
+"""
+Per-solve budgets for wall-clock time, LLM calls and tokens.
+A solve's Budget lives in its state, so it survives checkpointing. LLM calls are charged to it as they return,
+and the solver checks it at each node boundary. Once a limit has run out, no more analysis is started and the
+solve finishes with its best candidate so far (see convergence.best_candidate).
+"""
+import time
+from typing import Dict, Optional
+
+from config import Config
+from .state import Budget
+
+BUDGET_FIELDS = ("max_seconds", "max_llm_calls", "max_tokens")
+
+
+def new_budget(max_seconds: Optional[float] = None, max_llm_calls: Optional[int] = None,
+               max_tokens: Optional[int] = None) -> Budget:
+    """A budget starting now, with Config defaults for any limit not given. A limit of 0 means no limit."""
+    max_seconds = Config.SOLVE_MAX_SECONDS if max_seconds is None else max_seconds
+    max_llm_calls = Config.SOLVE_MAX_LLM_CALLS if max_llm_calls is None else max_llm_calls
+    max_tokens = Config.SOLVE_MAX_TOKENS if max_tokens is None else max_tokens
+    return Budget(
+        deadline=time.time() + max_seconds if max_seconds else None,
+        max_llm_calls=int(max_llm_calls) or None,
+        max_tokens=int(max_tokens) or None,
+    )
+
+
+def parse_budget(data: Optional[Dict]) -> Dict:
+    """
+    Validate budget limits from a request, e.g. {"max_seconds": 20, "max_tokens": 30000}.
+    Returns the limits as keyword arguments for new_budget, or raises ValueError.
+    """
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError("budget must be an object")
+    unknown = set(data) - set(BUDGET_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown budget fields: {', '.join(sorted(unknown))}")
+    limits = {}
+    for name, value in data.items():
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"{name} must be a non-negative number")
+        limits[name] = value
+    return limits
+
+
+def charge(budget: Optional[Budget], tokens: int) -> None:
+    """Record one LLM call and its tokens."""
+    if budget is None:
+        return
+    budget.llm_calls += 1
+    budget.tokens += tokens
+
+
+def check(budget: Optional[Budget]) -> str:
+    """The limit that has run out, or "" if there is budget left. The first limit hit is kept."""
+    if budget is None:
+        return ""
+    if not budget.exhausted:
+        if budget.deadline is not None and time.time() >= budget.deadline:
+            budget.exhausted = "deadline"
+        elif budget.max_llm_calls is not None and budget.llm_calls >= budget.max_llm_calls:
+            budget.exhausted = "llm_calls"
+        elif budget.max_tokens is not None and budget.tokens >= budget.max_tokens:
+            budget.exhausted = "tokens"
+    return budget.exhausted
@@ -0,0 +1,166 @@
+"""
+Cooperative cancellation and timeouts for solves.
+Each solve runs with a CancelToken in a context variable. A solve can be cancelled in two ways: by a cancel
+request for its solve_id, or by the API noticing that the client has disconnected. The solver stops at the next
+node boundary. In-flight LLM and tool calls are run through call_with_timeout, which stops waiting for them as soon
+as the solve is cancelled or the call's timeout passes. Python cannot kill a thread, so the abandoned call
+finishes in the background, but it no longer holds up the worker or the solve.
+"""
+import contextvars
+import select
+import socket
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Optional, Tuple
+
+from config import Config
+
+
+class SolveCancelled(Exception):
+    """Raised in a solve that has been cancelled."""
+
+
+class CancelToken:
+    """Cancellation flag shared by a solve and whoever may cancel it. A child token is also cancelled with its parent."""
+
+    def __init__(self, parent: Optional["CancelToken"] = None):
+        self.parent = parent
+        self._event = threading.Event()
+        self._reason = ""
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def reason(self) -> str:
+        if self._event.is_set():
+            return self._reason
+        return self.parent.reason if self.parent is not None else ""
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise SolveCancelled(self.reason)
+
+
+_current: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar("cancel_token", default=None)
+_active: Dict[str, CancelToken] = {}
+_active_lock = threading.Lock()
+
+
+def raise_if_cancelled() -> None:
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def cancel_solve(solve_id: str, reason: str = "cancelled") -> bool:
+    """Cancel a running solve. Returns False if no solve with that id is running in this process."""
+    with _active_lock:
+        token = _active.get(solve_id)
+    if token is None:
+        return False
+    token.cancel(reason)
+    return True
+
+
+def _start(func: Callable, name: str) -> Future:
+    """Run func in a daemon thread, in a copy of the current context."""
+    future: Future = Future()
+    ctx = contextvars.copy_context()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(ctx.run(func))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+
+def call_with_timeout(func: Callable, timeout: Optional[float], name: str = "call"):
+    """
+    Run func, giving up when the timeout (seconds, 0 or None for none) passes or the current solve is cancelled.
+
+    :raises TimeoutError: If func did not finish in time.
+    :raises SolveCancelled: If the solve was cancelled while func was running.
+    """
+    token = _current.get()
+    if not timeout and token is None:
+        return func()
+    raise_if_cancelled()
+
+    future = _start(func, name)
+    remaining = timeout or None
+    while True:
+        wait = Config.CANCEL_POLL_SECONDS if remaining is None else min(Config.CANCEL_POLL_SECONDS, remaining)
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeout:
+            pass
+        raise_if_cancelled()
+        if remaining is not None:
+            remaining -= wait
+            if remaining <= 0:
+                raise TimeoutError(f"{name} timed out after {timeout}s")
+
+
+def start_cancellable(func: Callable, name: str) -> Tuple[Future, CancelToken]:
+    """
+    Start func in its own thread under a new CancelToken, a child of the current solve's token if there is one.
+    Cancelling the returned token stops just this run, e.g. the loser of a race.
+    """
+    token = CancelToken(parent=_current.get())
+
+    def run():
+        _current.set(token)
+        return func()
+
+    return _start(run, name), token
+
+
+def run_cancellable(func: Callable, solve_id: str, is_disconnected: Optional[Callable[[], bool]] = None):
+    """
+    Run a solve under a new CancelToken registered for solve_id, cancelling it if the client disconnects.
+    Returns func's result. If the solve is cancelled, that is whatever func returns after SolveCancelled.
+    """
+    future, token = start_cancellable(func, f"solve-{solve_id[:8]}")
+    with _active_lock:
+        _active[solve_id] = token
+
+    try:
+        while True:
+            try:
+                return future.result(timeout=Config.CANCEL_POLL_SECONDS)
+            except FutureTimeout:
+                pass
+            if not token.cancelled and is_disconnected is not None and is_disconnected():
+                print(f"Client disconnected, cancelling solve {solve_id}")
+                token.cancel("client disconnected")
+    finally:
+        with _active_lock:
+            if _active.get(solve_id) is token:
+                del _active[solve_id]
+
+
+def client_disconnected(environ: Dict) -> bool:
+    """Whether the client of a WSGI request has closed its connection (gunicorn and werkzeug expose the socket)."""
+    sock = environ.get("gunicorn.socket") or environ.get("werkzeug.socket")
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        # A closed connection is readable with nothing to read. Data means a pipelined request, not a disconnect
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b""
+    except ValueError:
+        return False  # TLS sockets cannot peek, so a disconnect cannot be detected
+    except OSError:
+        return True
@@ -0,0 +1,143 @@
+"""
+Optional local checkpointing of solves, so an interrupted solve resumes from its last completed superstep
+instead of paying again for every LLM call already made.
+Checkpoints are kept in SQLite (WAL mode) keyed by solve ID, with commits batched so checkpointing does not
+become the bottleneck, and old solves pruned by age and database size.
+Enabled by setting CHECKPOINT_DB; requires the langgraph-checkpoint-sqlite package.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from config import Config
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:  # Optional dependency
+    SqliteSaver = None
+
+# Types stored in the graph state that the checkpoint serializer may rebuild
+STATE_TYPES = [("app.state", "Component"), ("app.state", "Attempt"), ("app.state", "CurrentAttempt"), ("app.state", "SpanIndex"),
+               ("app.state", "Budget")]
+
+
+class BatchedSqliteSaver(SqliteSaver or object):
+    """SqliteSaver that commits every `batch_size` writes or `flush_seconds`, whichever comes first."""
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int, flush_seconds: float, serde=None):
+        super().__init__(conn, serde=serde)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._last_prune = 0.0
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS solves (thread_id TEXT PRIMARY KEY, clue TEXT, status TEXT, created REAL, updated REAL)"
+        )
+        self.conn.commit()
+        threading.Thread(target=self._flush_loop, name="checkpoint-flush", daemon=True).start()
+
+    @contextmanager
+    def cursor(self, transaction: bool = True):
+        with self.lock:
+            self.setup()
+            cur = self.conn.cursor()
+            try:
+                yield cur
+            finally:
+                if transaction:
+                    self._pending += 1
+                    if self._pending >= self.batch_size or time.monotonic() - self._last_commit >= self.flush_seconds:
+                        self._commit()
+                cur.close()
+
+    def _commit(self) -> None:
+        # Caller holds self.lock
+        self.conn.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def flush(self) -> None:
+        """Commit any batched writes."""
+        with self.lock:
+            if self._pending:
+                self._commit()
+
+    def _flush_loop(self) -> None:
+        # Bounds how long batched writes stay uncommitted, and so how long other workers wait on the write lock
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def record_solve(self, thread_id: str, clue: str, status: str) -> None:
+        """Track a solve's status so solves can be listed and pruned."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO solves (thread_id, clue, status, created, updated) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET status = excluded.status, updated = excluded.updated",
+                (thread_id, clue, status, now, now)
+            )
+            self._commit()
+
+    def list_solves(self, limit: int = 50) -> List[dict]:
+        """Most recently updated solves."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT thread_id, clue, status, created, updated FROM solves ORDER BY updated DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(zip(("solve_id", "clue", "status", "created", "updated"), row)) for row in rows]
+
+    def _delete_threads(self, thread_ids: List[str]) -> None:
+        # Caller holds self.lock
+        for thread_id in thread_ids:
+            for table in ("checkpoints", "writes", "solves"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def _used_bytes(self) -> int:
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def prune(self, max_age_seconds: float, max_bytes: int) -> None:
+        """Delete solves older than max_age_seconds, then the oldest solves until the database is under max_bytes."""
+        with self.lock:
+            self.setup()
+            cutoff = time.time() - max_age_seconds
+            expired = [row[0] for row in self.conn.execute("SELECT thread_id FROM solves WHERE updated < ?", (cutoff,))]
+            self._delete_threads(expired)
+            while self._used_bytes() > max_bytes:
+                oldest = [row[0] for row in self.conn.execute("SELECT thread_id FROM solves ORDER BY updated LIMIT 10")]
+                if not oldest:
+                    break
+                self._delete_threads(oldest)
+            self._commit()
+            self._last_prune = time.monotonic()
+
+    def maybe_prune(self) -> None:
+        """Prune at most once per CHECKPOINT_PRUNE_INTERVAL."""
+        if time.monotonic() - self._last_prune >= Config.CHECKPOINT_PRUNE_INTERVAL:
+            self.prune(Config.CHECKPOINT_MAX_AGE, Config.CHECKPOINT_MAX_BYTES)
+
+
+def create_checkpointer() -> Optional[BatchedSqliteSaver]:
+    """Build the checkpointer from Config, or None if checkpointing is disabled or unavailable."""
+    if not Config.CHECKPOINT_DB:
+        return None
+    if SqliteSaver is None:
+        print("CHECKPOINT_DB is set but langgraph-checkpoint-sqlite is not installed. Checkpointing disabled.")
+        return None
+
+    serde = None
+    try:
+        from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+        serde = JsonPlusSerializer(allowed_msgpack_modules=STATE_TYPES)
+    except TypeError:
+        pass  # Older serializers have no allowlist and accept any type
+
+    conn = sqlite3.connect(Config.CHECKPOINT_DB, check_same_thread=False, timeout=30)
+    return BatchedSqliteSaver(conn, Config.CHECKPOINT_BATCH_SIZE, Config.CHECKPOINT_FLUSH_SECONDS, serde=serde)
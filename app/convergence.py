@@ -0,0 +1,82 @@
+"""
+Decides when to stop making new attempts at a clue, and how confident to be in the answer.
+Every finished attempt is recorded. Solving stops when an attempt is verified ("solved"), when
+Config.CONVERGENCE_AGREEMENT attempts propose the same answer of the right length and letters ("converged"),
+when Config.STALL_ATTEMPTS attempts in a row produce no fitting answer that was not proposed before ("stalled"),
+or when the attempt limit is reached ("max_attempts").
+
+Confidence is the share of finished attempts that proposed the chosen answer, scaled by the evidence for it:
+1.0 when verified against the dictionary, UNVERIFIED_EVIDENCE when it only fits the length and given letters.
+"""
+from collections import Counter
+from typing import Optional
+
+from config import Config
+from .state import SolverState, Attempt
+from .tools import check_given_letters
+
+UNVERIFIED_EVIDENCE = 0.75
+
+
+def fits(state: SolverState, attempt: Optional[Attempt]) -> bool:
+    """Whether the attempt proposes an answer of the target length that matches the given letters."""
+    if not attempt or not attempt.solution:
+        return False
+    if state["target_length"] and len(attempt.solution) != state["target_length"]:
+        return False
+    return check_given_letters(attempt.solution, state["given_letters"])
+
+
+def record_attempt(state: SolverState, attempt: Optional[Attempt], is_new_answer: bool) -> str:
+    """
+    Record a finished attempt, set state["confidence"] and return the reason to stop, or "" to try again.
+    The attempt is the one just verified, is_new_answer whether it proposed an answer that fits and that no earlier
+    attempt proposed. A solve that stops unsolved surfaces its best candidate as the final solution.
+    """
+    state["attempt_count"] += 1
+    state["stalled_attempts"] = 0 if is_new_answer else state["stalled_attempts"] + 1
+
+    if state["solved"]:
+        state["confidence"] = _confidence(state, state["final_solution"].solution, verified=True)
+        return "solved"
+
+    counts = Counter(a.solution for a in state["solution_attempts"] if fits(state, a))
+    if counts:
+        answer, agreeing = counts.most_common(1)[0]
+        state["confidence"] = _confidence(state, answer, verified=False)
+        if agreeing >= Config.CONVERGENCE_AGREEMENT:
+            # Surface the latest attempt at the agreed answer
+            state["final_solution"] = next(a for a in reversed(state["solution_attempts"]) if a.solution == answer)
+            return "converged"
+
+    if state["stalled_attempts"] >= Config.STALL_ATTEMPTS:
+        reason = "stalled"
+    elif state["attempt_count"] >= state["max_attempts"]:
+        reason = "max_attempts"
+    else:
+        return ""
+    state["final_solution"] = best_candidate(state)
+    return reason
+
+
+def best_candidate(state: SolverState) -> Optional[Attempt]:
+    """
+    The best answer so far, for a solve that has to stop early: the most proposed answer that fits, else the
+    latest answer proposed, else the current attempt with whatever partial analysis it has.
+    """
+    counts = Counter(a.solution for a in state["solution_attempts"] if fits(state, a))
+    if counts:
+        answer = counts.most_common(1)[0][0]
+        return next(a for a in reversed(state["solution_attempts"]) if a.solution == answer)
+    if state["solution_attempts"]:
+        return state["solution_attempts"][-1]
+    current = state["current_attempt"]
+    if current and current.solution_attempt and current.solution_attempt.component_ids:
+        return current.solution_attempt
+    return None
+
+
+def _confidence(state: SolverState, answer: str, verified: bool) -> float:
+    agreeing = sum(1 for a in state["solution_attempts"] if a.solution == answer)
+    share = min(1.0, agreeing / max(1, state["attempt_count"]))
+    return round(share * (1.0 if verified else UNVERIFIED_EVIDENCE), 3)
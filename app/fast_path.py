@@ -0,0 +1,215 @@
+"""
+Deterministic solver for clues that can be solved mechanically, raced against the LangGraph solver.
+It handles hidden words, reversals and anagrams whose indicator is in the lexicons (app/data/lexicons.json).
+The definition is taken from either end of the clue, the indicator from next to it, and the fodder from the
+words left over.
+
+Every candidate answer must fit the length and given letters, and must be linked to the definition in the
+dictionary: one's meanings mention the other. There is no local word list, so anagram candidates come from the
+words in the definition's meanings rather than from permutations of the fodder.
+
+Confidence starts at BASE_CONFIDENCE for a linked candidate and is then adjusted:
+- raised when the indicator has only one wordplay type in the lexicons
+- raised when the link holds both ways
+- lowered when several different answers are found
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from .cancellation import call_with_timeout
+from .span_scheduler import get_lexicons, normalise
+from .state import Attempt, SolverStateDict, new_component, new_solver_state, export_state
+from .tools import get_meanings
+from .tool_cache import cached_invoke
+from .utils import check_given_letters
+
+FAST_PATH_TYPES = ("hidden", "reversal", "anagram")
+MAX_DEFINITION_WORDS = 3
+MAX_INDICATOR_WORDS = 3
+MAX_FODDER_WORDS = 4
+
+BASE_CONFIDENCE = 0.6
+UNAMBIGUOUS_INDICATOR_BONUS = 0.2
+TWO_WAY_LINK_BONUS = 0.1
+AMBIGUITY_PENALTY = 0.3  # Applied when different answers are found
+MAX_CONFIDENCE = 0.95
+
+
+@dataclass
+class FastCandidate:
+    """An answer found mechanically, with the spans of clue words that produce it."""
+    answer: str
+    wordplay_type: str
+    indicator: Tuple[int, int]
+    fodder: Tuple[int, int]
+    definition: Tuple[int, int]
+    confidence: float
+
+
+class _Dictionary:
+    """Dictionary meanings looked up once per fast-path run."""
+
+    def __init__(self):
+        self._meanings: Dict[str, str] = {}
+
+    def meanings(self, word: str) -> str:
+        """All meanings of a word or phrase as one lower-case text, "" if it has none."""
+        word = normalise(word)
+        if word not in self._meanings:
+            try:
+                result = call_with_timeout(lambda: cached_invoke(get_meanings, {"word": word}, "get_meanings"),
+                                           Config.TOOL_TIMEOUT, "get_meanings")
+            except TimeoutError:
+                result = None
+            self._meanings[word] = " ".join((result or {}).get("meanings", [])).lower()
+        return self._meanings[word]
+
+    def mentions(self, word: str, phrase: str) -> bool:
+        """Whether the meanings of word mention a content word of phrase (or its stem)."""
+        text = self.meanings(word)
+        if not text:
+            return False
+        lexicons = get_lexicons()
+        for term in normalise(phrase).split():
+            if len(term) < 3 or lexicons.is_link_word(term):
+                continue
+            if re.search(rf"\b{re.escape(_stem(term))}", text):
+                return True
+        return False
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def _letters(words: List[str]) -> str:
+    return re.sub(r"[^a-z]", "", "".join(words).lower())
+
+
+def _answers(wordplay_type: str, fodder_words: List[str], definition: str, length: int,
+             dictionary: _Dictionary) -> List[str]:
+    """Candidate answers of the given length produced by applying the wordplay to the fodder."""
+    letters = _letters(fodder_words)
+    if wordplay_type == "reversal":
+        return [letters[::-1].upper()] if len(letters) == length else []
+    if wordplay_type == "hidden":
+        whole_words = {_letters([word]) for word in fodder_words}
+        substrings = {letters[i:i + length] for i in range(len(letters) - length + 1)}
+        return sorted(s.upper() for s in substrings if s not in whole_words)
+    if wordplay_type == "anagram" and len(letters) == length:
+        # Words in the definition's meanings made of exactly the fodder's letters
+        text = " ".join(dictionary.meanings(term) for term in {definition, *normalise(definition).split()})
+        words = set(re.findall(rf"\b[a-z]{{{length}}}\b", text))
+        return sorted(w.upper() for w in words if sorted(w) == sorted(letters) and w != letters)
+    return []
+
+
+def _layouts(words: List[str]):
+    """
+    (definition, rest) spans, with the definition at one end of the clue and the wordplay in the rest. Each is also
+    tried without a link word between the definition and the wordplay.
+    """
+    lexicons = get_lexicons()
+    n = len(words)
+    for def_words in range(1, min(MAX_DEFINITION_WORDS, n - 1) + 1):
+        at_start = ((0, def_words - 1), (def_words, n - 1))
+        at_end = ((n - def_words, n - 1), (0, n - def_words - 1))
+        for definition, (start, end) in (at_start, at_end):
+            yield definition, (start, end)
+            link_idx = start if definition[0] == 0 else end
+            if start < end and lexicons.is_link_word(words[link_idx]):
+                yield definition, (start + 1, end) if link_idx == start else (start, end - 1)
+
+
+def _wordplay_splits(rest: Tuple[int, int]):
+    """(indicator, fodder) spans splitting the rest of the clue, with the indicator at either end."""
+    start, end = rest
+    for ind_words in range(1, MAX_INDICATOR_WORDS + 1):
+        if ind_words > end - start:
+            break
+        for indicator, fodder in (((start, start + ind_words - 1), (start + ind_words, end)),
+                                  ((end - ind_words + 1, end), (start, end - ind_words))):
+            if fodder[1] - fodder[0] < MAX_FODDER_WORDS:
+                yield indicator, fodder
+
+
+def find_candidates(clue: str, given_letters: Dict[int, str], target_length: int) -> List[FastCandidate]:
+    """Every mechanically derived answer that fits and is linked to its definition, most confident first."""
+    words = clue.split()
+    lexicons = get_lexicons()
+    dictionary = _Dictionary()
+    found: Dict[Tuple, FastCandidate] = {}
+
+    def text(span: Tuple[int, int]) -> str:
+        return " ".join(words[span[0]:span[1] + 1])
+
+    for definition, rest in _layouts(words):
+        for indicator, fodder in _wordplay_splits(rest):
+            indicator_types = lexicons.indicator_types(text(indicator))
+            for wordplay_type in FAST_PATH_TYPES:
+                if wordplay_type not in indicator_types:
+                    continue
+                definition_text = text(definition)
+                for answer in _answers(wordplay_type, words[fodder[0]:fodder[1] + 1], definition_text,
+                                       target_length, dictionary):
+                    if not check_given_letters(answer, given_letters):
+                        continue
+                    forward = dictionary.mentions(answer, definition_text)
+                    backward = re.search(rf"\b{answer.lower()}\b", dictionary.meanings(definition_text)) is not None
+                    if not (forward or backward):
+                        continue
+                    confidence = BASE_CONFIDENCE
+                    if len(indicator_types) == 1:
+                        confidence += UNAMBIGUOUS_INDICATOR_BONUS
+                    if forward and backward:
+                        confidence += TWO_WAY_LINK_BONUS
+                    key = (answer, wordplay_type, indicator, fodder, definition)
+                    found[key] = FastCandidate(answer, wordplay_type, indicator, fodder, definition, confidence)
+
+    candidates = list(found.values())
+    if len({c.answer for c in candidates}) > 1:
+        for candidate in candidates:
+            candidate.confidence -= AMBIGUITY_PENALTY
+    for candidate in candidates:
+        candidate.confidence = round(min(MAX_CONFIDENCE, candidate.confidence), 3)
+    return sorted(candidates, key=lambda c: c.confidence, reverse=True)
+
+
+def solve_fast(clue: str, given_letters: Dict[int, str], target_length: Optional[int]) -> Optional[SolverStateDict]:
+    """
+    The most confident mechanical solution, in the same shape as the LangGraph solver's output, or None.
+    Needs the answer length.
+    """
+    if not target_length:
+        return None
+    candidates = find_candidates(clue, given_letters, target_length)
+    if not candidates:
+        return None
+    best = candidates[0]
+    words = clue.split()
+
+    def text(span: Tuple[int, int]) -> str:
+        return " ".join(words[span[0]:span[1] + 1])
+
+    state = new_solver_state(clue, given_letters, target_length, max_attempts=1)
+    indicator = new_component(state, text(best.indicator), *best.indicator, role="indicator",
+                              wordplay_type=best.wordplay_type, description=f"{best.wordplay_type} indicator")
+    target = new_component(state, text(best.fodder), *best.fodder, role="target", wordplay_type=best.wordplay_type,
+                           result=best.answer, targeted_by=indicator.id,
+                           description=f"{best.wordplay_type} of {text(best.fodder)}")
+    definition = new_component(state, text(best.definition), *best.definition, role="definition",
+                               wordplay_type="synonym", result=best.answer, description="definition")
+    for component in (indicator, target, definition):
+        state["word_analyses"].add(component.start_pos, component.end_pos, component.id)
+
+    attempt = Attempt(solution=best.answer, definition_part=definition.text,
+                      component_ids=[indicator.id, target.id, definition.id], clue_with_synonyms=list(words))
+    state["solution_attempts"].append(attempt)
+    state.update(final_solution=attempt, solved=True, confidence=best.confidence, stop_reason="fast_path",
+                 stage="fast_path", attempt_count=1)
+    return export_state(state)
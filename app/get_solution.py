@@ -2,29 +2,58 @@ import os
 import requests
 import json
 import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FutureTimeout, wait
 from config import Config
-from app.schemas import OPENAI_FUNCTION_SCHEMAS, ANTHROPIC_TOOL_SCHEMAS, CROSSWORD_SOLUTION_SCHEMA
-from app.langgraph_solver import CrypticCrosswordSolver
+import jsonschema
+from app.schemas import OPENAI_FUNCTION_SCHEMAS, ANTHROPIC_TOOL_SCHEMAS, ANTHROPIC_SINGLE_CALL_TOOL_SCHEMA, CROSSWORD_SOLUTION_SCHEMA, SINGLE_CALL_SOLUTION_SCHEMA
+from app import metrics
+from app.warmup import register_warmup
+from app.rate_limiter import get_rate_limiter, estimate_tokens, RateLimitExceeded
+from app.http_client import post_json
+from app.hedging import hedged_call
+from app.cancellation import SolveCancelled, call_with_timeout, start_cancellable
+from app.prompt_templates import get_template
 
 
-# Global variables
-LAST_API_CALL = 0  # Timestamp of the last API call
-API_RATE_LIMIT = Config.API_RATE_LIMIT  # Rate limit in seconds
+# The LangGraph solver is built on first use (or by the background warm-up) so that
+# importing this module does not pull in langchain/langgraph
+_langgraph_solver = None
+_solver_initialised = False
+_solver_error = None  # Why building the solver failed, if it did
+_solver_lock = threading.Lock()
 
-# Initialize the LangGraph solver if available
-if Config.API_PROVIDER.lower() == "openai":
-    try:
-        openai_key = os.getenv("OPENAI_API_KEY")
-        if openai_key:
-            langgraph_solver = CrypticCrosswordSolver(openai_key)
-        else:
-            langgraph_solver = None
-            print("OpenAI API key not found. LangGraph solver disabled.")
-    except Exception as e:
-        langgraph_solver = None
-        print(f"Failed to initialize LangGraph solver: {e}")
-else:
-    langgraph_solver = None
+def get_langgraph_solver():
+    """Return the shared LangGraph solver, building it on first use. None if it is disabled or failed to build."""
+    global _langgraph_solver, _solver_initialised, _solver_error
+    with _solver_lock:
+        if _solver_initialised:
+            return _langgraph_solver
+        _solver_initialised = True
+
+        if Config.API_PROVIDER.lower() != "openai":
+            return None
+        try:
+            openai_key = os.getenv("OPENAI_API_KEY")
+            if openai_key:
+                from app.langgraph_solver import CrypticCrosswordSolver
+                _langgraph_solver = CrypticCrosswordSolver(openai_key)
+            else:
+                print("OpenAI API key not found. LangGraph solver disabled.")
+        except Exception as e:
+            _langgraph_solver = None
+            _solver_error = e
+            print(f"Failed to initialize LangGraph solver: {e}")
+        return _langgraph_solver
+
+def warm_up_solver():
+    """Warm-up task building the solver. A solver that failed to build is reported as failed, not disabled."""
+    solver = get_langgraph_solver()
+    if _solver_error is not None:
+        raise RuntimeError(f"LangGraph solver failed to initialise: {_solver_error}")
+    return solver is not None
+
+register_warmup("solver", warm_up_solver)
 
 def format_response(data):
     # Function to format the response from the LLM API
@@ -40,12 +69,77 @@ def handle_error(error_message):
         "message": error_message
     }
 
-def get_llm_solution(clue, givens, length=None):
+def _fast_result(future, timeout=None):
+    """The fast path's result once it is done (waiting up to timeout), or None."""
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        return None
+    except SolveCancelled:
+        raise
+    except Exception as e:
+        print(f"Fast path failed: {e}")
+        return None
+
+
+def _accepted(result, min_confidence):
+    return result is not None and result["confidence"] >= min_confidence
+
+
+def solve_with_fast_path(langgraph_solver, clue, givens, length, solve_id=None, budget=None, on_progress=None):
+    """
+    Race the deterministic fast path (see app/fast_path.py) against the LangGraph solver.
+    The fast path runs alone for FAST_PATH_HEAD_START seconds, and a confident answer in that time skips the LLM
+    entirely. Otherwise the graph starts, and a fast answer arriving first cancels it. If the graph finishes
+    unsolved, a fast answer arriving within FAST_PATH_MAX_WAIT seconds (and the solve's budget) is still preferred.
+    However the graph ends, the fast path is then cancelled.
+    """
+    from app.fast_path import solve_fast
+
+    metrics.increment("fast_path_runs")
+    fast, fast_token = start_cancellable(lambda: solve_fast(clue, givens, length), "fast-path")
+    fast_result = _fast_result(fast, Config.FAST_PATH_HEAD_START)
+    if _accepted(fast_result, Config.FAST_PATH_SKIP_CONFIDENCE):
+        metrics.increment("fast_path_hits")
+        metrics.increment("fast_path_llm_skipped")
+        return fast_result
+
+    deadline = time.monotonic() + ((budget or {}).get("max_seconds") or Config.SOLVE_MAX_SECONDS or float("inf"))
+    graph, graph_token = start_cancellable(
+        lambda: langgraph_solver.solve(clue, givens, length, solve_id=solve_id, budget=budget, on_progress=on_progress),
+        "langgraph"
+    )
+    try:
+        wait([fast, graph], return_when=FIRST_COMPLETED)
+        if fast.done() and not graph.done():
+            fast_result = _fast_result(fast)
+            if _accepted(fast_result, Config.FAST_PATH_MIN_CONFIDENCE):
+                graph_token.cancel("fast path answered")
+                metrics.increment("fast_path_hits")
+                metrics.increment("fast_path_llm_cancelled")
+                return fast_result
+
+        result = graph.result()
+        if not result.get("solved"):
+            # A fast answer is still worth a short wait, within what is left of the budget
+            fast_result = _fast_result(fast, max(0.0, min(Config.FAST_PATH_MAX_WAIT, deadline - time.monotonic())))
+            if _accepted(fast_result, Config.FAST_PATH_MIN_CONFIDENCE):
+                metrics.increment("fast_path_hits")
+                return fast_result
+        return result
+    finally:
+        fast_token.cancel("graph answered")
+
+
+def get_llm_solution(clue, givens, length=None, solve_id=None, budget=None, on_progress=None):
     """
     Send a cryptic crossword clue to an LLM API and return the solution.
     Now uses LangGraph-based solver if available.
     
     :param clue: The cryptic crossword clue as a string.
+    :param solve_id: Optional ID used to checkpoint the LangGraph solve, so a retry with the same ID resumes it.
+    :param budget: Optional limits on the LangGraph solve, e.g. {"max_seconds": 20, "max_tokens": 30000}.
+    :param on_progress: Optional callback given the LangGraph solver's state after each step.
     :return: The solution string or an error message.
     """
     # Check if we're in test mode
@@ -55,35 +149,102 @@ def get_llm_solution(clue, givens, length=None):
         return get_dummy_solution(clue)
     
     # Use LangGraph solver if available
+    langgraph_solver = get_langgraph_solver()
     if langgraph_solver:
         try:
-            return langgraph_solver.solve(clue, givens, length)
+            if Config.FAST_PATH and length:
+                return solve_with_fast_path(langgraph_solver, clue, givens, length, solve_id=solve_id, budget=budget,
+                                            on_progress=on_progress)
+            return langgraph_solver.solve(clue, givens, length, solve_id=solve_id, budget=budget, on_progress=on_progress)
+        except SolveCancelled as e:
+            return {
+                "error": f"Solve cancelled: {e}",
+                "error_code": "CANCELLED"
+            }
         except Exception as e:
             print(f"LangGraph solver failed: {e}")
             # Fall back to traditional approach
     
-    # Rate limiting logic for traditional approach
-    global LAST_API_CALL
-    current_time = time.time()
-    time_since_last_call = current_time - LAST_API_CALL
-    
-    if time_since_last_call < API_RATE_LIMIT:
-        wait_time = round(API_RATE_LIMIT - time_since_last_call, 1)
-        return f"Rate limit: Please wait {wait_time} seconds before making another request."
-    
-    # Update the last call timestamp
-    LAST_API_CALL = current_time
-    
     # Choose which API to use (OpenAI, Claude, etc.)
     api_choice = Config.API_PROVIDER.lower()
     
-    if api_choice == "openai":
-        return get_openai_solution(clue)
-    elif api_choice == "anthropic":
-        return get_claude_solution(clue)
-    else:
+    solvers = {"openai": get_openai_solution, "anthropic": get_claude_solution}
+    if api_choice not in solvers:
         return f"Unsupported API provider: {api_choice}"
 
+    # Hedge a slow call with a duplicate, or with the other provider if configured
+    primary = solvers[api_choice]
+    hedge = None
+    if Config.HEDGE_CROSS_PROVIDER:
+        hedge = solvers["anthropic" if api_choice == "openai" else "openai"]
+    try:
+        return hedged_call(
+            f"legacy:{api_choice}",
+            lambda: primary(clue),
+            hedge=(lambda: hedge(clue)) if hedge else None,
+            is_valid=lambda result: isinstance(result, dict) and "error" not in result
+        )
+    except SolveCancelled as e:
+        return {
+            "error": f"Solve cancelled: {e}",
+            "error_code": "CANCELLED"
+        }
+
+def post_stage(url, headers, data, provider):
+    """
+    post_json for one stage of a legacy solve, which stops waiting when the solve is cancelled or NODE_TIMEOUT
+    passes, so a cancelled solve makes no further stages.
+
+    :raises TimeoutError: If the request did not finish in time.
+    :raises SolveCancelled: If the solve was cancelled.
+    """
+    return call_with_timeout(lambda: post_json(url, headers, data, provider), Config.NODE_TIMEOUT, f"{provider} request")
+
+def claude_content(prompt, prompt_type):
+    """
+    Message content for a Claude request, with the template's static prefix in its own block marked for prompt
+    caching. Anthropic only caches a prefix of at least 1024 tokens, so the shorter prefixes are sent uncached.
+    """
+    try:
+        prefix = get_template(f"{prompt_type}_prompt").prefix
+    except FileNotFoundError:
+        prefix = ""
+    if not prefix or not prompt.startswith(prefix):
+        return prompt
+    return [
+        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": prompt[len(prefix):].lstrip()}
+    ]
+
+def acquire_quota(provider, model, data):
+    """Queue until the request fits within the shared provider quota. Returns the reserved token estimate."""
+    prompt = "".join(
+        message["content"] if isinstance(message["content"], str)
+        else "".join(block.get("text", "") for block in message["content"])
+        for message in data["messages"]
+    )
+    estimate = estimate_tokens(prompt, data.get("max_tokens", 1000))
+    get_rate_limiter().acquire(provider, model, estimate)
+    return estimate
+
+def record_usage(provider, model, estimate, result, stage):
+    """Correct the reserved token estimate with the usage reported by the provider, and record it for the benchmark."""
+    usage = result.get("usage") or {}
+    if provider == "openai":
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    else:
+        # Anthropic reports cached prompt tokens separately from input_tokens
+        cached_tokens = usage.get("cache_read_input_tokens", 0)
+        prompt_tokens = usage.get("input_tokens", 0) + cached_tokens + usage.get("cache_creation_input_tokens", 0)
+        completion_tokens = usage.get("output_tokens", 0)
+    metrics.record_llm_call(f"legacy_{stage}", prompt_tokens, completion_tokens, cached_tokens, model=model)
+
+    used = prompt_tokens + completion_tokens
+    if used:
+        get_rate_limiter().adjust(provider, model, used - estimate)
+
 def get_dummy_solution(clue):
     """
     Return a dummy solution for testing purposes with structured output.
@@ -142,16 +303,9 @@ def get_dummy_solution(clue):
     }
 
 def load_prompt_template(prompt_type="reasoning"):
-    """Load prompt template from file."""
+    """Load a prompt template (static instructions first, then the clue) from the template registry."""
     try:
-        prompt_path = ""
-        if prompt_type == "reasoning":
-            prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', 'reasoning_prompt.txt')
-        elif prompt_type == "structuring":
-            prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', 'structuring_prompt.txt')
-        
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read().strip()
+        return get_template(f"{prompt_type}_prompt").text
     except FileNotFoundError:
         # Fallback prompts if files not found
         if prompt_type == "reasoning":
@@ -188,6 +342,12 @@ def get_openai_solution(clue):
             "suggestions": ["Add OPENAI_API_KEY to your .env file"]
         }
     
+    if Config.LEGACY_SINGLE_CALL:
+        structured_result = get_openai_single_call_solution(clue)
+        if structured_result is not None:
+            return structured_result
+        # The single call didn't validate, fall back to the two-stage approach
+
     # Stage 1: Get natural language reasoning
     reasoning = get_openai_reasoning(load_prompt_template("reasoning").format(clue=clue))
     if isinstance(reasoning, dict) and "error" in reasoning:
@@ -211,10 +371,12 @@ def get_openai_solution(clue):
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data)
+        estimate = acquire_quota("openai", data["model"], data)
+        response = post_stage(url, headers, data, "openai")
         response.raise_for_status()
         
         result = response.json()
+        record_usage("openai", data["model"], estimate, result, "structuring")
         
         # Extract structured response from function call
         if "choices" in result and result["choices"]:
@@ -232,6 +394,18 @@ def get_openai_solution(clue):
             "error_code": "PARSING_ERROR"
         }
         
+    except SolveCancelled:
+        raise
+    except TimeoutError as e:
+        return {
+            "error": f"API request timed out: {str(e)}",
+            "error_code": "TIMEOUT"
+        }
+    except RateLimitExceeded as e:
+        return {
+            "error": str(e),
+            "error_code": "RATE_LIMIT"
+        }
     except requests.exceptions.RequestException as e:
         return {
             "error": f"API request failed: {str(e)}",
@@ -258,6 +432,12 @@ def get_claude_solution(clue):
             "suggestions": ["Add ANTHROPIC_API_KEY to your .env file"]
         }
     
+    if Config.LEGACY_SINGLE_CALL:
+        structured_result = get_claude_single_call_solution(clue)
+        if structured_result is not None:
+            return structured_result
+        # The single call didn't validate, fall back to the two-stage approach
+
     # Stage 1: Get natural language reasoning
     reasoning = get_claude_reasoning(load_prompt_template("reasoning").format(clue=clue))
     if isinstance(reasoning, dict) and "error" in reasoning:
@@ -275,7 +455,7 @@ def get_claude_solution(clue):
     
     data = {
         "model": "claude-3-5-sonnet-20241022",
-        "messages": [{"role": "user", "content": structuring_prompt}],
+        "messages": [{"role": "user", "content": claude_content(structuring_prompt, "structuring")}],
         "tools": ANTHROPIC_TOOL_SCHEMAS,
         "tool_choice": {"type": "tool", "name": "solve_cryptic_clue"},
         "max_tokens": 1500,
@@ -283,10 +463,12 @@ def get_claude_solution(clue):
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data)
+        estimate = acquire_quota("anthropic", data["model"], data)
+        response = post_stage(url, headers, data, "anthropic")
         response.raise_for_status()
 
         result = response.json()
+        record_usage("anthropic", data["model"], estimate, result, "structuring")
         
         # Extract structured response from tool use
         if "content" in result:
@@ -302,6 +484,18 @@ def get_claude_solution(clue):
             "error_code": "PARSING_ERROR"
         }
         
+    except SolveCancelled:
+        raise
+    except TimeoutError as e:
+        return {
+            "error": f"API request timed out: {str(e)}",
+            "error_code": "TIMEOUT"
+        }
+    except RateLimitExceeded as e:
+        return {
+            "error": str(e),
+            "error_code": "RATE_LIMIT"
+        }
     except requests.exceptions.RequestException as e:
         return {
             "error": f"API request failed: {str(e)}",
@@ -318,6 +512,127 @@ def get_claude_solution(clue):
             "error_code": "UNKNOWN"
         }
 
+def validate_single_call_result(structured_result):
+    """Return the single-call result if it matches the solution schema, otherwise None."""
+    try:
+        jsonschema.validate(structured_result, SINGLE_CALL_SOLUTION_SCHEMA)
+    except jsonschema.ValidationError as e:
+        print(f"Single-call result failed validation: {e.message}")
+        metrics.increment("legacy_single_call_fallbacks")
+        return None
+    return structured_result
+
+def get_openai_single_call_solution(clue):
+    """
+    Solve the clue with reasoning and structured output in a single OpenAI call.
+    Returns None if the output is missing, unparseable or does not validate, so the caller can fall back to the
+    two-stage approach. A transport error (RATE_LIMIT, API_ERROR or TIMEOUT) is returned as an error dict without
+    falling back, since the two-stage approach would hit it too.
+    """
+    url = "https://api.openai.com/v1/chat/completions"
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {Config.OPENAI_API_KEY}"
+    }
+    
+    data = {
+        "model": "gpt-4o",
+        "messages": [{"role": "user", "content": load_prompt_template("single_call").format(clue=clue)}],
+        "functions": [OPENAI_FUNCTION_SCHEMAS["solve_cryptic_clue_single_call"]],
+        "function_call": {"name": "solve_cryptic_clue_single_call"},
+        "temperature": 0.2,
+        "max_tokens": 2500
+    }
+    
+    try:
+        estimate = acquire_quota("openai", data["model"], data)
+        response = post_stage(url, headers, data, "openai")
+        response.raise_for_status()
+        
+        result = response.json()
+        record_usage("openai", data["model"], estimate, result, "single_call")
+        
+        if "choices" in result and result["choices"]:
+            message = result["choices"][0].get("message", {})
+            if "function_call" in message:
+                return validate_single_call_result(json.loads(message["function_call"]["arguments"]))
+        return validate_single_call_result(None)
+        
+    except SolveCancelled:
+        raise
+    except TimeoutError as e:
+        return {
+            "error": f"API request timed out: {str(e)}",
+            "error_code": "TIMEOUT"
+        }
+    except RateLimitExceeded as e:
+        return {
+            "error": str(e),
+            "error_code": "RATE_LIMIT"
+        }
+    except requests.exceptions.RequestException as e:
+        return {
+            "error": f"API request failed: {str(e)}",
+            "error_code": "API_ERROR"
+        }
+    except json.JSONDecodeError:
+        return validate_single_call_result(None)
+
+def get_claude_single_call_solution(clue):
+    """
+    Solve the clue with reasoning and structured output in a single Claude call.
+    Returns None if the output is missing, unparseable or does not validate, so the caller can fall back to the
+    two-stage approach. A transport error (RATE_LIMIT, API_ERROR or TIMEOUT) is returned as an error dict without
+    falling back, since the two-stage approach would hit it too.
+    """
+    url = "https://api.anthropic.com/v1/messages"
+    headers = {
+        "Content-Type": "application/json",
+        "x-api-key": Config.ANTHROPIC_API_KEY,
+        "anthropic-version": "2023-06-01"
+    }
+    
+    data = {
+        "model": "claude-3-5-sonnet-20241022",
+        "messages": [{"role": "user", "content": claude_content(load_prompt_template("single_call").format(clue=clue),
+                                                                "single_call")}],
+        "tools": [ANTHROPIC_SINGLE_CALL_TOOL_SCHEMA],
+        "tool_choice": {"type": "tool", "name": "solve_cryptic_clue_single_call"},
+        "max_tokens": 2500,
+        "temperature": 0.2
+    }
+    
+    try:
+        estimate = acquire_quota("anthropic", data["model"], data)
+        response = post_stage(url, headers, data, "anthropic")
+        response.raise_for_status()
+
+        result = response.json()
+        record_usage("anthropic", data["model"], estimate, result, "single_call")
+        
+        for content_block in result.get("content", []):
+            if content_block.get("type") == "tool_use" and content_block.get("name") == "solve_cryptic_clue_single_call":
+                return validate_single_call_result(content_block["input"])
+        return validate_single_call_result(None)
+        
+    except SolveCancelled:
+        raise
+    except TimeoutError as e:
+        return {
+            "error": f"API request timed out: {str(e)}",
+            "error_code": "TIMEOUT"
+        }
+    except RateLimitExceeded as e:
+        return {
+            "error": str(e),
+            "error_code": "RATE_LIMIT"
+        }
+    except requests.exceptions.RequestException as e:
+        return {
+            "error": f"API request failed: {str(e)}",
+            "error_code": "API_ERROR"
+        }
+
 def get_openai_reasoning(prompt):
     """Get reasoning from OpenAI without structured output."""
     api_key = Config.OPENAI_API_KEY
@@ -341,10 +656,12 @@ def get_openai_reasoning(prompt):
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data)
+        estimate = acquire_quota("openai", data["model"], data)
+        response = post_stage(url, headers, data, "openai")
         response.raise_for_status()
         
         result = response.json()
+        record_usage("openai", data["model"], estimate, result, "reasoning")
         
         if "choices" in result and result["choices"]:
             return result["choices"][0]["message"]["content"]
@@ -354,6 +671,18 @@ def get_openai_reasoning(prompt):
             "error_code": "PARSING_ERROR"
         }
         
+    except SolveCancelled:
+        raise
+    except TimeoutError as e:
+        return {
+            "error": f"API request timed out: {str(e)}",
+            "error_code": "TIMEOUT"
+        }
+    except RateLimitExceeded as e:
+        return {
+            "error": str(e),
+            "error_code": "RATE_LIMIT"
+        }
     except Exception as e:
         return {
             "error": f"Reasoning API call failed: {str(e)}",
@@ -378,16 +707,18 @@ def get_claude_reasoning(prompt):
     
     data = {
         "model": "claude-3-5-sonnet-20241022",
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": [{"role": "user", "content": claude_content(prompt, "reasoning")}],
         "max_tokens": 1500,
         "temperature": 0.3
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data)
+        estimate = acquire_quota("anthropic", data["model"], data)
+        response = post_stage(url, headers, data, "anthropic")
         response.raise_for_status()
 
         result = response.json()
+        record_usage("anthropic", data["model"], estimate, result, "reasoning")
         
         if "content" in result and result["content"]:
             text_content = ""
@@ -401,6 +732,18 @@ def get_claude_reasoning(prompt):
             "error_code": "PARSING_ERROR"
         }
         
+    except SolveCancelled:
+        raise
+    except TimeoutError as e:
+        return {
+            "error": f"API request timed out: {str(e)}",
+            "error_code": "TIMEOUT"
+        }
+    except RateLimitExceeded as e:
+        return {
+            "error": str(e),
+            "error_code": "RATE_LIMIT"
+        }
     except Exception as e:
         return {
             "error": f"Reasoning API call failed: {str(e)}",
@@ -0,0 +1,136 @@
+"""
+Hedged LLM requests to cut tail latency.
+If a call has not answered within a configurable percentile of the recent latency for that kind of call,
+a duplicate (or an alternative provider) is sent, and the first valid response wins.
+Hedges are paid for out of a budget so hedging cannot double the spend.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Optional
+
+from config import Config
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies per call key."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key: str, pct: float) -> Optional[float]:
+        """Latency at the given percentile, or None until enough samples have been seen."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        idx = min(len(samples) - 1, int(len(samples) * pct / 100))
+        return samples[idx]
+
+
+class HedgeBudget:
+    """
+    Limits hedges to a fraction of primary calls (e.g. 0.1 allows one hedge per ten calls, with a small burst)
+    and to a maximum number of hedges in flight at once.
+    """
+
+    def __init__(self, ratio: float, burst: float = 5.0, max_in_flight: int = 2):
+        self.ratio = ratio
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self._credit = 0.0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def earn(self) -> None:
+        """Called for every primary call."""
+        with self._lock:
+            self._credit = min(self.burst, self._credit + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0 or self._in_flight >= self.max_in_flight:
+                return False
+            self._credit -= 1.0
+            self._in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+
+latency_tracker = LatencyTracker(min_samples=Config.HEDGE_MIN_SAMPLES)
+hedge_budget = HedgeBudget(Config.HEDGE_BUDGET_RATIO, max_in_flight=Config.HEDGE_MAX_IN_FLIGHT)
+_executor = ThreadPoolExecutor(max_workers=Config.HEDGE_POOL_SIZE, thread_name_prefix="hedge")
+
+
+def _timed(key: str, func: Callable) -> Callable:
+    def run():
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            latency_tracker.record(key, time.perf_counter() - start)
+    return run
+
+
+def hedged_call(key: str, primary: Callable, hedge: Optional[Callable] = None,
+                is_valid: Callable = lambda result: True):
+    """
+    Run `primary`, sending `hedge` (defaults to a duplicate of `primary`) if it is slow to answer.
+
+    :param key: Identifies the kind of call whose latency distribution sets the hedge delay.
+    :param is_valid: A result failing this check does not win the race while the other call is still running.
+    :return: The first valid result, otherwise the last result (or exception) seen.
+    """
+    if not Config.HEDGE_ENABLED:
+        return primary()
+
+    hedge_budget.earn()
+    delay = latency_tracker.percentile(key, Config.HEDGE_PERCENTILE)
+    if delay is None:
+        # Not enough history to know what slow looks like yet
+        return _timed(key, primary)()
+
+    # Each call runs in a copy of this context, so it sees the solve's cancellation token
+    pending = {_executor.submit(contextvars.copy_context().run, _timed(key, primary))}
+    done, pending = wait(pending, timeout=delay)
+    if not done and hedge_budget.try_spend():
+        hedge_future = _executor.submit(contextvars.copy_context().run, _timed(key, hedge or primary))
+        hedge_future.add_done_callback(lambda _: hedge_budget.release())
+        pending.add(hedge_future)
+
+    futures = done | pending
+    last_error = None
+    result = None
+    while futures:
+        finished = [f for f in futures if f.done()]
+        if not finished:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in finished:
+            futures.discard(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if is_valid(result):
+                # The loser's result is discarded; it is cancelled outright if it has not started yet
+                for other in futures:
+                    other.cancel()
+                return result
+            last_error = None
+
+    if last_error is not None:
+        raise last_error
+    return result
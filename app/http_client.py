@@ -0,0 +1,98 @@
+"""
+Shared HTTP client layer for outbound provider calls.
+One pooled keep-alive session per provider, explicit connect/read timeouts, and
+jittered exponential backoff on 429/5xx responses that honours Retry-After.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from .warmup import register_warmup
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 30.0  # Seconds, also caps how long a Retry-After header can make us wait
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(name: str) -> requests.Session:
+    """Return the pooled session for a provider, creating it on first use."""
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.HTTP_POOL_SIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[name] = session
+        return session
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(MAX_BACKOFF, Config.HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+def request_with_retries(method: str, url: str, session_name: str, max_retries: Optional[int] = None,
+                         **kwargs) -> requests.Response:
+    """
+    Send a request on the provider's pooled session, retrying connection errors, timeouts and 429/5xx responses.
+
+    :return: The final response. Non-retryable error statuses are returned for the caller to handle.
+    :raises requests.exceptions.RequestException: If the last attempt failed to connect or timed out.
+    """
+    session = get_session(session_name)
+    kwargs.setdefault("timeout", (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT))
+    retries = Config.HTTP_MAX_RETRIES if max_retries is None else max_retries
+
+    attempt = 0
+    while True:
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt >= retries:
+                raise
+            delay = _backoff(attempt)
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+            retry_after = _retry_after(response)
+            delay = min(MAX_BACKOFF, retry_after) if retry_after is not None else _backoff(attempt)
+            response.close()
+        time.sleep(delay)
+        attempt += 1
+
+
+def post_json(url: str, headers: Dict, payload: Dict, session_name: str) -> requests.Response:
+    """POST a JSON payload to a provider."""
+    return request_with_retries("POST", url, session_name, headers=headers, json=payload)
+
+
+def _warm_sessions():
+    for name in ("openai", "anthropic", "wiktionary"):
+        get_session(name)
+
+
+register_warmup("http_pools", _warm_sessions)
@@ -1,14 +1,33 @@
-from typing import Dict, Optional
-import random
+from typing import Callable, Dict, List, Optional
+import re
+import time
+import uuid
 
+import jsonschema
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 
+from config import Config
 from .tools import generate_anagrams, get_meanings, find_hidden_words, reverse_word, check_given_letters
-from .state import SolverState, CurrentAttemptState, SolutionAttempt, WordPlayComponent
-from .prompt_generation import generate_analyse_component_prompt, generate_find_target_prompt
+from .tool_executor import ToolExecutor
+from .tool_cache import cached_invoke, solve_scope
+from .prefetch import prefetch_lookups
+from .message_window import clip_text, reset_messages
+from .state import SolverState, SolverStateDict, CurrentAttempt, Attempt, Component, new_component, new_solver_state, export_state
+from .prompt_generation import generate_analyse_component_prompt, generate_find_target_prompt, generate_batch_analysis_prompt
+from .schemas import OPENAI_FUNCTION_SCHEMAS, CLUE_ANALYSIS_SCHEMA, COMPONENT_ANALYSIS_SCHEMA, TARGET_ANALYSIS_SCHEMA
+from .rate_limiter import get_rate_limiter, estimate_tokens
+from .hedging import hedged_call
+from .checkpoints import create_checkpointer
+from .span_scheduler import choose_span
+from .span_classifier import prelabel
+from .convergence import record_attempt, best_candidate, fits
+from .attempt_seeding import seed_attempt
+from .budget import new_budget, charge, check as check_budget
+from .cancellation import call_with_timeout, raise_if_cancelled
+from .streaming import FieldParser, ArgumentsParser, stream_until_complete
+from . import metrics
 
 class CrypticCrosswordSolver:
     """LangGraph-based cryptic crossword solver."""
@@ -23,14 +42,38 @@ class CrypticCrosswordSolver:
             reverse_word,
             # Lookup synonyms
         ]
-        self.tool_node = ToolNode(self.tools)
-
-        # Create the LLM with tools bound
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            api_key=openai_api_key,
-            temperature=0.2
-        ).bind_tools(self.tools)
+        self.tool_names = {t.name for t in self.tools}
+        self.tool_node = ToolExecutor(self.tools)
+
+        # Create the LLMs with tools bound: a strong model, and a fast one for the nodes routed to it
+        self.model_names = {"strong": Config.MODEL_STRONG, "fast": Config.MODEL_FAST or Config.MODEL_STRONG}
+        base_llms = {
+            tier: ChatOpenAI(
+                model=model_name,
+                api_key=openai_api_key,
+                temperature=0.2,
+                timeout=Config.HTTP_READ_TIMEOUT,
+                max_retries=Config.HTTP_MAX_RETRIES,
+                stream_usage=True
+            )
+            for tier, model_name in self.model_names.items()
+        }
+        # Each tier's LLM bound for each kind of call, keyed by (tier, binding)
+        self.llms = {}
+        for tier, base_llm in base_llms.items():
+            self.llms[tier, "tools"] = base_llm.bind_tools(self.tools)  # Answers in text lines
+            # Structured output for the batched whole-clue analysis
+            self.llms[tier, "analyse_clue"] = base_llm.bind_tools([OPENAI_FUNCTION_SCHEMAS["analyse_clue"]],
+                                                                  tool_choice="analyse_clue")
+            for answer in ("record_component_analysis", "record_target"):
+                schema = OPENAI_FUNCTION_SCHEMAS[answer]
+                # Either call tools or answer. Not strict, since strict schemas rule out parallel tool calls
+                self.llms[tier, answer] = base_llm.bind_tools(self.tools + [schema], tool_choice="required")
+                # Answer from the tool results, held to the schema
+                self.llms[tier, f"{answer}_final"] = base_llm.bind_tools([schema], tool_choice=answer, strict=True)
+
+        # Optional local checkpointer so interrupted solves can resume
+        self.checkpointer = create_checkpointer()
        
         # Build the graph
         self.graph = self._build_graph()
@@ -46,17 +89,18 @@ class CrypticCrosswordSolver:
         workflow = StateGraph(SolverState)
         
         # Add nodes
-        workflow.add_node("generate_solution", self._generate_solution)
+        workflow.add_node("generate_solution", self._guarded(self._generate_solution))
+        workflow.add_node("batch_analyse", self._guarded(self._batch_analyse))
         workflow.add_node("decide_continue_attempt", lambda state: state)
-        workflow.add_node("analyse_component", self._analyse_component)
+        workflow.add_node("analyse_component", self._guarded(self._analyse_component))
         workflow.add_node("decide_use_tools_a", lambda state: state)
         workflow.add_node("decide_search_for_target", lambda state: state)
-        workflow.add_node("find_target", self._find_target)
-        workflow.add_node("verify_solution", self._verify_solution)
+        workflow.add_node("find_target", self._guarded(self._find_target))
+        workflow.add_node("verify_solution", self._guarded(self._verify_solution, budgeted=False))
         workflow.add_node("decide_use_tools_v", lambda state: state)
         workflow.add_node("decide_next", lambda state: state)
         workflow.add_node("tools", self.tool_node)
-        workflow.add_node("return_from_tools", lambda state: state)
+        workflow.add_node("return_from_tools", self._return_from_tools)
         workflow.add_node("finalize", lambda state: state)
         workflow.add_node("decide_use_tools_f", lambda state: state)
         
@@ -64,12 +108,21 @@ class CrypticCrosswordSolver:
         workflow.set_entry_point("generate_solution")
         
         # Add edges
-        workflow.add_edge("generate_solution", "decide_continue_attempt")
+        workflow.add_conditional_edges(
+            "generate_solution",
+            self._decide_batch_analysis,
+            {
+                "batch": "batch_analyse",
+                "skip": "decide_continue_attempt"
+            }
+        )
+        workflow.add_edge("batch_analyse", "generate_solution")
         workflow.add_conditional_edges(
             "decide_continue_attempt",
             self._decide_continue_attempt,
             {
                 "continue": "analyse_component",  # Recurrent edge
+                "skip_analysis": "decide_search_for_target",  # Pre-labelled by the local classifier
                 "stop": "verify_solution"
             }
         )
@@ -134,16 +187,98 @@ class CrypticCrosswordSolver:
 
         workflow.add_edge("finalize", END)
         
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
     
+    def _guarded(self, node, budgeted: bool = True):
+        """
+        Wrap a node with the checks made at each node boundary: the graph stops if the solve has been cancelled,
+        and a budgeted node starts no new work once the solve's budget has run out.
+        """
+        def run(state: SolverState) -> SolverState:
+            raise_if_cancelled()
+            if not budgeted or not check_budget(state.get("budget")):
+                return node(state)
+            # With no current component, every route leads on to verification and then to the end of the solve
+            if state["current_attempt"]:
+                state["current_attempt"].current_component = None
+            state["messages"] = reset_messages()
+            return state
+        return run
+
+    def _return_from_tools(self, state: SolverState) -> SolverState:
+        """Count the tool round just finished against the current component's tool limit."""
+        state["tool_count"] += 1
+        return state
+
+    def _tier(self, node: str) -> str:
+        """The model tier ('fast' or 'strong') a node is routed to."""
+        return "fast" if Config.MODEL_ROUTES.get(node) == "fast" else "strong"
+
+    def _invoke_cascade(self, messages, node: str, failure, binding: str = "tools", budget=None, parser=None):
+        """
+        Call the LLM on the node's routed model. failure(response) gives the reason a response cannot be used
+        ("unparseable", or another reason such as "unknown"), or "" if it can. A fast-model response that cannot
+        be used is escalated to the strong model. Unparseable responses are counted as wasted calls.
+        """
+        tier = self._tier(node)
+        response = self._invoke_llm(messages, node, binding=binding, budget=budget, tier=tier, parser=parser)
+        reason = failure(response)
+        if reason == "unparseable":
+            metrics.increment("wasted_llm_calls")
+        if tier == "fast" and reason:
+            print(f"Escalating {node} to {self.model_names['strong']}: {reason}")
+            metrics.increment("cascade_escalations")
+            response = self._invoke_llm(messages, node, binding=binding, budget=budget, tier="strong", parser=parser)
+            if failure(response) == "unparseable":
+                metrics.increment("wasted_llm_calls")
+        return response
+
+    def _invoke_llm(self, messages, node: str, binding: str = "tools", budget=None, tier: str = "strong", parser=None):
+        """
+        Call the LLM (hedged if enabled) once the shared OpenAI quota allows it. Uses the tier's LLM with the given
+        binding (see __init__), and charges the call to the solve's budget if one is given.
+        Given a parser factory (a new parser per call, since a hedged call runs twice), the reply is streamed and
+        cut off once the parser has its fields.
+        """
+        llm = self.llms[tier, binding]
+        model_name = self.model_names[tier]
+        limiter = get_rate_limiter()
+        estimate = estimate_tokens("".join(str(m.content) for m in messages), 1000)
+
+        def call():
+            limiter.acquire("openai", model_name, estimate)
+            start = time.perf_counter()
+            if parser is not None and Config.STREAM_EARLY_STOP:
+                response = stream_until_complete(llm, messages, parser())
+            else:
+                response = llm.invoke(messages)
+            seconds = time.perf_counter() - start
+            # Reconcile the reserved tokens with real usage
+            usage = getattr(response, "usage_metadata", None) or {}
+            metrics.record_llm_call(
+                node,
+                usage.get("input_tokens", 0),
+                usage.get("output_tokens", 0),
+                (usage.get("input_token_details") or {}).get("cache_read", 0),
+                seconds,
+                model=model_name
+            )
+            if usage.get("total_tokens"):
+                limiter.adjust("openai", model_name, usage["total_tokens"] - estimate)
+            charge(budget, usage.get("total_tokens") or estimate)
+            return response
+
+        # Keyed by node, so each kind of call is hedged against its own latency (batch analysis is much slower)
+        return call_with_timeout(lambda: hedged_call(f"openai:{model_name}:{node}", call), Config.NODE_TIMEOUT, node)
+
     def _generate_solution(self, state: SolverState) -> SolverState:
         """Generate a solution attempt based on current analysis."""
-        state["messages"] = []  # Clear messages for a new attempt
+        state["messages"] = reset_messages()  # Clear messages for a new attempt
         # Select words or sets of words from the clue to be sent on for analysis and populate current_component_to_analyse
         clue = state["clue_words"]
         if state["current_attempt"] is None:
             # Initialize the current attempt state
-            state["current_attempt"] = CurrentAttemptState(
+            state["current_attempt"] = CurrentAttempt(
                 solution_attempt=None,
                 current_component=None,
                 remaining_word_idxs=list(range(len(clue))),
@@ -151,56 +286,254 @@ class CrypticCrosswordSolver:
             )
 
         attempt_data = state["current_attempt"]
-        if attempt_data["solution_attempt"] is None:
+        if attempt_data.solution_attempt is None:
             # Create a new solution attempt
-            attempt_data["solution_attempt"] = SolutionAttempt(
-                solution="",
-                definition_part="",
-                wordplay_analysis=[],
-                clue_with_synonyms=state["clue_words"]
-            )
+            attempt_data.solution_attempt = Attempt(clue_with_synonyms=list(state["clue_words"]))
 
-        if not attempt_data["remaining_word_idxs"]:
-            attempt_data["current_component"] = None
+        if not attempt_data.remaining_word_idxs or self._decide_batch_analysis(state) == "batch":
+            attempt_data.current_component = None
             return state
 
-        component_idx = random.choice(attempt_data["remaining_word_idxs"]) # TODO: Allow multiword selection
-        word_to_analyse = clue[component_idx].strip(",.:;").strip()
-
-        new_component = WordPlayComponent(
-            text=word_to_analyse,
-            start_pos=component_idx,
-            end_pos=component_idx,
-            role="",
-            wordplay_type="",
-            targeted_by=None,
-            result=None,
-            description="",
-            messages=[]
-        )
+        # Analyse the most informative word or phrase next, ending the attempt once every span has been tried
+        span = choose_span(state)
+        if span is None:
+            attempt_data.current_component = None
+            return state
+        attempt_data.tried_spans.append(list(span))  # Lists, as checkpoints do not keep tuples
+        state["tool_count"] = 0  # The tool limit applies per component
+        start_idx, end_idx = span
+        words_to_analyse = " ".join(word.strip(",.:;").strip() for word in clue[start_idx:end_idx + 1])
+
+        component = new_component(state, words_to_analyse, start_idx, end_idx)
         
         # Set this as the current component to be analyzed
-        attempt_data["current_component"] = new_component
+        attempt_data.current_component = component.id
+
+        # Link words and indicators the local classifier is sure of need no LLM call
+        label = prelabel(words_to_analyse)
+        if label:
+            role, wordplay_type, confidence = label
+            self._update_component_analysis(state, component, role, wordplay_type, None,
+                                            f"{wordplay_type} (classifier, p={confidence:.2f})")
+            metrics.increment("classifier_skipped_llm_calls")
         
         return state
     
+    def _decide_batch_analysis(self, state: SolverState) -> str:
+        """Run the batched analysis once at the start of each attempt, if enabled."""
+        current_attempt = state["current_attempt"]
+        if (Config.BATCH_ANALYSIS and current_attempt is not None and not current_attempt.batch_analysed
+                and current_attempt.remaining_word_idxs and not check_budget(state.get("budget"))):
+            return "batch"
+        return "skip"
+
+    def _batch_analyse(self, state: SolverState) -> SolverState:
+        """
+        Analyse every unresolved span of the clue in one structured LLM call.
+        Spans flagged as uncertain (or left unknown) stay unresolved and are analysed word by word afterwards.
+        """
+        current_attempt = state["current_attempt"]
+        current_attempt.batch_analysed = True
+        state["stage"] = "batch_analyse"
+
+        prompt = generate_batch_analysis_prompt(state)
+        if not prompt:
+            return state
+        try:
+            response = self._invoke_cascade([HumanMessage(content=prompt)], "batch_analyse", self._batch_failure,
+                                            binding="analyse_clue", budget=state.get("budget"))
+            spans = self._parse_batch_response(response)
+        except Exception as e:
+            # Fall back to analysing every word on its own
+            print(f"Batch analysis failed: {e}")
+            metrics.increment("batch_analysis_failures")
+            return state
+
+        # Indicators first, so they claim their targets before any span that duplicates a target
+        resolved = 0
+        for span in sorted(spans, key=lambda span: span["role"] != "indicator"):
+            resolved += self._apply_span_analysis(state, span)
+        metrics.increment("batch_spans_resolved", resolved)
+        metrics.increment("batch_spans_uncertain", len(spans) - resolved)
+        return state
+
+    def _batch_failure(self, response) -> str:
+        """Why a batch analysis is unusable, or too unsure of itself to keep, or "" if it can be used."""
+        try:
+            spans = self._parse_batch_response(response)
+        except (ValueError, jsonschema.ValidationError):
+            return "unparseable"
+        uncertain = sum(1 for span in spans if span.get("uncertain") or span["role"] == "unknown")
+        if not spans or uncertain / len(spans) > Config.CASCADE_UNCERTAIN_RATIO:
+            return "uncertain"
+        return ""
+
+    def _parse_batch_response(self, response) -> List[Dict]:
+        """Extract and validate the spans from the analyse_clue call."""
+        for tool_call in getattr(response, "tool_calls", None) or []:
+            if tool_call["name"] == "analyse_clue":
+                jsonschema.validate(tool_call["args"], CLUE_ANALYSIS_SCHEMA)
+                return tool_call["args"]["spans"]
+        raise ValueError("No analyse_clue call in the response")
+
+    def _apply_span_analysis(self, state: SolverState, span: Dict) -> bool:
+        """Record one span from the batched analysis. Returns False if the span is left for per-word analysis."""
+        current_attempt = state["current_attempt"]
+        clue_words = state["clue_words"]
+        start, end = span["start"], span["end"]
+        role, wordplay_type = span["role"].lower(), span["wordplay_type"].lower()
+        if span["uncertain"] or "unknown" in (role, wordplay_type) or not 0 <= start <= end < len(clue_words):
+            return False
+        if any(idx not in current_attempt.remaining_word_idxs for idx in range(start, end + 1)):
+            return False  # Overlaps a span that is already resolved
+
+        target_span = None
+        if role == "indicator":
+            target_start = span.get("target_start")
+            target_end = span.get("target_end", target_start)
+            if target_start is None or target_end is None or not 0 <= target_start <= target_end < len(clue_words):
+                return False  # Without a target the indicator is analysed on its own, which finds one
+            target_span = range(target_start, target_end + 1)
+            if any(idx not in current_attempt.possible_target_idxs or start <= idx <= end for idx in target_span):
+                return False
+
+        def span_text(idxs) -> str:
+            return " ".join(clue_words[idx].strip(",.:;").strip() for idx in idxs)
+
+        result = (span.get("result") or "").upper() or None
+        component = new_component(state, span_text(range(start, end + 1)), start, end)
+        self._update_component_analysis(state, component, role, wordplay_type, result, span["description"])
+
+        if target_span is not None:
+            target = new_component(
+                state, span_text(target_span), target_span.start, target_span.stop - 1,
+                role="target",
+                wordplay_type=wordplay_type,
+                result=(span.get("target_result") or "").upper() or None,
+                description=f"{wordplay_type} indicated by '{component.text}'",
+                targeted_by=component.id
+            )
+            current_attempt.solution_attempt.component_ids.append(target.id)
+            for idx in target_span:
+                if idx in current_attempt.remaining_word_idxs:
+                    current_attempt.remaining_word_idxs.remove(idx)
+                if idx in current_attempt.possible_target_idxs:
+                    current_attempt.possible_target_idxs.remove(idx)
+        return True
+
     def _decide_continue_attempt(self, state: SolverState) -> str:
         """Check if the attempt is finished."""
         #  TODO: Need more robust way to decide to end attempt even if not all words are solved
         current_attempt = state["current_attempt"]
        
-        if current_attempt is None or current_attempt["current_component"] is None:
+        if current_attempt is None or current_attempt.current_component is None:
             return "stop"  # No component to analyse
         
-        if not current_attempt["remaining_word_idxs"]:
+        if state["components"][current_attempt.current_component].role:
+            return "skip_analysis"  # Already labelled, but an indicator may still need its target
+
+        if not current_attempt.remaining_word_idxs:
             return "stop"
         
-        for idx in current_attempt["remaining_word_idxs"]:
-            if state["clue_words"][idx].strip().lower() not in ["a", "an", "the", "of", "in", "on", "at", "to", "for", "with", "by", "is", "that's"]:
-                return "continue"
-        
         return "continue"  # Continue with the current component
     
+    @staticmethod
+    def _binding(answer: str, tool_results: List[Dict]) -> str:
+        """
+        The LLM binding for a per-component node: with structured output, one that may call tools or answer,
+        or once the tool results are in, one that must answer.
+        """
+        if not Config.STRUCTURED_NODE_OUTPUT:
+            return "tools"
+        return f"{answer}_final" if tool_results else answer
+
+    def _requests_tools(self, response) -> bool:
+        return any(call["name"] in self.tool_names for call in getattr(response, "tool_calls", None) or [])
+
+    def _tool_request(self, response):
+        """The response with only its calls to real tools, for the tool node to run."""
+        response = response.model_copy()
+        response.tool_calls = [call for call in response.tool_calls if call["name"] in self.tool_names]
+        return response
+
+    @staticmethod
+    def _answer_arguments(response, name: str, schema: Dict, description: str) -> Optional[Dict]:
+        """
+        The validated arguments of the response's call to the answer function, or None if it has none that are
+        valid. A description cut off by streaming is given the default description.
+        """
+        for tool_call in getattr(response, "tool_calls", None) or []:
+            if tool_call["name"] == name:
+                arguments = {"result": None, "description": description, **tool_call["args"]}
+                try:
+                    jsonschema.validate(arguments, schema)
+                except jsonschema.ValidationError:
+                    return None
+                return arguments
+        return None
+
+    def _component_answer(self, response) -> Optional[tuple[str, str, Optional[str], str]]:
+        """(role, wordplay type, result, description) from a component analysis, or None if it has no answer."""
+        if Config.STRUCTURED_NODE_OUTPUT:
+            arguments = self._answer_arguments(response, "record_component_analysis", COMPONENT_ANALYSIS_SCHEMA,
+                                               "No description provided")
+            if arguments is None:
+                return None
+            return (arguments["role"], arguments["wordplay_type"], (arguments["result"] or "").upper() or None,
+                    arguments["description"])
+        response_text = str(getattr(response, 'content', response)).strip()
+        if self._requests_tools(response) or not re.search(r"^\s*Role:", response_text, re.MULTILINE):
+            return None
+        return self._parse_component_response(response_text)
+
+    def _target_answer(self, response) -> Optional[tuple[Optional[int], str, str, Optional[str], str]]:
+        """(target index, target text, role, result, description) from a target search, or None if it has no answer."""
+        if Config.STRUCTURED_NODE_OUTPUT:
+            arguments = self._answer_arguments(response, "record_target", TARGET_ANALYSIS_SCHEMA, "")
+            if arguments is None:
+                return None
+            return (arguments["target_index"], arguments["target_text"], arguments["role"],
+                    (arguments["result"] or "").upper() or None, arguments["description"])
+        response_text = str(getattr(response, 'content', response)).strip()
+        if self._requests_tools(response) or not re.search(r"^\s*Target Index:", response_text, re.MULTILINE):
+            return None
+        return self._parse_target_response(response_text)
+
+    def _component_failure(self, response) -> str:
+        """Why a component analysis cannot be used, or "" if it can (or asks for tools)."""
+        answer = self._component_answer(response)
+        if answer is None:
+            return "" if self._requests_tools(response) else "unparseable"
+        return "unknown" if "unknown" in answer[:2] else ""
+
+    def _target_failure(self, response) -> str:
+        """Why a target search cannot be used, or "" if it can (or asks for tools)."""
+        answer = self._target_answer(response)
+        if answer is None:
+            return "" if self._requests_tools(response) else "unparseable"
+        target_idx, _, role, _, _ = answer
+        return "unknown" if target_idx is None or role == "unknown" else ""
+
+    @staticmethod
+    def _component_fields():
+        """Parser for a streamed component analysis: the role and wordplay type, and the result of a synonym or definition."""
+        if Config.STRUCTURED_NODE_OUTPUT:
+            return ArgumentsParser("record_component_analysis", lambda values: {"role", "wordplay_type", "result"} <= set(values))
+
+        def complete(values: Dict[str, str]) -> bool:
+            if "Role" not in values or "Wordplay Type" not in values:
+                return False
+            return "Result" in values or values["Role"].lower() not in ("synonym", "definition")
+        return FieldParser(("Role", "Wordplay Type", "Result", "Description"), complete)
+
+    @staticmethod
+    def _target_fields():
+        """Parser for a streamed target search: everything up to the result of the wordplay."""
+        if Config.STRUCTURED_NODE_OUTPUT:
+            return ArgumentsParser("record_target", lambda values: {"target_index", "target_text", "role", "result"} <= set(values))
+        return FieldParser(("Target Index", "Target Text", "Role", "Wordplay Type", "Result", "Description"),
+                           lambda values: all(label in values for label in ("Target Index", "Target Text", "Role", "Result")))
+
     def _parse_component_response(self, response_text: str) -> tuple[str, str, Optional[str], str]:
         """Parse LLM response for component analysis."""
         role = "unknown"
@@ -224,36 +557,33 @@ class CrypticCrosswordSolver:
         
         return role, wordplay_type, result, description
     
-    def _update_component_analysis(self, state: SolverState, current_component: WordPlayComponent, 
+    def _update_component_analysis(self, state: SolverState, current_component: Component, 
                                  role: str, wordplay_type: str, result: Optional[str], description: str) -> None:
         """Update the current component with analysis results and update state accordingly."""
-        current_component["role"] = role
-        current_component["wordplay_type"] = wordplay_type  
-        current_component["description"] = description
-        current_component["result"] = result
+        current_component.role = role
+        current_component.wordplay_type = wordplay_type  
+        current_component.description = clip_text(description)
+        current_component.result = result
         
         if role != 'unknown' and wordplay_type != 'unknown':
             attempt = state["current_attempt"]
-            if not attempt or not attempt["solution_attempt"]:
+            if not attempt or not attempt.solution_attempt:
                 return
                 
-            solution_attempt = attempt["solution_attempt"]
-            start_idx = current_component["start_pos"]
-            end_idx = current_component["end_pos"]
-            
-            # Append component to the state["word_analyses"][(start_idx, end_idx)] for future reference
-            if (start_idx, end_idx) not in state["word_analyses"]:
-                state["word_analyses"][(start_idx, end_idx)] = []
+            solution_attempt = attempt.solution_attempt
+            start_idx = current_component.start_pos
+            end_idx = current_component.end_pos
             
-            state["word_analyses"][(start_idx, end_idx)].append(current_component)
-            solution_attempt["wordplay_analysis"].append(current_component)
+            # Index the component by its span for future reference
+            state["word_analyses"].add(start_idx, end_idx, current_component.id)
+            solution_attempt.component_ids.append(current_component.id)
             
             if role == 'definition' and result:
-                solution_attempt["definition_part"] = current_component["text"]
-                solution_attempt["solution"] = result.upper()
+                solution_attempt.definition_part = current_component.text
+                solution_attempt.solution = result.upper()
             elif role == "synonym" and result:
                 # Replace the word in the clue with the synonym
-                clue_with_syn = solution_attempt["clue_with_synonyms"]
+                clue_with_syn = solution_attempt.clue_with_synonyms
                 clue_with_syn[start_idx] = result.upper()
                 if end_idx > start_idx:
                     for idx in range(start_idx + 1, end_idx + 1):
@@ -261,21 +591,21 @@ class CrypticCrosswordSolver:
             
             # Remove this word from remaining_word_idxs since it's been analyzed
             for idx in range(start_idx, end_idx + 1):
-                if idx in attempt["remaining_word_idxs"]:
-                    attempt["remaining_word_idxs"].remove(idx)
-                if role != 'synonym' and idx in attempt["possible_target_idxs"]:
-                    attempt["possible_target_idxs"].remove(idx)
+                if idx in attempt.remaining_word_idxs:
+                    attempt.remaining_word_idxs.remove(idx)
+                if role != 'synonym' and idx in attempt.possible_target_idxs:
+                    attempt.possible_target_idxs.remove(idx)
     
     def _analyse_component(self, state: SolverState) -> SolverState:
         """Determine the role and worplay type of the selected word or phrase and finish populating current_component"""
-        if not state["current_attempt"] or not state["current_attempt"]["solution_attempt"]:
+        if not state["current_attempt"] or not state["current_attempt"].solution_attempt:
             return state
             
         attempt = state["current_attempt"]
-        solution_attempt = attempt["solution_attempt"]
-        current_component = attempt["current_component"]
-        if not solution_attempt or not current_component:
+        solution_attempt = attempt.solution_attempt
+        if not solution_attempt or attempt.current_component is None:
             return state
+        current_component = state["components"][attempt.current_component]
         state["stage"] = "analyse_component"
         state_messages = state.get("messages", [])
         tool_results = []
@@ -303,57 +633,38 @@ class CrypticCrosswordSolver:
 
         try:
             messages = [HumanMessage(content=full_prompt)]
-            response = self.llm.invoke(messages)
-            
-            # If we have tool results, process them and provide final response
-            if tool_results:
-                # We have tool results, so process the final response
-                if hasattr(response, 'content'):
-                    response_text = str(response.content).strip()
-                else:
-                    response_text = str(response).strip()
-                
-                # Parse and update the component
-                role, wordplay_type, result, description = self._parse_component_response(response_text)
+            response = self._invoke_cascade(messages, "analyse_component", self._component_failure,
+                                            binding=self._binding("record_component_analysis", tool_results),
+                                            budget=state.get("budget"), parser=self._component_fields)
+            answer = self._component_answer(response)
+
+            if answer is None and not tool_results and self._requests_tools(response):
+                # LLM wants to call tools - add to messages and let tools node handle it
+                state["messages"] = reset_messages([self._tool_request(response)])
+            else:
+                # An unparseable answer leaves the component unknown
+                role, wordplay_type, result, description = answer or ("unknown", "unknown", None, "No analysis returned")
                 self._update_component_analysis(state, current_component, role, wordplay_type, result, description)
-                
                 # Clear messages after processing
-                state["messages"] = []
-            else:
-                # No tool results yet - check if response contains tool calls
-                if hasattr(response, 'additional_kwargs') and 'tool_calls' in response.additional_kwargs:
-                    # LLM wants to call tools - add to messages and let tools node handle it
-                    state["messages"] = messages + [response]
-                else:
-                    # No tool calls needed - process the response directly
-                    if hasattr(response, 'content'):
-                        response_text = str(response.content).strip()
-                    else:
-                        response_text = str(response).strip()
-                    
-                    # Parse and update the component
-                    role, wordplay_type, result, description = self._parse_component_response(response_text)
-                    self._update_component_analysis(state, current_component, role, wordplay_type, result, description)
-                    # Clear messages after processing
-                    state["messages"] = []
+                state["messages"] = reset_messages()
 
         except Exception as e:
             # Fallback if LLM call fails
-            current_component["role"] = "unknown"
-            current_component["wordplay_type"] = "unknown"
-            current_component["description"] = f"Analysis failed: {str(e)}"
+            current_component.role = "unknown"
+            current_component.wordplay_type = "unknown"
+            current_component.description = f"Analysis failed: {str(e)}"
             # Clear messages even on error
-            state["messages"] = []
+            state["messages"] = reset_messages()
         
         return state
     
     def _decide_use_tools(self, state: SolverState) -> str:
         """Decide whether to use tools in component analysis or skip to target search."""
         current_attempt = state["current_attempt"]
-        if not current_attempt or not current_attempt["current_component"]:
+        if not current_attempt or current_attempt.current_component is None:
             return "skip_tools"
         
-        if state["tool_count"] >= state["tool_limit"]:
+        if state["tool_count"] >= state["tool_limit"] or check_budget(state.get("budget")):
             return "skip_tools"
         
         messages = state.get("messages", [])
@@ -361,7 +672,7 @@ class CrypticCrosswordSolver:
         # Check if there are pending tool calls in the messages
         if messages:
             msg = messages[-1]
-            if hasattr(msg, 'additional_kwargs') and 'tool_calls' in msg.additional_kwargs:
+            if getattr(msg, 'tool_calls', None):
                 # Found tool calls - let ToolNode handle them
                 return "use_tools"
         
@@ -400,30 +711,33 @@ class CrypticCrosswordSolver:
         
         return target_idx, target_text, role, result, description
     
-    def _update_target_analysis(self, state: SolverState, indicator_component: WordPlayComponent, 
-                               target_component: WordPlayComponent, target_idx: Optional[int], 
+    def _update_target_analysis(self, state: SolverState, indicator_component: Component, 
+                               target_component: Component, target_idx: Optional[int], 
                                target_text: str, role: str, result: Optional[str], description: str) -> None:
         """Update target component analysis and state accordingly."""
         current_attempt = state["current_attempt"]
         if not current_attempt:
             return
             
-        possible_target_idxs = current_attempt["possible_target_idxs"]
+        possible_target_idxs = current_attempt.possible_target_idxs
         if target_idx is not None and target_idx in possible_target_idxs:
             # Update the indicator component with target information
-            indicator_component["description"] += f" Targeting '{target_text}' at position {target_idx}"                
+            indicator_component.description = clip_text(
+                f"{indicator_component.description} Targeting '{target_text}' at position {target_idx}")
             
-            target_component["text"] = target_text
-            target_component["start_pos"] = target_idx
-            target_component["end_pos"] = target_idx
-            target_component["result"] = result
-            target_component["role"] = role
-            target_component["description"] = description               
+            target_component.text = target_text
+            target_component.start_pos = target_idx
+            target_component.end_pos = target_idx
+            target_component.result = result
+            target_component.role = role
+            target_component.description = clip_text(description)
+            if current_attempt.solution_attempt and target_component.id not in current_attempt.solution_attempt.component_ids:
+                current_attempt.solution_attempt.component_ids.append(target_component.id)
             
-            if target_idx in current_attempt["remaining_word_idxs"]:
-                current_attempt["remaining_word_idxs"].remove(target_idx)
-            if target_idx in current_attempt["possible_target_idxs"]:
-                current_attempt["possible_target_idxs"].remove(target_idx)
+            if target_idx in current_attempt.remaining_word_idxs:
+                current_attempt.remaining_word_idxs.remove(target_idx)
+            if target_idx in current_attempt.possible_target_idxs:
+                current_attempt.possible_target_idxs.remove(target_idx)
     
     def _decide_search_for_target(self, state: SolverState) -> str:
         """Decide if the current component needs a target to be found in the clue."""
@@ -431,16 +745,16 @@ class CrypticCrosswordSolver:
         if not current_attempt:
             return "stop"
         
-        solution_attempt = current_attempt["solution_attempt"]
-        if not solution_attempt or not solution_attempt["wordplay_analysis"]:
+        solution_attempt = current_attempt.solution_attempt
+        if not solution_attempt or not solution_attempt.component_ids:
             return "stop"
         
-        current_component = current_attempt["current_component"]
-        if not current_component:
+        if current_attempt.current_component is None:
             return "stop"
+        current_component = state["components"][current_attempt.current_component]
         
         # If the component is an indicator, we need to find its target
-        if current_component["role"] == "indicator":
+        if current_component.role == "indicator":
             return "continue"
         else:
             return "stop"
@@ -448,34 +762,29 @@ class CrypticCrosswordSolver:
     def _find_target(self, state: SolverState) -> SolverState:
         """Find the target component for the current indicator."""
         current_attempt = state["current_attempt"]
-        if not current_attempt or not current_attempt["current_component"]:
+        if not current_attempt or current_attempt.current_component is None:
             return state
         
-        solution_attempt = current_attempt["solution_attempt"]
+        solution_attempt = current_attempt.solution_attempt
         if not solution_attempt:
             return state
         
-        current_component = current_attempt["current_component"]
-        if not current_component or current_component["role"] not in ["indicator", "target"]:
+        current_component = state["components"][current_attempt.current_component]
+        if current_component.role not in ["indicator", "target"]:
             return state
         
-        if current_component["targeted_by"] is not None:
-            indicator_component = current_component["targeted_by"]
+        if current_component.targeted_by is not None:
+            indicator_component = state["components"][current_component.targeted_by]
             target_component = current_component
         else:
             indicator_component = current_component
-            target_component = WordPlayComponent(
-                text="",
-                start_pos=0,
-                end_pos=0,
+            target_component = new_component(
+                state, "", 0, 0,
                 role="target",
-                wordplay_type=indicator_component["wordplay_type"],
-                targeted_by=indicator_component,
-                result=None,
-                description="",
-                messages=[]
+                wordplay_type=indicator_component.wordplay_type,
+                targeted_by=indicator_component.id
             )
-            current_attempt["current_component"] = target_component
+            current_attempt.current_component = target_component.id
         
         state["stage"] = "find_target"
 
@@ -503,78 +812,92 @@ class CrypticCrosswordSolver:
             return state 
         try:
             messages_to_send = [HumanMessage(content=prompt)]
-            response = self.llm.invoke(messages_to_send)
-            
-            # If we have tool results, process them and provide final response
-            if tool_results:
-                state["tool_count"] += 1
-                # We have tool results, so process the final response
-                response_text = str(response.content).strip()
-                
-                # Parse and update the target
-                target_idx, target_text, role, result, description = self._parse_target_response(response_text)
-                self._update_target_analysis(state, indicator_component, target_component, 
-                                           target_idx, target_text, role, result, description)
-                
-                # Clear messages after processing
-                state["messages"] = []
+            response = self._invoke_cascade(messages_to_send, "find_target", self._target_failure,
+                                            binding=self._binding("record_target", tool_results),
+                                            budget=state.get("budget"), parser=self._target_fields)
+            answer = self._target_answer(response)
+
+            if answer is None and not tool_results and self._requests_tools(response):
+                # LLM wants to call tools - add to messages and let tools node handle it
+                state["messages"] = reset_messages([self._tool_request(response)])
             else:
-                state["tool_count"]  = 0
-                # No tool results yet - check if response contains tool calls
-                if hasattr(response, 'additional_kwargs') and 'tool_calls' in response.additional_kwargs:
-                    # LLM wants to call tools - add to messages and let tools node handle it
-                    state["messages"] = messages_to_send + [response]
-                else:
-                    # No tool calls needed - process the response directly
-                    response_text = str(response.content).strip()
-                    
-                    # Parse and update the target
-                    target_idx, target_text, role, result, description = self._parse_target_response(response_text)
-                    self._update_target_analysis(state, indicator_component, target_component, 
-                                               target_idx, target_text, role, result, description)
-                    
-                    # Clear messages after processing
-                    state["messages"] = []
+                # Without a parseable answer no target is recorded
+                target_idx, target_text, role, result, description = answer or (None, "", "unknown", None, "")
+                self._update_target_analysis(state, indicator_component, target_component,
+                                             target_idx, target_text, role, result, description)
+                # Clear messages after processing
+                state["messages"] = reset_messages()
         
         except Exception as e:
             # Fallback: mark indicator as processed but don't create target
-            indicator_component["description"] = f"Target identification failed: {str(e)}"
-            current_attempt["current_component"] = None
+            indicator_component.description = f"Target identification failed: {str(e)}"
+            current_attempt.current_component = None
             # Clear messages even on error
-            state["messages"] = []
+            state["messages"] = reset_messages()
         
         return state
     
     def _verify_solution(self, state: SolverState) -> SolverState:
-        """Verify the proposed solution."""
+        """Verify the proposed solution, then decide whether another attempt is worth making."""
+        proposed = [attempt.solution for attempt in state["solution_attempts"]]
+        state = self._check_solution(state)
+
+        if state["current_attempt"]:
+            attempt = state["current_attempt"].solution_attempt
+            is_new_answer = fits(state, attempt) and attempt.solution not in proposed
+            state["stop_reason"] = record_attempt(state, attempt, is_new_answer)
+        exhausted = check_budget(state.get("budget"))
+        if exhausted and not state["stop_reason"]:
+            # Out of budget: return the best answer so far, or at least the analysis done
+            state["stop_reason"] = f"budget_{exhausted}"
+            state["final_solution"] = best_candidate(state)
+        if state["stop_reason"]:
+            print(f"Stopping after {state['attempt_count']} attempt(s): {state['stop_reason']}, "
+                  f"confidence {state['confidence']:.2f}")
+        elif Config.ATTEMPT_REUSE:
+            # Start the next attempt from the analyses this one's failure does not contradict
+            state["current_attempt"] = seed_attempt(state, state["current_attempt"])
+            metrics.increment("reused_components", len(state["current_attempt"].solution_attempt.component_ids))
+        else:
+            state["current_attempt"] = None  # Start the next attempt afresh
+        return state
+
+    def _check_solution(self, state: SolverState) -> SolverState:
+        """Run the objective and dictionary checks on the current attempt's solution."""
         if not state["current_attempt"]:
             state["solved"] = False
             return state
         
-        solution = state["current_attempt"]["solution_attempt"]
+        solution = state["current_attempt"].solution_attempt
         
         # Objective tests
-        if not solution or not solution["solution"] or not solution["definition_part"]:
+        if not solution or not solution.solution or not solution.definition_part:
             state["solved"] = False
             return state
         state["stage"] = "verify_solution"
         state["solution_attempts"].append(solution)
 
-        if state["target_length"] and len(solution["solution"]) != state["target_length"]:
+        if state["target_length"] and len(solution.solution) != state["target_length"]:
             state["solved"] = False
             return state
-        if not check_given_letters(solution["solution"], state["given_letters"]):
+        if not check_given_letters(solution.solution, state["given_letters"]):
             state["solved"] = False
             return state
         
-        wordplay_analysis = solution["wordplay_analysis"]
+        wordplay_analysis = [state["components"][cid] for cid in solution.component_ids]
         for component in wordplay_analysis:
             # TODO: Test objective use of each wordplay component in constructing the solution
             pass
         
         # Test definition
-        definition = solution["definition_part"]
-        dictionary_meanings = get_meanings(solution["solution"])
+        definition = solution.definition_part
+        try:
+            dictionary_meanings = call_with_timeout(
+                lambda: cached_invoke(get_meanings, {"word": solution.solution}, "get_meanings"), Config.TOOL_TIMEOUT,
+                "get_meanings")
+        except TimeoutError as e:
+            print(f"Verification {e}")
+            dictionary_meanings = None
         if not definition or not dictionary_meanings:
             state["solved"] = False
             return state
@@ -582,7 +905,6 @@ class CrypticCrosswordSolver:
         # TODO: Call LLM to verify if the definition is a semantic match for one of the solution meanings
         
         # Test validity of wordplay
-        wordplay_analysis = solution["wordplay_analysis"]
         for component in wordplay_analysis:
             # TODO: Call LLM to verify if the wordplay selection is valid, 
             pass
@@ -602,32 +924,89 @@ class CrypticCrosswordSolver:
                 return "continue"
             
     def decide_give_up(self, state: SolverState) -> bool:
-        """Decide whether to continue iterating or finalize."""
-        # TODO: add better logic for deciding to give up
-        return len(state["solution_attempts"]) >= state["max_attempts"]
+        """Decide whether to continue iterating or finalize, from the stopping policy applied in _verify_solution."""
+        return bool(state["stop_reason"])
     
-    def solve(self, clue: str, given_letters: dict[int, str], target_length: Optional[int] = None, max_iterations: int = 3) -> Dict:
-        """Solve a cryptic crossword clue."""
-
-        initial_state = SolverState(
-            clue=clue,
-            clue_words=clue.split(),
-            target_length=target_length,
-            given_letters=given_letters,
-            solved=False,
-            final_solution=None,
-            max_attempts=max_iterations,
-            current_attempt=None,
-            solution_attempts=[],
-            word_analyses={},
-            stage="initial",
-            tool_count=0,
-            tool_limit=3,
-            messages=[]
-        )
-        
-        # Run the graph
-        final_state = self.graph.invoke(initial_state)
+    def solve(self, clue: str, given_letters: dict[int, str], target_length: Optional[int] = None, max_iterations: int = 3,
+              solve_id: Optional[str] = None, budget: Optional[Dict] = None,
+              on_progress: Optional[Callable[[SolverStateDict], None]] = None) -> SolverStateDict:
+        """
+        Solve a cryptic crossword clue.
+        The budget limits the solve's seconds, LLM calls and tokens (see budget.new_budget), using the Config
+        defaults for any not given. A solve that runs out returns its best candidate so far.
+        With checkpointing enabled, a solve_id that was interrupted resumes from its last completed superstep with
+        this call's budget, and a solve_id that already finished returns its final state without re-running.
+        If on_progress is given, it is called with the exported state after each step of the graph.
+        """
+
+        initial_state = new_solver_state(clue, given_letters, target_length, max_iterations, new_budget(**(budget or {})))
+        
+        with solve_scope():  # Tool results are memoized for the rest of the solve
+            # Look up the clue's words while the first LLM call is made
+            prefetches = self.tool_node.prefetch("get_meanings", prefetch_lookups(clue)) if Config.PREFETCH else []
+            try:
+                if self.checkpointer is None:
+                    # Run the graph
+                    final_state = self._run_graph(initial_state, on_progress=on_progress)
+                else:
+                    final_state = self._run_checkpointed(initial_state, solve_id or uuid.uuid4().hex, on_progress)
+            finally:
+                for future in prefetches:
+                    future.cancel()
         
         # Convert to the expected output format
+        return export_state(final_state)
+
+    def _run_graph(self, graph_input, config: Optional[Dict] = None, on_progress=None) -> SolverState:
+        """Run the graph to the end, passing the exported state after each step to on_progress if given."""
+        if on_progress is None:
+            return self.graph.invoke(graph_input, config)
+        state = None
+        for state in self.graph.stream(graph_input, config, stream_mode="values"):
+            on_progress(export_state(state))
+        return state
+
+    def _run_checkpointed(self, initial_state: SolverState, solve_id: str, on_progress=None) -> SolverState:
+        """Run the graph under the checkpointer, resuming the solve if it was interrupted."""
+        config = {"configurable": {"thread_id": solve_id}}
+        snapshot = self.graph.get_state(config)
+        try:
+            if snapshot.next:
+                print(f"Resuming solve {solve_id} before {', '.join(snapshot.next)}")
+                self.checkpointer.record_solve(solve_id, initial_state["clue"], "running")
+                # The checkpointed budget's deadline ran while the solve was interrupted, so it resumes on this request's
+                self.graph.update_state(config, {"budget": initial_state["budget"]})
+                final_state = self._run_graph(None, config, on_progress)
+            elif snapshot.values:
+                return snapshot.values  # Already finished
+            else:
+                self.checkpointer.record_solve(solve_id, initial_state["clue"], "running")
+                final_state = self._run_graph(initial_state, config, on_progress)
+        except BaseException:
+            self.checkpointer.flush()
+            self.checkpointer.record_solve(solve_id, initial_state["clue"], "interrupted")
+            raise
+
+        self.checkpointer.flush()
+        self.checkpointer.record_solve(solve_id, initial_state["clue"], "finished")
+        self.checkpointer.maybe_prune()
         return final_state
+
+    def solve_history(self, solve_id: str) -> List[Dict]:
+        """Summarise each checkpoint of a solve, newest first. Empty if checkpointing is disabled."""
+        if self.checkpointer is None:
+            return []
+        history = []
+        for snapshot in self.graph.get_state_history({"configurable": {"thread_id": solve_id}}):
+            values = snapshot.values
+            history.append({
+                "checkpoint_id": snapshot.config["configurable"]["checkpoint_id"],
+                "step": (snapshot.metadata or {}).get("step"),
+                "created_at": snapshot.created_at,
+                "next": list(snapshot.next),
+                "stage": values.get("stage"),
+                "attempts": len(values.get("solution_attempts", [])),
+                "components": len(values.get("components", [])),
+                "solved": values.get("solved")
+            })
+        return history
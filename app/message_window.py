@@ -0,0 +1,119 @@
+"""
+Message-window policy for the graph state.
+The only messages a node needs are the pending tool exchange: the LLM turn that requested tools and the
+tool results answering it. Older messages are dropped, large tool outputs are replaced by compact summaries
+(the full output is kept in a side store), and the window is held under a hard size cap.
+
+Tool results also reach the rest of the state through the component analyses the LLM writes from them, which
+are kept across attempts. Their descriptions are clipped to the same per-output bound (see clip_text), so the
+state only grows with the number of components analysed, which max_attempts bounds.
+"""
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from config import Config
+
+SIDE_STORE_SIZE = 256  # Full tool outputs kept for reference, across all solves in this process
+
+_side_store = OrderedDict()
+_side_store_lock = threading.Lock()
+
+
+class ReplaceMessages(list):
+    """Returned by a node in place of a message list to replace the message window rather than append to it."""
+
+
+def reset_messages(messages=()) -> ReplaceMessages:
+    """Start a fresh message window holding only the given messages."""
+    return ReplaceMessages(messages)
+
+
+def store_tool_output(content: str) -> str:
+    """Keep a full tool output in the side store and return its reference."""
+    ref = f"tool-output:{uuid.uuid4().hex[:12]}"
+    with _side_store_lock:
+        _side_store[ref] = content
+        while len(_side_store) > SIDE_STORE_SIZE:
+            _side_store.popitem(last=False)
+    return ref
+
+
+def get_tool_output(ref: str) -> Optional[str]:
+    """Fetch a full tool output by reference, if it has not been evicted."""
+    with _side_store_lock:
+        return _side_store.get(ref)
+
+
+def summarise_tool_output(content: str, max_chars: int, max_items: int) -> str:
+    """Compact summary of a tool output: long lists keep their first items, anything else is truncated."""
+    if len(content) <= max_chars:
+        return content
+    ref = store_tool_output(content)
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        data = None
+
+    if isinstance(data, list):
+        return f"{json.dumps(data[:max_items])} ... ({len(data) - max_items} more, full output: {ref})"
+    if isinstance(data, dict):
+        summary = {key: value[:max_items] if isinstance(value, list) else value for key, value in data.items()}
+        summary_text = json.dumps(summary)
+        if len(summary_text) <= max_chars:
+            return f"{summary_text} (lists truncated to {max_items} items, full output: {ref})"
+    return f"{content[:max_chars]} ... (truncated, full output: {ref})"
+
+
+def clip_text(text: str, max_chars: Optional[int] = None) -> str:
+    """Text cut down to max_chars (Config.TOOL_OUTPUT_MAX_CHARS by default), for text kept in state across attempts."""
+    max_chars = Config.TOOL_OUTPUT_MAX_CHARS if max_chars is None else max_chars
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]} ... (truncated)"
+
+
+def _has_tool_calls(message) -> bool:
+    return bool(getattr(message, "tool_calls", None)) or "tool_calls" in getattr(message, "additional_kwargs", {})
+
+
+def _is_tool_message(message) -> bool:
+    return type(message).__name__ == "ToolMessage" or hasattr(message, "tool_call_id")
+
+
+def _compact(message, max_chars: int):
+    if not _is_tool_message(message) or len(str(message.content)) <= max_chars:
+        return message
+    content = summarise_tool_output(str(message.content), max_chars, Config.TOOL_OUTPUT_SUMMARY_ITEMS)
+    return message.model_copy(update={"content": content})
+
+
+def apply_window(messages: list) -> list:
+    """Keep only the latest tool exchange, with tool outputs compacted and the total held under the cap."""
+    start = 0
+    for i in range(len(messages) - 1, -1, -1):
+        if _has_tool_calls(messages[i]):
+            start = i
+            break
+    window = [_compact(message, Config.TOOL_OUTPUT_MAX_CHARS) for message in messages[start:]]
+
+    # Hard cap: share the budget between the tool outputs if the window is still too large
+    total = sum(len(str(message.content)) for message in window)
+    tool_messages = sum(1 for message in window if _is_tool_message(message))
+    if total > Config.MAX_MESSAGE_CHARS and tool_messages:
+        per_tool = max(200, Config.MAX_MESSAGE_CHARS // (tool_messages + 1))
+        window = [_compact(message, per_tool) for message in window]
+    return window
+
+
+def window_messages(left: list, right: list) -> list:
+    """Reducer for SolverState.messages implementing the window policy."""
+    # langgraph is imported on first use so the state types stay cheap to import
+    from langgraph.graph.message import add_messages
+    if isinstance(right, ReplaceMessages):
+        merged = add_messages([], list(right))
+    else:
+        merged = add_messages(left, right)
+    return apply_window(merged)
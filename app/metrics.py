@@ -0,0 +1,61 @@
+"""
+In-process counters for LLM usage, reported by the benchmark.
+LLM calls are grouped by the node (or legacy stage) that made them, and by model.
+"""
+import threading
+from collections import defaultdict
+from typing import Optional
+
+_lock = threading.Lock()
+_llm_calls = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "seconds": 0.0})
+_model_calls = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "seconds": 0.0})
+_counters = defaultdict(int)
+
+
+def record_llm_call(node: str, prompt_tokens: int = 0, completion_tokens: int = 0, cached_tokens: int = 0,
+                    seconds: Optional[float] = None, model: Optional[str] = None) -> None:
+    """Record one LLM call and the token usage reported by the provider."""
+    with _lock:
+        for stats in (_llm_calls[node], _model_calls[model or "unknown"]):
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cached_tokens"] += cached_tokens
+            if seconds is not None:
+                stats["seconds"] += seconds
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """Increment a named counter."""
+    with _lock:
+        _counters[name] += amount
+
+
+def _with_cached_ratio(stats: dict) -> dict:
+    stats["cached_ratio"] = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+    return stats
+
+
+def snapshot() -> dict:
+    """
+    Return a copy of all counters, with LLM usage per node, per model and in total, and the share of prompt tokens
+    served from cache.
+    """
+    with _lock:
+        nodes = {node: dict(stats) for node, stats in _llm_calls.items()}
+        models = {model: _with_cached_ratio(dict(stats)) for model, stats in _model_calls.items()}
+        counters = dict(_counters)
+    totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "seconds": 0.0}
+    for stats in nodes.values():
+        for key in totals:
+            totals[key] += stats[key]
+        _with_cached_ratio(stats)
+    return {"llm": nodes, "llm_models": models, "llm_total": _with_cached_ratio(totals), "counters": counters}
+
+
+def reset() -> None:
+    """Clear all counters."""
+    with _lock:
+        _llm_calls.clear()
+        _model_calls.clear()
+        _counters.clear()
@@ -2,12 +2,12 @@
 Hardcoded fake LangGraph state for UI testing.
 This provides realistic example data as if it came from the actual algorithm.
 """
-from .state import SolverState, CurrentAttemptState, SolutionAttempt, WordPlayComponent
+from .state import SolverStateDict, SolutionAttempt, WordPlayComponent
 from .state_transformer import transform_state_to_ui_format
 
 
 def get_mock_langgraph_state(clue: str = "Initially irritated, raised uproar about drink that's tasteless", 
-                            target_length: int = 7) -> SolverState:
+                            target_length: int = 7) -> SolverStateDict:
     """
     Returns a hardcoded fake LangGraph state that looks like it came from the actual solver.
     You can modify the data below to test different UI scenarios.
@@ -172,14 +172,17 @@ def get_mock_langgraph_state(clue: str = "Initially irritated, raised uproar abo
         clue_with_synonyms=["Initially", "irritated", "raised", "DIN", "about", "SIP", "that's", "tasteless"]
     )
     
-    mock_state = SolverState(
+    mock_state = SolverStateDict(
         clue=clue,
         clue_words=clue.split(),
         target_length=target_length,
         given_letters={2: "N", 5: "P"},
         solved=True,
         final_solution=attempt3,
+        confidence=0.333,
+        stop_reason="solved",
         max_attempts=3,
+        attempt_count=3,
         current_attempt=None,
         solution_attempts=[attempt1, attempt2],
         word_analyses={},
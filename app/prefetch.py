@@ -0,0 +1,47 @@
+"""
+Speculative dictionary lookups at the start of a solve.
+The LLM's tool calls and the verification step look words up one blocking call at a time, and mostly ask about
+the clue's own words and its likely definitions. As soon as a solve starts, those lookups are made in the
+background (see ToolExecutor.prefetch) into the solve's tool cache (app/tool_cache.py), while the first LLM call
+is in flight, so the later calls find them warm.
+
+Looked up: every clue word except link words and words too short to be worth a call, and the phrases of up to
+Config.PREFETCH_SPAN_WORDS words at either end of the clue, where the definition sits. Words and phrases are
+looked up lower-cased, and the tool cache keys get_meanings by the lower-cased word, so a later lookup of the same
+word in any case finds the prefetched result. Abbreviations need no prefetch, since the lexicons
+(app/data/lexicons.json) are already in memory.
+"""
+from typing import Dict, List
+
+from config import Config
+from .span_scheduler import get_lexicons, normalise
+
+MIN_WORD_LETTERS = 3
+
+
+def definition_spans(words: List[str], max_words: int) -> List[str]:
+    """The phrases of two to max_words words at either end of the clue."""
+    spans = []
+    for n in range(2, min(max_words, len(words) - 1) + 1):
+        spans.append(" ".join(words[:n]))
+        spans.append(" ".join(words[-n:]))
+    return spans
+
+
+def prefetch_lookups(clue: str) -> List[Dict]:
+    """Arguments of the get_meanings calls worth making before the solve asks for them, most likely first."""
+    words = [word for word in normalise(clue).split() if word]
+    if not words:
+        return []
+    lexicons = get_lexicons()
+    lookups = []
+    # The definition is at an end of the clue, so the words there go first
+    for word in [words[0], words[-1]] + words[1:-1]:
+        if len(word) >= MIN_WORD_LETTERS and not lexicons.is_link_word(word) and word not in lookups:
+            lookups.append(word)
+    for phrase in definition_spans(words, Config.PREFETCH_SPAN_WORDS):
+        edges = phrase.split()
+        # A phrase starting or ending with a link word is a definition plus its link
+        if not lexicons.is_link_word(edges[0]) and not lexicons.is_link_word(edges[-1]) and phrase not in lookups:
+            lookups.append(phrase)
+    return [{"word": lookup} for lookup in lookups[:Config.PREFETCH_MAX_LOOKUPS]]
@@ -1,124 +1,288 @@
+import json
+import re
+import threading
 from typing import List, Dict, Optional, Tuple
-from .state import SolverState, WordPlayComponent
+from config import Config
+from .state import SolverState, Component
+from .prompt_templates import get_template
+from .utils import check_given_letters
+from .warmup import register_warmup
 
-def generate_analyse_component_prompt(state: SolverState, tool_results: List[Dict]) -> str:    
+# Context section priorities: lower numbers are kept first when the prompt is over its token ceiling
+PRIORITY_REQUIRED = 0  # The clue, the word or candidates being analysed and the chosen solution
+PRIORITY_TOOL_RESULTS = 1
+PRIORITY_OTHER_COMPONENTS = 2
+PRIORITY_PREVIOUS_ANALYSES = 3
+
+# Token budgets of the sections that grow with the solve, on top of the overall ceiling
+PREVIOUS_ANALYSES_MAX_TOKENS = 200
+OTHER_COMPONENTS_MAX_TOKENS = 300
+
+# How the per-component nodes are told to answer, by whether they answer with a function call
+# (Config.STRUCTURED_NODE_OUTPUT) or in text lines
+RESPONSE_FORMATS = {
+    ("analyse_comp_prompt", True): "Record your analysis with the record_component_analysis function.",
+    ("analyse_comp_prompt", False): "Respond in the format:\nRole: [role]\nWordplay Type: [wordplay_type]\n"
+                                    "Result: [result]\nDescription: [description]",
+    ("find_target_prompt", True): "When ready to provide your final answer, record it with the record_target function.",
+    ("find_target_prompt", False): "When ready to provide your final answer, respond in this exact format:\n"
+                                   "Target Index: [number]\nTarget Text: [the actual word/phrase]\nRole: [target/synonym]\n"
+                                   "Wordplay Type: [the wordplay type of the indicator]\n"
+                                   "Result: [result of applying the wordplay]\n"
+                                   "Description: [brief explanation of the wordplay operation]",
+}
+
+TOKENIZER_ENCODING = "o200k_base"  # Encoding used by gpt-4o
+OMISSION_TOKENS = 12  # Reserved for the note added when a section is truncated
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def _get_tokenizer():
+    """Local tokenizer for counting prompt tokens, or None if tiktoken or its encoding file is unavailable."""
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        with _tokenizer_lock:
+            if not _tokenizer_loaded:
+                try:
+                    import tiktoken
+                    _tokenizer = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception as e:  # Not installed, or the encoding could not be downloaded
+                    print(f"Tokenizer unavailable, estimating prompt tokens from length: {e}")
+                _tokenizer_loaded = True
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text, estimated at ~4 characters per token if no tokenizer is available."""
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return (len(text) + 3) // 4
+    return len(tokenizer.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens."""
+    if max_tokens <= 0:
+        return ""
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return text[:max_tokens * 4]
+    tokens = tokenizer.encode(text)
+    return text if len(tokens) <= max_tokens else tokenizer.decode(tokens[:max_tokens])
+
+
+register_warmup("tokenizer", _get_tokenizer)
+
+
+def _rank_tool_items(items: list, given_letters: dict[int, str]) -> list:
+    """Order the items of a list tool result (e.g. anagram hits), most plausible first."""
+    def score(item):
+        if not isinstance(item, str):
+            return 0
+        fits_givens = not given_letters or (len(item) > max(given_letters) and check_given_letters(item, given_letters))
+        unpronounceable = re.search(r'[bcdfghjklmnpqrstvwxyz]{4,}', item.lower()) is not None
+        return (not fits_givens) + unpronounceable
+    return sorted(items, key=score)
+
+
+def summarise_tool_result(result, max_items: int, given_letters: dict[int, str]) -> str:
+    """Keep only the top max_items entries of list results (and of lists inside dict results)."""
+    try:
+        data = json.loads(result) if isinstance(result, str) else result
+    except ValueError:
+        return str(result)
+    if isinstance(data, list):
+        if len(data) <= max_items:
+            return json.dumps(data)
+        top = _rank_tool_items(data, given_letters)[:max_items]
+        return f"{json.dumps(top)} (top {max_items} of {len(data)})"
+    if isinstance(data, dict):
+        return json.dumps({key: value[:max_items] if isinstance(value, list) else value for key, value in data.items()})
+    return str(result)
+
+
+class ContextBuilder:
+    """
+    Assembles the per-call context of a prompt from prioritised sections under a token budget.
+    Sections are emitted in the order they are added. Each section is first cut to its own budget, then the
+    total budget is shared out in priority order, so lower-priority sections are truncated or dropped first.
+    """
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self.sections: List[Tuple[int, Optional[str], List[str], Optional[int]]] = []
+
+    def add(self, lines: List[str], priority: int, header: Optional[str] = None, max_tokens: Optional[int] = None) -> bool:
+        """Add a section of lines under an optional header. Returns False (and adds nothing) if lines is empty."""
+        if not lines:
+            return False
+        self.sections.append((priority, header, list(lines), max_tokens))
+        return True
+
+    @staticmethod
+    def _fit(header: Optional[str], lines: List[str], budget: int) -> List[str]:
+        """Keep whole lines from the start of the section within the budget, noting how many were left out."""
+        if len(lines) > 1:
+            budget -= OMISSION_TOKENS  # Room for the omission note
+        kept = []
+        used = count_tokens(header) + 1 if header else 0
+        for line in lines:
+            cost = count_tokens(line) + 1
+            if used + cost > budget:
+                if not kept and budget - used > OMISSION_TOKENS:
+                    # A long first line is cut rather than dropped
+                    kept.append(truncate_to_tokens(line, budget - used - OMISSION_TOKENS) + " ...")
+                break
+            kept.append(line)
+            used += cost
+        if not kept:
+            return []
+        if len(kept) < len(lines):
+            kept.append(f"  ... ({len(lines) - len(kept)} more omitted)")
+        return ([header] if header else []) + kept
+
+    def build(self) -> str:
+        """Join the sections, truncated to fit the budget."""
+        remaining = self.max_tokens
+        fitted = {}
+        for index in sorted(range(len(self.sections)), key=lambda i: self.sections[i][0]):
+            _, header, lines, section_budget = self.sections[index]
+            budget = remaining if section_budget is None else min(section_budget, remaining)
+            fitted[index] = self._fit(header, lines, budget)
+            remaining -= sum(count_tokens(line) + 1 for line in fitted[index])
+        return "\n".join(line for index in range(len(self.sections)) for line in fitted[index])
+
+
+def _tool_result_lines(tool_results: List[Dict], given_letters: dict[int, str]) -> List[str]:
+    return [
+        f"  {result['tool_name']}: {summarise_tool_result(result['result'], Config.PROMPT_TOOL_RESULT_ITEMS, given_letters)}"
+        for result in tool_results
+    ]
+
+
+def _response_format(template_name: str) -> str:
+    return RESPONSE_FORMATS[template_name, Config.STRUCTURED_NODE_OUTPUT]
+
+
+def _context_budget(template_name: str, **fields) -> int:
+    """Tokens left for the context once the template's static prefix and the other fields are counted."""
+    overhead = count_tokens(get_template(template_name).render(context="", **fields))
+    return max(0, Config.PROMPT_MAX_TOKENS - overhead)
+
+
+def generate_analyse_component_prompt(state: SolverState, tool_results: List[Dict]) -> str:
     # Give LLM context including clue, solved components, ideas relating to the current component which are sourced from state["word_analyses"][word_idx]
     if not state["current_attempt"]:
             return ""
-            
+
     attempt = state["current_attempt"]
-    solution_attempt = attempt["solution_attempt"]
+    solution_attempt = attempt.solution_attempt
     if not solution_attempt:
         return ""
-        
-    current_component = attempt["current_component"]
-    if not current_component:
+
+    if attempt.current_component is None:
         return ""
-    
-    clue_text = ' '.join(filter(lambda s: s!= "", solution_attempt["clue_with_synonyms"]))
+    components = state["components"]
+    current_component = components[attempt.current_component]
+
+    clue_text = ' '.join(filter(lambda s: s!= "", solution_attempt.clue_with_synonyms))
     target_length = state["target_length"]
     given_letters = state["given_letters"]
 
-    chosen_solution = solution_attempt["solution"]
-    definition = solution_attempt["definition_part"]
+    chosen_solution = solution_attempt.solution
+    definition = solution_attempt.definition_part
+
+    start_idx = current_component.start_pos
+    end_idx = current_component.end_pos
 
-    start_idx = current_component["start_pos"]
-    end_idx = current_component["end_pos"]
-    
     # Get previous analyses for this word if any exist
-    previous_analyses = state["word_analyses"].get((start_idx, end_idx), [])
-    
-    # Build context for the LLM
-    context_parts = [
+    previous_analyses = [components[cid] for cid in state["word_analyses"].get(start_idx, end_idx)]
+
+    # Build the required context for the LLM
+    required = [
         f"Cryptic crossword clue: '{clue_text}'",
-        f"Word being analyzed: '{current_component['text']}'",
+        f"Word being analyzed: '{current_component.text}'",
     ]
 
-    # Add tool results to context if available
-    if tool_results:
-        context_parts.append("Tool Results:")
-        for result in tool_results:
-            context_parts.append(f"  {result['tool_name']}: {result['result']}")
-
-    solution_in_context = False
-    length_in_context = False
     givens_in_context = False
-    previous_analyses_in_context = False
-    other_components_in_context = False
-    
     if chosen_solution and definition:
-        context_parts.append(f"Solution: '{chosen_solution}'")
-        context_parts.append(f"Definition: '{definition}'")
-        solution_in_context = True
+        required.append(f"Solution: '{chosen_solution}'")
+        required.append(f"Definition: '{definition}'")
     else:
         if target_length:
-            context_parts.append(f"Target solution length: {target_length} letters")
-            length_in_context = True
+            required.append(f"Target solution length: {target_length} letters")
         if given_letters:
             given_str = ", ".join([f"position {pos}: '{letter}'" for pos, letter in given_letters.items()])
-            context_parts.append(f"Given letters: {given_str}")
+            required.append(f"Given letters: {given_str}")
             givens_in_context = True
-        
-    if previous_analyses:
-        previous_analyses_in_context = True
-        context_parts.append("Previous analyses of this word:")
-        for i, analysis in enumerate(previous_analyses):
-            context_parts.append(f"  {i+1}. Role: {analysis['role']}, Type: {analysis['wordplay_type']}, Description: {analysis['description']}")
-    
+
     # Add context about other analyzed components
-    if solution_attempt and solution_attempt["wordplay_analysis"]:
-        other_components = [comp for comp in solution_attempt["wordplay_analysis"][:-1] if comp["role"]]
-        if other_components:
-            other_components_in_context = True
-            context_parts.append("Other analyzed components in current attempt:")
-            for comp in other_components:
-                context_parts.append(f"  '{comp['text']}': {comp['role']} ({comp['wordplay_type']})")
-    
-    context = "\n".join(context_parts)
-    definition_line = "" if solution_in_context else "-definition: The straightforward definition part of the clue. This must either appear at the beginning or end of the clue\n"
-    use_givens_line = "" if not givens_in_context else "Your analysis of this component should consider whether the result will help lead to a solution with the correct given letters.\n"
-    use_others_line = "" if not other_components_in_context else "Your analysis of this component should consider how it relates to other analysed components in the current solution attempt.\n"
-    use_previous_line = "" if not previous_analyses_in_context else "You may consider if any of the provided previous analysis of this component is useful for the current solution attempt.\n"
+    other_components = []
+    if solution_attempt and solution_attempt.component_ids:
+        other_components = [components[cid] for cid in solution_attempt.component_ids[:-1] if components[cid].role]
 
-    # The LLM must return structured output in order to populate the role, wordplay type and description of the current component
+    guidance_lines = []
+    if givens_in_context:
+        guidance_lines.append("Your analysis of this component should consider whether the result will help lead to a solution with the correct given letters.\n")
+    if other_components:
+        guidance_lines.append("Your analysis of this component should consider how it relates to other analysed components in the current solution attempt.\n")
+    if previous_analyses:
+        guidance_lines.append("You may consider if any of the provided previous analysis of this component is useful for the current solution attempt.\n")
+    guidance = "".join(guidance_lines) + "\n" if guidance_lines else ""
+
+    tool_tail = "\n\nBased on these tool results, provide your final analysis." if tool_results else ""
+    tool_tail += "\n" + _response_format("analyse_comp_prompt")
+
+    # Static instructions first and per-call context last, so the prompt prefix is cached by the provider.
+    # The context is held under PROMPT_MAX_TOKENS, dropping previous analyses first and then other components.
     try:
-        with open("app/prompts/analyse_comp_prompt.txt") as f:
-            system_prompt = f.read().strip().format(
-                definition_line=definition_line,
-                use_givens_line=use_givens_line,
-                use_others_line=use_others_line,
-                use_previous_line=use_previous_line
-            )
+        budget = _context_budget("analyse_comp_prompt", guidance=guidance, word=current_component.text) - count_tokens(tool_tail)
     except FileNotFoundError:
-        print("Error: Prompt file not found. Please ensure 'analyse_comp_sys_nt.txt' exists in the prompts directory.")
+        print("Error: Prompt file not found. Please ensure 'analyse_comp_prompt.txt' exists in the prompts directory.")
         return ""
-    
-    user_prompt = f"{context}\n\nAnalyze the word '{current_component['text']}' within the clue and provide its role, wordplay_type, and description."
-    
-    # Make LLM call with tools available through the message system
-    full_prompt = f"{system_prompt}\n\n{user_prompt}\n\nRespond in the format:\nRole: [role]\nWordplay Type: [wordplay_type]\nResult: [result]\nDescription: [description]\n\nYou have access to these tools that may help with your analysis:\n- generate_anagrams(text): Generate anagrams from letters\n- get_meanings(word): Get word meanings  \n- find_hidden_words(phrase, target_length): Find hidden words in phrases\n- reverse_word(word, givens): Reverse a word\n- check_given_letters_tool(word): Check if a proposed solution has the correct given letters\n\nIf you need to use tools, make the tool calls first, then provide your analysis based on the results."
 
-    if tool_results:
-        # If tool results are available, include them in the final prompt
-        tool_context = "\n".join([f"Tool result: {result['result']}" for result in tool_results])
-        full_prompt += f"\n\n{tool_context}\n\nBased on these tool results, provide your final analysis:"
-    
-    return full_prompt
+    builder = ContextBuilder(budget)
+    builder.add(required, PRIORITY_REQUIRED)
+    builder.add(_tool_result_lines(tool_results, given_letters), PRIORITY_TOOL_RESULTS, header="Tool Results:")
+    rejected = {attempt.solution for attempt in state["solution_attempts"] if attempt.solution}
+    builder.add(
+        [f"  {i+1}. Role: {analysis.role}, Type: {analysis.wordplay_type}, Description: {analysis.description}"
+         + (f" (gave the rejected answer {analysis.result})" if analysis.result and analysis.result.upper() in rejected else "")
+         for i, analysis in enumerate(previous_analyses)],
+        PRIORITY_PREVIOUS_ANALYSES, header="Previous analyses of this word:", max_tokens=PREVIOUS_ANALYSES_MAX_TOKENS
+    )
+    builder.add(
+        [f"  '{comp.text}': {comp.role} ({comp.wordplay_type})" for comp in other_components],
+        PRIORITY_OTHER_COMPONENTS, header="Other analyzed components in current attempt:",
+        max_tokens=OTHER_COMPONENTS_MAX_TOKENS
+    )
+
+    # The LLM must return structured output in order to populate the role, wordplay type and description of the current component
+    full_prompt = get_template("analyse_comp_prompt").render(
+        context=builder.build(),
+        guidance=guidance,
+        word=current_component.text
+    )
+    return full_prompt + tool_tail
 
 
-def generate_find_target_prompt(state: SolverState, indicator_component: WordPlayComponent, tool_results: List[Dict]) -> str:
+def generate_find_target_prompt(state: SolverState, indicator_component: Component, tool_results: List[Dict]) -> str:
      # Get available target candidates from remaining words and synonyms
      # TODO: Tidy this up and add conditional prompt sentences based on context
     current_attempt = state["current_attempt"]
     if not current_attempt:
         return ""
-    solution_attempt = current_attempt["solution_attempt"]
+    solution_attempt = current_attempt.solution_attempt
     if not solution_attempt:
         return ""
-    
+
     clue_words = state["clue_words"]
-    possible_target_idxs = current_attempt["possible_target_idxs"]
-    
+    components = state["components"]
+    possible_target_idxs = current_attempt.possible_target_idxs
+
     # Build candidate text for LLM analysis
     candidates = []
     for idx in possible_target_idxs:
@@ -126,57 +290,93 @@ def generate_find_target_prompt(state: SolverState, indicator_component: WordPla
             candidates.append(f"{idx}: {clue_words[idx]}")
     candidates_string = chr(10).join(candidates)
 
-    clue_text = ' '.join(filter(lambda s: s!= "", solution_attempt["clue_with_synonyms"]))
-    
+    clue_text = ' '.join(filter(lambda s: s!= "", solution_attempt.clue_with_synonyms))
+
     # Create prompt for target identification
-    wordplay_type = indicator_component["wordplay_type"]
-    indicator_text = indicator_component["text"]
-    
-    context_parts = []
-
-    if tool_results:
-        context_parts.append("Tool Results:")
-        for result in tool_results:
-            context_parts.append(f"  {result['tool_name']}: {result['result']}")
-
-    chosen_solution = solution_attempt["solution"]
-    definition = solution_attempt["definition_part"]
+    wordplay_type = indicator_component.wordplay_type
+    indicator_text = indicator_component.text
+
+    chosen_solution = solution_attempt.solution
+    definition = solution_attempt.definition_part
     target_length = state["target_length"]
     given_letters = state["given_letters"]
+    required = []
     if chosen_solution and definition:
-        context_parts.append(f"Solution: '{chosen_solution}'")
-        context_parts.append(f"Definition: '{definition}'")
-        solution_in_context = True
+        required.append(f"Solution: '{chosen_solution}'")
+        required.append(f"Definition: '{definition}'")
     else:
         if target_length:
-            context_parts.append(f"Target solution length: {target_length} letters")
-            length_in_context = True
+            required.append(f"Target solution length: {target_length} letters")
         if given_letters:
             given_str = ", ".join([f"position {pos}: '{letter}'" for pos, letter in given_letters.items()])
-            context_parts.append(f"Given letters: {given_str}")
-            givens_in_context = True
-                
+            required.append(f"Given letters: {given_str}")
+
     # Add context about other analyzed components
-    if solution_attempt and solution_attempt["wordplay_analysis"]:
-        other_components = [comp for comp in solution_attempt["wordplay_analysis"][:-1] if comp["role"]]
-        if other_components:
-            other_components_in_context = True
-            context_parts.append("Other analyzed components in current attempt:")
-            for comp in other_components:
-                context_parts.append(f"  '{comp['text']}': {comp['role']} ({comp['wordplay_type']})")
-    context = "\n".join(context_parts)
+    other_components = []
+    if solution_attempt and solution_attempt.component_ids:
+        other_components = [components[cid] for cid in solution_attempt.component_ids[:-1] if components[cid].role]
 
+    fields = dict(
+        clue_text=clue_text,
+        indicator_text=indicator_text,
+        wordplay_type=wordplay_type,
+        candidates_string=candidates_string
+    )
+    response_format = _response_format("find_target_prompt")
     try:
-        with open("app/prompts/analyse_comp_prompt.txt") as f:
-            prompt = f.read().strip().format(
-                clue_text=clue_text,
-                indicator_text=indicator_text,
-                wordplay_type=wordplay_type,
-                candidates_string=candidates_string,
-                context=context
-            )
+        budget = _context_budget("find_target_prompt", **fields) - count_tokens(response_format) - 1
     except FileNotFoundError:
-        print("Error: Prompt file not found. Please ensure 'analyse_comp_sys_nt.txt' exists in the prompts directory.")
+        print("Error: Prompt file not found. Please ensure 'find_target_prompt.txt' exists in the prompts directory.")
         return ""
-    
-    return prompt
\ No newline at end of file
+
+    builder = ContextBuilder(budget)
+    builder.add(_tool_result_lines(tool_results, given_letters), PRIORITY_TOOL_RESULTS, header="Tool Results:")
+    builder.add(required, PRIORITY_REQUIRED)
+    builder.add(
+        [f"  '{comp.text}': {comp.role} ({comp.wordplay_type})" for comp in other_components],
+        PRIORITY_OTHER_COMPONENTS, header="Other analyzed components in current attempt:",
+        max_tokens=OTHER_COMPONENTS_MAX_TOKENS
+    )
+
+    prompt = get_template("find_target_prompt").render(context=builder.build(), **fields)
+    return f"{prompt}\n\n{response_format}"
+
+
+def generate_batch_analysis_prompt(state: SolverState) -> str:
+    # One prompt covering every unresolved word of the clue, for the batched analysis of a new attempt
+    current_attempt = state["current_attempt"]
+    if not current_attempt or not current_attempt.solution_attempt:
+        return ""
+    solution_attempt = current_attempt.solution_attempt
+    components = state["components"]
+    clue_words = state["clue_words"]
+    target_length = state["target_length"]
+    given_letters = state["given_letters"]
+
+    required = [f"Cryptic crossword clue: '{state['clue']}'"]
+    if target_length:
+        required.append(f"Target solution length: {target_length} letters")
+    if given_letters:
+        given_str = ", ".join([f"position {pos}: '{letter}'" for pos, letter in given_letters.items()])
+        required.append(f"Given letters: {given_str}")
+    required.append("Unresolved clue words:")
+    required.extend(f"  {idx}: {clue_words[idx]}" for idx in current_attempt.remaining_word_idxs)
+
+    other_components = [components[cid] for cid in solution_attempt.component_ids if components[cid].role]
+    rejected = sorted({attempt.solution for attempt in state["solution_attempts"] if attempt.solution})
+
+    try:
+        budget = _context_budget("batch_analysis_prompt")
+    except FileNotFoundError:
+        print("Error: Prompt file not found. Please ensure 'batch_analysis_prompt.txt' exists in the prompts directory.")
+        return ""
+
+    builder = ContextBuilder(budget)
+    builder.add(required, PRIORITY_REQUIRED)
+    builder.add(
+        [f"  {comp.start_pos}-{comp.end_pos} '{comp.text}': {comp.role} ({comp.wordplay_type})" for comp in other_components],
+        PRIORITY_OTHER_COMPONENTS, header="Already analyzed in this attempt:", max_tokens=OTHER_COMPONENTS_MAX_TOKENS
+    )
+    builder.add([f"  {solution}" for solution in rejected], PRIORITY_PREVIOUS_ANALYSES, header="Previous attempts:")
+
+    return get_template("batch_analysis_prompt").render(context=builder.build())
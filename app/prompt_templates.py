@@ -0,0 +1,73 @@
+"""
+Registry of prompt templates, loaded from app/prompts once per process.
+Each template is laid out for provider-side prompt caching: a static instruction prefix shared by every call,
+then the per-call context. In the prompt files, the two parts are separated by a line containing only
+CONTEXT_MARKER. The prefix may not contain format fields, so every call with the same template sends a
+byte-identical prefix.
+"""
+import os
+import string
+import threading
+from typing import Dict, Tuple
+
+from .warmup import register_warmup
+
+PROMPTS_DIR = os.path.join(os.path.dirname(__file__), 'prompts')
+CONTEXT_MARKER = "<<<context>>>"
+
+_templates: Dict[str, "PromptTemplate"] = {}
+_lock = threading.Lock()
+
+
+class PromptTemplate:
+    """A prompt split into a static prefix and a per-call suffix format string."""
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        prefix, marker, suffix = text.partition(f"\n{CONTEXT_MARKER}\n")
+        if not marker:
+            prefix, suffix = "", text  # No static prefix: the whole template varies per call
+        formatter = string.Formatter()
+        if any(field is not None for _, field, _, _ in formatter.parse(prefix)):
+            raise ValueError(f"Prompt template '{name}' has format fields in its static prefix")
+        self.prefix = prefix.strip().format()
+        self.suffix = suffix.strip()
+        self.fields: Tuple[str, ...] = tuple(field for _, field, _, _ in formatter.parse(self.suffix) if field)
+
+    @property
+    def text(self) -> str:
+        """The whole template as a single format string."""
+        prefix = self.prefix.replace("{", "{{").replace("}", "}}")
+        return f"{prefix}\n\n{self.suffix}" if prefix else self.suffix
+
+    def render(self, **fields) -> str:
+        """Static prefix followed by the suffix filled in with the given fields."""
+        context = self.suffix.format(**fields)
+        return f"{self.prefix}\n\n{context}" if self.prefix else context
+
+
+def get_template(name: str) -> PromptTemplate:
+    """Return the template app/prompts/<name>.txt, reading and compiling it on first use."""
+    template = _templates.get(name)
+    if template is None:
+        with _lock:
+            template = _templates.get(name)
+            if template is None:
+                with open(os.path.join(PROMPTS_DIR, f"{name}.txt"), 'r', encoding='utf-8') as f:
+                    template = PromptTemplate(name, f.read())
+                _templates[name] = template
+    return template
+
+
+def render(name: str, **fields) -> str:
+    """Render a registered template."""
+    return get_template(name).render(**fields)
+
+
+def _load_all() -> None:
+    for filename in sorted(os.listdir(PROMPTS_DIR)):
+        if filename.endswith(".txt"):
+            get_template(filename[:-len(".txt")])
+
+
+register_warmup("prompts", _load_all)
@@ -0,0 +1,143 @@
+"""
+Outbound rate limiting for LLM provider calls.
+Each provider/model pair has a requests-per-minute and a tokens-per-minute token bucket. The buckets live
+in a local SQLite database so that every gunicorn worker on the machine draws from the same quota.
+Callers that would exceed the quota are queued (they sleep until the buckets refill) up to a bounded wait.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call could not be admitted within the maximum wait."""
+
+
+def estimate_tokens(text: str, max_output_tokens: int = 0) -> int:
+    """Rough token estimate used to reserve quota before the real usage is known (~4 characters per token)."""
+    return len(text) // 4 + 1 + max_output_tokens
+
+
+class TokenBucketLimiter:
+    """Requests-per-minute and tokens-per-minute token buckets shared between processes through SQLite."""
+
+    def __init__(self, db_path: str, limits: Dict[str, Tuple[int, int]], max_wait: float = 30.0):
+        """
+        :param db_path: Path of the SQLite file holding the bucket levels.
+        :param limits: Provider name -> (requests per minute, tokens per minute). Zero disables that bucket.
+        :param max_wait: Longest time in seconds a caller will be queued before RateLimitExceeded is raised.
+        """
+        self.db_path = db_path
+        self.limits = limits
+        self.max_wait = max_wait
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _buckets(self, provider: str, model: str) -> list:
+        """Return (key, capacity) for each enabled bucket of this provider/model."""
+        rpm, tpm = self.limits.get(provider, (0, 0))
+        buckets = []
+        if rpm:
+            buckets.append((f"{provider}:{model}:requests", float(rpm)))
+        if tpm:
+            buckets.append((f"{provider}:{model}:tokens", float(tpm)))
+        return buckets
+
+    def _try_take(self, provider: str, model: str, tokens: int) -> float:
+        """Take one request and `tokens` tokens if available. Returns 0 on success, otherwise the seconds to wait."""
+        buckets = self._buckets(provider, model)
+        if not buckets:
+            return 0.0
+
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = []
+            wait = 0.0
+            for key, capacity in buckets:
+                cost = 1.0 if key.endswith(":requests") else float(min(tokens, capacity))
+                row = conn.execute("SELECT level, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                level = capacity if row is None else min(capacity, row[0] + (now - row[1]) * capacity / 60.0)
+                levels.append((key, level, cost))
+                if level < cost:
+                    wait = max(wait, (cost - level) * 60.0 / capacity)
+
+            if wait == 0.0:
+                for key, level, cost in levels:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO buckets (key, level, updated) VALUES (?, ?, ?)",
+                        (key, level - cost, now)
+                    )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, provider: str, model: str, tokens: int = 0) -> float:
+        """
+        Block until the call fits within the provider's quota.
+
+        :return: The number of seconds spent queued.
+        :raises RateLimitExceeded: If the call could not be admitted within max_wait.
+        """
+        start = time.monotonic()
+        while True:
+            wait = self._try_take(provider, model, tokens)
+            if wait == 0.0:
+                return time.monotonic() - start
+            waited = time.monotonic() - start
+            if waited + wait > self.max_wait:
+                raise RateLimitExceeded(
+                    f"Rate limit for {provider}/{model} exceeded: call could not be admitted within {self.max_wait}s"
+                )
+            time.sleep(wait)
+
+    def adjust(self, provider: str, model: str, tokens_delta: int) -> None:
+        """Correct the token bucket once the real usage is known (positive delta takes more, negative refunds)."""
+        key = f"{provider}:{model}:tokens"
+        capacity = dict(self._buckets(provider, model)).get(key)
+        if not capacity or not tokens_delta:
+            return
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT level, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                now = time.time()
+                level = min(capacity, row[0] + (now - row[1]) * capacity / 60.0) - tokens_delta
+                conn.execute("UPDATE buckets SET level = ?, updated = ? WHERE key = ?", (min(level, capacity), now, key))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+_rate_limiter: Optional[TokenBucketLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    """Return the process-wide limiter configured from Config."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            from config import Config
+            db_path = Config.RATE_LIMIT_DB or os.path.join(tempfile.gettempdir(), "cryptic_solver_ratelimit.sqlite")
+            _rate_limiter = TokenBucketLimiter(db_path, Config.RATE_LIMITS, Config.RATE_LIMIT_MAX_WAIT)
+        return _rate_limiter
@@ -72,6 +72,140 @@ CROSSWORD_SOLUTION_SCHEMA = {
 	"required": ["complete_solution"]
 }
 
+# Single-call mode: the reasoning is returned alongside the structured solution instead of in a separate call
+SINGLE_CALL_SOLUTION_SCHEMA = {
+	"type": "object",
+	"properties": {
+		"reasoning_analysis": {
+			"type": "string",
+			"description": "Step by step reasoning about the definition, wordplay and solution, written before the structured fields"
+		},
+		**CROSSWORD_SOLUTION_SCHEMA["properties"]
+	},
+	"required": ["reasoning_analysis", "complete_solution"]
+}
+
+CLUE_SPAN_ANALYSIS_SCHEMA = {
+	"type": "object",
+	"properties": {
+		"start": {
+			"type": "integer",
+			"description": "Index of the first clue word in this span"
+		},
+		"end": {
+			"type": "integer",
+			"description": "Index of the last clue word in this span, equal to start for a single word"
+		},
+		"role": {
+			"type": "string",
+			"enum": ["definition", "indicator", "synonym", "link word", "unknown"],
+			"description": "The role of the span in the clue"
+		},
+		"wordplay_type": {
+			"type": "string",
+			"description": "The wordplay type of the span, e.g. anagram, reversal, container, hidden, homophone, deletion, selection, substitution, link word or synonym"
+		},
+		"result": {
+			"type": "string",
+			"description": "For a definition, the answer it defines. For a synonym, the word it is replaced with. Omitted otherwise"
+		},
+		"description": {
+			"type": "string",
+			"description": "Brief explanation of why this role and wordplay type were chosen"
+		},
+		"target_start": {
+			"type": "integer",
+			"description": "For an indicator, the index of the first clue word its wordplay operates on"
+		},
+		"target_end": {
+			"type": "integer",
+			"description": "For an indicator, the index of the last clue word its wordplay operates on"
+		},
+		"target_result": {
+			"type": "string",
+			"description": "For an indicator, the result of applying its wordplay to the target"
+		},
+		"uncertain": {
+			"type": "boolean",
+			"description": "True if this analysis is a guess that should be checked on its own with tools"
+		}
+	},
+	"required": ["start", "end", "role", "wordplay_type", "description", "uncertain"]
+}
+
+CLUE_ANALYSIS_SCHEMA = {
+	"type": "object",
+	"properties": {
+		"spans": {
+			"type": "array",
+			"items": CLUE_SPAN_ANALYSIS_SCHEMA,
+			"description": "Analysis of each span of the clue that is not a target of an indicator, in clue order"
+		}
+	},
+	"required": ["spans"]
+}
+
+# Per-component node answers. Every property is required, with null for a missing result, and properties are in
+# the order they are needed, so a streamed answer can be cut off once the needed ones are complete
+COMPONENT_ANALYSIS_SCHEMA = {
+	"type": "object",
+	"properties": {
+		"role": {
+			"type": "string",
+			"enum": ["definition", "indicator", "synonym", "link word", "unknown"],
+			"description": "The role of the word or phrase in the clue"
+		},
+		"wordplay_type": {
+			"type": "string",
+			"enum": ["anagram", "reversal", "container", "hidden", "homophone", "deletion", "selection", "substitution", "link word", "synonym", "unknown"],
+			"description": "The wordplay type, synonym for a synonym or definition"
+		},
+		"result": {
+			"type": ["string", "null"],
+			"description": "For a synonym, the word it is replaced with. For a definition, the answer it defines. Null otherwise"
+		},
+		"description": {
+			"type": "string",
+			"description": "Brief explanation of why this role and wordplay type were chosen"
+		}
+	},
+	"required": ["role", "wordplay_type", "result", "description"],
+	"additionalProperties": False
+}
+
+TARGET_ANALYSIS_SCHEMA = {
+	"type": "object",
+	"properties": {
+		"target_index": {
+			"type": "integer",
+			"description": "Index of the target among the numbered candidates"
+		},
+		"target_text": {
+			"type": "string",
+			"description": "The target word or phrase from the clue"
+		},
+		"role": {
+			"type": "string",
+			"enum": ["target", "synonym"],
+			"description": "synonym if the target is replaced by a synonym before the wordplay applies, otherwise target"
+		},
+		"wordplay_type": {
+			"type": "string",
+			"description": "The wordplay type of the indicator"
+		},
+		"result": {
+			"type": ["string", "null"],
+			"description": "The result of applying the wordplay to the target, null if unclear"
+		},
+		"description": {
+			"type": "string",
+			"description": "Brief explanation of the wordplay operation"
+		}
+	},
+	"required": ["target_index", "target_text", "role", "wordplay_type", "result", "description"],
+	"additionalProperties": False
+}
+
 ERROR_RESPONSE_SCHEMA = {
     "type": "object",
     "properties": {
@@ -81,7 +215,7 @@ ERROR_RESPONSE_SCHEMA = {
         },
         "error_code": {
             "type": "string",
-            "enum": ["INVALID_CLUE", "API_ERROR", "RATE_LIMIT", "PARSING_ERROR", "UNKNOWN"],
+            "enum": ["INVALID_CLUE", "API_ERROR", "RATE_LIMIT", "TIMEOUT", "PARSING_ERROR", "CANCELLED", "UNKNOWN"],
             "description": "Categorized error code"
         },
         "suggestions": {
@@ -101,6 +235,26 @@ OPENAI_FUNCTION_SCHEMAS = {
         "name": "solve_cryptic_clue",
         "description": "Solve a cryptic crossword clue with detailed wordplay analysis",
         "parameters": CROSSWORD_SOLUTION_SCHEMA
+    },
+    "solve_cryptic_clue_single_call": {
+        "name": "solve_cryptic_clue_single_call",
+        "description": "Reason through a cryptic crossword clue and give the solution with detailed wordplay analysis",
+        "parameters": SINGLE_CALL_SOLUTION_SCHEMA
+    },
+    "analyse_clue": {
+        "name": "analyse_clue",
+        "description": "Record the role and wordplay of every unresolved span of a cryptic crossword clue",
+        "parameters": CLUE_ANALYSIS_SCHEMA
+    },
+    "record_component_analysis": {
+        "name": "record_component_analysis",
+        "description": "Record the role and wordplay type of the word or phrase being analysed",
+        "parameters": COMPONENT_ANALYSIS_SCHEMA
+    },
+    "record_target": {
+        "name": "record_target",
+        "description": "Record the target of the indicator and the result of its wordplay",
+        "parameters": TARGET_ANALYSIS_SCHEMA
     }
 }
 
@@ -113,6 +267,12 @@ ANTHROPIC_TOOL_SCHEMAS = [
     }
 ]
 
+ANTHROPIC_SINGLE_CALL_TOOL_SCHEMA = {
+    "name": "solve_cryptic_clue_single_call",
+    "description": "Reason through a cryptic crossword clue and give the solution with detailed wordplay analysis",
+    "input_schema": SINGLE_CALL_SOLUTION_SCHEMA
+}
+
 
 
 
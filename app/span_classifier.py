@@ -0,0 +1,121 @@
+"""
+Local classifier that labels clue spans as link words or indicators without an LLM call.
+A multinomial naive Bayes model is trained on the lexicons in app/data/lexicons.json when first used, with the
+whole phrase, each word and character n-grams as features. Only spans whose words all occur in the lexicons are
+pre-labelled, since n-grams alone can make an ordinary word look like an indicator. Phrases the lexicons list under
+several roles, such as "in" (link word and container indicator) or "about" (container indicator and abbreviation),
+are never pre-labelled, since the naive Bayes probabilities are not calibrated well enough to choose between them:
+the LLM reads them in context.
+"""
+import math
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from .span_scheduler import get_lexicons, normalise
+from .warmup import register_warmup
+
+LINK_WORD = "link word"
+PLAIN = "plain"  # Ordinary words, which are left to the LLM
+NGRAM_SIZES = (3, 4)
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def features(phrase: str) -> List[str]:
+    """Bag of features for a word or phrase."""
+    phrase = normalise(phrase)
+    words = phrase.split()
+    feats = [f"phrase={phrase}", f"words={min(len(words), 3)}"]
+    for word in words:
+        feats.append(f"word={word}")
+        padded = f"^{word}$"
+        for n in NGRAM_SIZES:
+            feats.extend(f"{n}g={padded[i:i + n]}" for i in range(len(padded) - n + 1))
+    return feats
+
+
+class NaiveBayesSpanClassifier:
+    """Multinomial naive Bayes over span features, with additive smoothing."""
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.class_counts: Counter = Counter()
+        self.feature_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.feature_totals: Counter = Counter()
+        self.vocabulary = set()
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "NaiveBayesSpanClassifier":
+        for phrase, label in examples:
+            self.class_counts[label] += 1
+            for feat in features(phrase):
+                self.feature_counts[label][feat] += 1
+                self.feature_totals[label] += 1
+                self.vocabulary.add(feat)
+        return self
+
+    def predict_proba(self, phrase: str) -> Dict[str, float]:
+        """Posterior probability of each label."""
+        total_examples = sum(self.class_counts.values())
+        vocabulary_size = len(self.vocabulary)
+        feats = [feat for feat in features(phrase) if feat in self.vocabulary]
+        log_scores = {}
+        for label, count in self.class_counts.items():
+            denominator = self.feature_totals[label] + self.alpha * vocabulary_size
+            log_scores[label] = math.log(count / total_examples) + sum(
+                math.log((self.feature_counts[label][feat] + self.alpha) / denominator) for feat in feats
+            )
+        best = max(log_scores.values())
+        weights = {label: math.exp(score - best) for label, score in log_scores.items()}
+        total = sum(weights.values())
+        return {label: weight / total for label, weight in weights.items()}
+
+    def knows(self, phrase: str) -> bool:
+        """Whether every word of the phrase was seen in training."""
+        return all(f"word={word}" in self.vocabulary for word in normalise(phrase).split())
+
+    def classify(self, phrase: str) -> Tuple[str, float]:
+        """Most probable label and its probability."""
+        probabilities = self.predict_proba(phrase)
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+
+def get_span_classifier() -> NaiveBayesSpanClassifier:
+    """Train the classifier from the lexicons on first use."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                lexicons = get_lexicons()
+                examples = [(phrase, LINK_WORD) for phrase in lexicons.link_words]
+                for phrase, wordplay_types in lexicons.indicators.items():
+                    examples.extend((phrase, wordplay_type) for wordplay_type in wordplay_types)
+                examples.extend((phrase, PLAIN) for phrase in lexicons.plain_words)
+                examples.extend((phrase, PLAIN) for phrase in lexicons.abbreviations)
+                _classifier = NaiveBayesSpanClassifier().fit(examples)
+    return _classifier
+
+
+register_warmup("span_classifier", get_span_classifier)
+
+
+def prelabel(phrase: str) -> Optional[Tuple[str, str, float]]:
+    """
+    (role, wordplay_type, confidence) for a span the classifier is sure of, or None if the LLM should analyse it.
+    Only link words and indicators made of known words are pre-labelled, at or above Config.PRELABEL_CONFIDENCE, and
+    only if the lexicons list the phrase under at most one role.
+    """
+    if not Config.PRELABEL_CONFIDENCE or len(get_lexicons().roles(phrase)) > 1:
+        return None
+    classifier = get_span_classifier()
+    if not classifier.knows(phrase):
+        return None
+    label, confidence = classifier.classify(phrase)
+    if label == PLAIN or confidence < Config.PRELABEL_CONFIDENCE:
+        return None
+    if label == LINK_WORD:
+        return "link word", "link word", confidence
+    return "indicator", label, confidence
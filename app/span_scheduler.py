@@ -0,0 +1,134 @@
+"""
+Chooses the next span of clue words to analyse.
+Candidate spans are runs of up to MAX_SPAN_WORDS consecutive unresolved words. Each is scored on three things:
+hits in the indicator, abbreviation and link-word lexicons in app/data/lexicons.json; its position in the clue
+(definitions sit at either end); and what has already been analysed. The most informative span is analysed
+first, and ties are broken at random so that attempts differ.
+"""
+import json
+import os
+import random
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from .state import SolverState
+from .warmup import register_warmup
+
+LEXICON_PATH = os.path.join(os.path.dirname(__file__), 'data', 'lexicons.json')
+MAX_SPAN_WORDS = 3
+
+# Score weights
+DEFINITION_EDGE_SCORE = 2.5  # A span at either end of the clue while the attempt has no definition
+INDICATOR_SCORE = 2.0  # The span is a known indicator
+PHRASE_SCORE = 0.5  # Per extra word of a multi-word lexicon phrase
+ABBREVIATION_SCORE = 1.0  # The span has a known abbreviation or short synonym
+LINK_WORD_PENALTY = 2.5  # The span is a link word, the least informative thing to analyse even if it can be an indicator
+ANALYSED_PENALTY = 1.0  # Per earlier analysis of the same span
+UNMATCHED_WORD_PENALTY = 1.5  # Per extra word of a multi-word span that is not a lexicon phrase
+
+_lexicons = None
+_lexicons_lock = threading.Lock()
+
+
+class Lexicons:
+    """Lookup tables built from lexicons.json, keyed by normalised phrase."""
+
+    def __init__(self, data: Dict):
+        self.indicators: Dict[str, List[str]] = {}
+        for wordplay_type, phrases in data["indicators"].items():
+            for phrase in phrases:
+                self.indicators.setdefault(normalise(phrase), []).append(wordplay_type)
+        self.abbreviations: Dict[str, List[str]] = {normalise(k): v for k, v in data["abbreviations"].items()}
+        self.link_words = {normalise(phrase) for phrase in data["link_words"]}
+        self.plain_words = {normalise(phrase) for phrase in data.get("plain_words", [])}
+
+    def indicator_types(self, phrase: str) -> List[str]:
+        return self.indicators.get(normalise(phrase), [])
+
+    def is_link_word(self, phrase: str) -> bool:
+        return normalise(phrase) in self.link_words
+
+    def roles(self, phrase: str) -> Set[str]:
+        """Every role the lexicons list the phrase under: its indicator types, "abbreviation" and "link word"."""
+        phrase = normalise(phrase)
+        roles = set(self.indicators.get(phrase, []))
+        if phrase in self.abbreviations:
+            roles.add("abbreviation")
+        if phrase in self.link_words:
+            roles.add("link word")
+        return roles
+
+    def is_known(self, phrase: str) -> bool:
+        phrase = normalise(phrase)
+        return phrase in self.indicators or phrase in self.abbreviations or phrase in self.link_words
+
+
+def normalise(text: str) -> str:
+    """Lower-case a word or phrase and strip the punctuation around each word."""
+    return " ".join(word.strip(",.:;!?()\"'-").lower() for word in text.split())
+
+
+def get_lexicons() -> Lexicons:
+    """Load the lexicons on first use."""
+    global _lexicons
+    if _lexicons is None:
+        with _lexicons_lock:
+            if _lexicons is None:
+                with open(LEXICON_PATH, 'r', encoding='utf-8') as f:
+                    _lexicons = Lexicons(json.load(f))
+    return _lexicons
+
+
+register_warmup("lexicons", get_lexicons)
+
+
+def candidate_spans(remaining_word_idxs: List[int], max_words: int = MAX_SPAN_WORDS) -> List[Tuple[int, int]]:
+    """Every run of up to max_words consecutive unresolved word indices, as (start, end) pairs."""
+    remaining = set(remaining_word_idxs)
+    spans = []
+    for start in sorted(remaining):
+        end = start
+        while end in remaining and end - start < max_words:
+            spans.append((start, end))
+            end += 1
+    return spans
+
+
+def score_span(state: SolverState, start: int, end: int) -> float:
+    """How informative analysing the words start..end is likely to be."""
+    lexicons = get_lexicons()
+    clue_words = state["clue_words"]
+    phrase = " ".join(clue_words[start:end + 1])
+    extra_words = end - start
+    score = 0.0
+
+    if lexicons.indicator_types(phrase):
+        score += INDICATOR_SCORE + PHRASE_SCORE * extra_words
+    elif extra_words:
+        score += PHRASE_SCORE * extra_words if lexicons.is_known(phrase) else -UNMATCHED_WORD_PENALTY * extra_words
+    if normalise(phrase) in lexicons.abbreviations:
+        score += ABBREVIATION_SCORE
+    if lexicons.is_link_word(phrase):
+        score -= LINK_WORD_PENALTY
+
+    attempt = state["current_attempt"].solution_attempt if state["current_attempt"] else None
+    has_definition = bool(attempt and attempt.definition_part)
+    if not has_definition and (start == 0 or end == len(clue_words) - 1):
+        score += DEFINITION_EDGE_SCORE
+
+    score -= ANALYSED_PENALTY * len(state["word_analyses"].get(start, end))
+    return score
+
+
+def choose_span(state: SolverState) -> Optional[Tuple[int, int]]:
+    """
+    The (start, end) of the most informative unresolved span, or None if every word is resolved or every
+    unresolved span has already been tried in this attempt.
+    """
+    attempt = state["current_attempt"]
+    spans = [span for span in candidate_spans(attempt.remaining_word_idxs) if list(span) not in attempt.tried_spans]
+    if not spans:
+        return None
+    scores = [score_span(state, start, end) for start, end in spans]
+    best = max(scores)
+    return random.choice([span for span, score in zip(spans, scores) if score == best])
@@ -1,8 +1,151 @@
-from typing import Dict, List, Optional, TypedDict, Annotated, Tuple
-from langgraph.graph.message import add_messages
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, NotRequired, Optional, TypedDict, Annotated, Tuple
+from .message_window import window_messages
+
+def add_messages(left, right):
+    """Message reducer for the graph state. langgraph is imported on first use so the state types stay cheap to import."""
+    from langgraph.graph.message import add_messages as _add_messages
+    return _add_messages(left, right)
+
+
+# Compact internal representation used in the graph state.
+# Components live in one table per solve and refer to each other by integer id (their index in the table),
+# so LangGraph copies and serializes flat records rather than nested dicts.
+
+@dataclass(slots=True)
+class Component:
+    """Analysis of a word or phrase in the clue."""
+    id: int
+    text: str
+    start_pos: int
+    end_pos: int
+    role: str = ""  # 'definition', 'indicator', 'target', 'synonym', 'unknown'
+    wordplay_type: str = ""  # 'anagram', 'container', etc.
+    description: str = ""  # Additional description of the role
+    result: Optional[str] = None  # Result of the wordplay, if applicable
+    targeted_by: Optional[int] = None  # If this component's role is target, the id of the indicator component
+
+
+@dataclass(slots=True)
+class Attempt:
+    """A single attempt at solving the clue."""
+    solution: str = ""
+    definition_part: str = ""
+    component_ids: List[int] = field(default_factory=list)
+    clue_with_synonyms: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class CurrentAttempt:
+    """State of the current attempt at solving the clue."""
+    solution_attempt: Optional[Attempt]
+    current_component: Optional[int]  # Id of the component currently being analysed
+    remaining_word_idxs: List[int]
+    possible_target_idxs: List[int]
+    batch_analysed: bool = False  # Whether the batched whole-clue analysis has run for this attempt
+    tried_spans: List[List[int]] = field(default_factory=list)  # [start, end] of spans already chosen in this attempt
+
+
+@dataclass(slots=True)
+class Budget:
+    """Limits on one solve and what it has used so far, see budget. None means no limit."""
+    deadline: Optional[float] = None  # time.time() by which the solve should finish
+    max_llm_calls: Optional[int] = None
+    max_tokens: Optional[int] = None
+    llm_calls: int = 0
+    tokens: int = 0
+    exhausted: str = ""  # The limit that ran out: 'deadline', 'llm_calls' or 'tokens'
+
+
+@dataclass(slots=True)
+class SpanIndex:
+    """Component ids analysed for each (start, end) word span, in a flat list indexed by start * n + end."""
+    n: int
+    slots: List[Optional[List[int]]] = field(default_factory=list)
+
+    def __post_init__(self):
+        if not self.slots:
+            self.slots = [None] * (self.n * self.n)
+
+    def add(self, start: int, end: int, component_id: int) -> None:
+        idx = start * self.n + end
+        if self.slots[idx] is None:
+            self.slots[idx] = []
+        self.slots[idx].append(component_id)
+
+    def get(self, start: int, end: int) -> List[int]:
+        return self.slots[start * self.n + end] or []
+
+    def spans(self) -> Iterator[Tuple[Tuple[int, int], List[int]]]:
+        for idx, ids in enumerate(self.slots):
+            if ids:
+                yield divmod(idx, self.n), ids
+
+
+class SolverState(TypedDict):
+    """State for the LangGraph solver."""
+    clue: str
+    clue_words: List[str]
+    target_length: Optional[int]
+    given_letters: dict[int, str]
+    components: List[Component]  # Every component analysed in this solve, indexed by id
+    word_analyses: SpanIndex
+    solution_attempts: List[Attempt]
+    current_attempt: Optional[CurrentAttempt]
+    max_attempts: int
+    attempt_count: int  # Finished attempts, including those that proposed no answer
+    stalled_attempts: int  # Finished attempts in a row that proposed no new answer
+    final_solution: Optional[Attempt]
+    solved: bool
+    confidence: float  # See convergence
+    stop_reason: str  # Why solving stopped, "" while it continues
+    budget: Budget
+    stage: str
+    tool_count: int
+    tool_limit: int
+    messages: Annotated[list, window_messages]  # Only the pending tool exchange, see message_window
+
+
+def new_solver_state(clue: str, given_letters: dict[int, str], target_length: Optional[int] = None,
+                     max_attempts: int = 3, budget: Optional[Budget] = None) -> SolverState:
+    """Initial state for solving a clue, with no limits unless a budget is given."""
+    clue_words = clue.split()
+    return SolverState(
+        clue=clue,
+        clue_words=clue_words,
+        target_length=target_length,
+        given_letters=given_letters,
+        solved=False,
+        final_solution=None,
+        max_attempts=max_attempts,
+        attempt_count=0,
+        stalled_attempts=0,
+        confidence=0.0,
+        stop_reason="",
+        budget=budget or Budget(),
+        current_attempt=None,
+        solution_attempts=[],
+        components=[],
+        word_analyses=SpanIndex(len(clue_words)),
+        stage="initial",
+        tool_count=0,
+        tool_limit=3,
+        messages=[]
+    )
+
+
+def new_component(state: SolverState, text: str, start_pos: int, end_pos: int, **fields) -> Component:
+    """Create a component and add it to the state's component table."""
+    component = Component(len(state["components"]), text, start_pos, end_pos, **fields)
+    state["components"].append(component)
+    return component
+
+
+# Dict shape of the solver output, produced only at the API boundary by export_state
 
 class WordPlayComponent(TypedDict):
     """Analysis of a word or phrase in the clue."""
+    id: NotRequired[int]
     text: str
     start_pos: int
     end_pos: int
@@ -26,10 +169,10 @@ class CurrentAttemptState(TypedDict):
     solution_attempt: Optional[SolutionAttempt]
     current_component: Optional[WordPlayComponent] # The component currently being analysed
     remaining_word_idxs: List[int]
-    possible_target_idxs: List[int] 
+    possible_target_idxs: List[int]
 
-class SolverState(TypedDict):
-    """State for the LangGraph solver."""
+class SolverStateDict(TypedDict):
+    """Solver output in the shape returned to the API."""
     clue: str
     clue_words: List[str]
     target_length: Optional[int]
@@ -38,10 +181,79 @@ class SolverState(TypedDict):
     solution_attempts: List[SolutionAttempt]
     current_attempt: Optional[CurrentAttemptState]
     max_attempts: int
+    attempt_count: int
     final_solution: Optional[SolutionAttempt]
     solved: bool
+    confidence: float
+    stop_reason: str
+    budget: Optional[Dict]
     stage: str
     tool_count: int
     tool_limit: int
     messages: Annotated[list, add_messages]
-    
\ No newline at end of file
+
+
+def export_state(state: SolverState) -> SolverStateDict:
+    """Convert the compact solver state into the dict shape returned to the API."""
+    components = state["components"]
+    exported: Dict[int, WordPlayComponent] = {}
+
+    def export_component(component_id: Optional[int]) -> Optional[WordPlayComponent]:
+        if component_id is None:
+            return None
+        if component_id not in exported:
+            comp = components[component_id]
+            exported[component_id] = WordPlayComponent(
+                id=comp.id,
+                text=comp.text,
+                start_pos=comp.start_pos,
+                end_pos=comp.end_pos,
+                role=comp.role,
+                wordplay_type=comp.wordplay_type,
+                description=comp.description,
+                result=comp.result,
+                targeted_by=export_component(comp.targeted_by),
+                messages=[]
+            )
+        return exported[component_id]
+
+    def export_attempt(attempt: Optional[Attempt]) -> Optional[SolutionAttempt]:
+        if attempt is None:
+            return None
+        return SolutionAttempt(
+            solution=attempt.solution,
+            definition_part=attempt.definition_part,
+            wordplay_analysis=[export_component(cid) for cid in attempt.component_ids],
+            clue_with_synonyms=list(attempt.clue_with_synonyms)
+        )
+
+    current = state["current_attempt"]
+    current_attempt = None
+    if current is not None:
+        current_attempt = CurrentAttemptState(
+            solution_attempt=export_attempt(current.solution_attempt),
+            current_component=export_component(current.current_component),
+            remaining_word_idxs=list(current.remaining_word_idxs),
+            possible_target_idxs=list(current.possible_target_idxs)
+        )
+
+    return SolverStateDict(
+        clue=state["clue"],
+        clue_words=state["clue_words"],
+        target_length=state["target_length"],
+        given_letters=state["given_letters"],
+        word_analyses={span: [export_component(cid) for cid in ids] for span, ids in state["word_analyses"].spans()},
+        solution_attempts=[export_attempt(attempt) for attempt in state["solution_attempts"]],
+        current_attempt=current_attempt,
+        max_attempts=state["max_attempts"],
+        attempt_count=state.get("attempt_count", 0),
+        final_solution=export_attempt(state["final_solution"]),
+        solved=state["solved"],
+        confidence=state.get("confidence", 0.0),
+        stop_reason=state.get("stop_reason", ""),
+        budget=asdict(state["budget"]) if state.get("budget") else None,
+        stage=state["stage"],
+        tool_count=state["tool_count"],
+        tool_limit=state["tool_limit"],
+        messages=[]
+    )
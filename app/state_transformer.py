@@ -1,202 +1,261 @@
 """
 Utility functions for transforming LangGraph state into UI-compatible format.
 This module provides functions to convert the internal solver state into the format expected by the frontend.
+Indicators are paired with their targets through an index keyed by component ID, built once per attempt.
+IncrementalUITransformer emits only the attempts and words that changed since its previous call, for
+streaming clients (see /api/submit_clue_stream) and large multi-attempt states.
 """
+from typing import Dict, List, Optional
+
+# Roles shown in the UI without a target; standalone targets are shown with their indicators
+PASSTHROUGH_ROLES = ("definition", "link word")
+
+
+def _component_key(comp: dict):
+    """Identity of an exported component: its ID, or its span and text for states without IDs."""
+    comp_id = comp.get("id")
+    if comp_id is not None:
+        return comp_id
+    return (comp["start_pos"], comp["end_pos"], comp["text"])
+
+
+def _index_targets(components: List[dict]) -> Dict[object, List[dict]]:
+    """Map each indicator's key to the components it targets, in order."""
+    targets = {}
+    for comp in components:
+        indicator = comp.get("targeted_by")
+        if indicator is not None:
+            targets.setdefault(_component_key(indicator), []).append(comp)
+    return targets
+
+
+def _ui_component(comp: dict, targets: Dict[object, List[dict]]) -> Optional[dict]:
+    """UI entry for one component, or None if the component is not shown on its own."""
+    if comp["role"] == "indicator":
+        target_list = targets.get(_component_key(comp))
+        target_comp = target_list[0] if target_list else None
+
+        # Create combined component info
+        component_info = {
+            "indicator": comp["text"],
+            "wordplay_type": comp["wordplay_type"],
+            "target": target_comp["text"] if target_comp else "",
+            "result": target_comp.get("result", "") if target_comp else "",
+            "description": comp["description"]
+        }
+
+        # Add target info to description if available
+        if target_comp and target_comp.get("result"):
+            component_info["description"] += f" → '{target_comp['text']}' gives '{target_comp['result']}'"
+        return component_info
+
+    if comp["role"] in PASSTHROUGH_ROLES:
+        # Include definitions and link words as-is
+        return {
+            "indicator": comp["text"],
+            "wordplay_type": comp["wordplay_type"],
+            "target": "",
+            "result": comp.get("result", ""),
+            "description": comp["description"]
+        }
+    return None
+
+
+def _ui_attempt(attempt: dict) -> dict:
+    """UI entry for one solution attempt."""
+    targets = _index_targets(attempt["wordplay_analysis"])
+    components = (_ui_component(comp, targets) for comp in attempt["wordplay_analysis"])
+    return {
+        "solution": attempt["solution"],
+        "definition": attempt["definition_part"],
+        "wordplay_components": [info for info in components if info is not None]
+    }
+
+
+def _ui_word_mapping(clue: str, components: List[dict]) -> List[dict]:
+    """Map each clue word to the first component covering it, with the positions of its related words."""
+    targets = _index_targets(components)
+    by_position = {}
+    for comp in components:
+        for pos in range(comp["start_pos"], comp["end_pos"] + 1):
+            by_position.setdefault(pos, comp)
+
+    word_mapping = []
+    for i, word in enumerate(clue.split()):
+        component = by_position.get(i)
+        if component is None:
+            # Word not part of any component (likely connectors)
+            word_mapping.append({
+                "word": word,
+                "position": i,
+                "role": "connector",
+                "wordplay_type": "none",
+                "description": "Connecting word",
+                "result": "",
+                "related_positions": [],
+                "component_id": None
+            })
+            continue
+
+        # Related words: an indicator's targets, or a target's indicator
+        related = set()
+        if component["role"] == "indicator":
+            for target in targets.get(_component_key(component), []):
+                related.update(range(target["start_pos"], target["end_pos"] + 1))
+        elif component.get("targeted_by") is not None:
+            indicator = component["targeted_by"]
+            related.update(range(indicator["start_pos"], indicator["end_pos"] + 1))
+        related.discard(i)
+
+        word_mapping.append({
+            "word": word,
+            "position": i,
+            "role": component["role"],
+            "wordplay_type": component["wordplay_type"],
+            "description": component["description"],
+            "result": component.get("result", ""),
+            "related_positions": sorted(related),
+            "component_id": f"comp_{component['start_pos']}_{component['end_pos']}"
+        })
+    return word_mapping
+
 
 def transform_state_to_ui_format(state, clue: str | None = None) -> dict:
     """
-    Transform a LangGraph SolverState into the format expected by the UI.
-    
+    Transform the solver output (see state.export_state) into the format expected by the UI.
+
     Args:
-        state: The SolverState object from the LangGraph solver
+        state: The SolverStateDict returned by the LangGraph solver
         clue: Optional clue text (will use state.clue if not provided)
-        
+
     Returns:
         dict: UI-compatible response format
     """
     if clue is None:
         clue = state.get("clue", "")
-    
-    # Convert solution attempts to UI format
-    attempted_solutions = []
-    for attempt in state.get("solution_attempts", []):
-        # Filter and combine components: only show indicators and definitions
-        # For indicators, include their target information
-        filtered_components = []
-        
-        for comp in attempt["wordplay_analysis"]:
-            if comp["role"] == "indicator":
-                # Find the target component for this indicator by checking targeted_by relationship
-                target_comp = None
-                for target in attempt["wordplay_analysis"]:
-                    targeted_by = target.get("targeted_by")
-                    if (targeted_by is not None and 
-                        targeted_by.get("start_pos") == comp["start_pos"] and
-                        targeted_by.get("end_pos") == comp["end_pos"] and
-                        targeted_by.get("text") == comp["text"]):
-                        target_comp = target
-                        break
-                
-                # Create combined component info
-                component_info = {
-                    "indicator": comp["text"],
-                    "wordplay_type": comp["wordplay_type"],
-                    "target": target_comp["text"] if target_comp else "",
-                    "result": target_comp.get("result", "") if target_comp else "",
-                    "description": comp["description"]
-                }
-                
-                # Add target info to description if available
-                if target_comp and target_comp.get("result"):
-                    component_info["description"] += f" → '{target_comp['text']}' gives '{target_comp['result']}'"
-                
-                filtered_components.append(component_info)
-                
-            elif comp["role"] in ["definition", "link word"]:
-                # Include definitions and link words as-is
-                filtered_components.append({
-                    "indicator": comp["text"],
-                    "wordplay_type": comp["wordplay_type"],
-                    "target": "",
-                    "result": comp.get("result", ""),
-                    "description": comp["description"]
-                })
-            # Skip standalone targets - they're now included with their indicators
-        
-        ui_attempt = {
-            "solution": attempt["solution"],
-            "definition": attempt["definition_part"],
-            "wordplay_components": filtered_components
-        }
-        attempted_solutions.append(ui_attempt)
-    
-    # Process final solution
+
+    attempted_solutions = [_ui_attempt(attempt) for attempt in state.get("solution_attempts", [])]
+
     final_solution = state.get("final_solution")
     complete_solution = None
     interactive_clue = None
-    
     if final_solution:
-        # Filter and combine components for final solution too
-        filtered_final_components = []
-        
-        for comp in final_solution["wordplay_analysis"]:
-            if comp["role"] == "indicator":
-                # Find the target component for this indicator by checking targeted_by relationship
-                target_comp = None
-                for target in final_solution["wordplay_analysis"]:
-                    targeted_by = target.get("targeted_by")
-                    if (targeted_by is not None and 
-                        targeted_by.get("start_pos") == comp["start_pos"] and
-                        targeted_by.get("end_pos") == comp["end_pos"] and
-                        targeted_by.get("text") == comp["text"]):
-                        target_comp = target
-                        break
-                
-                # Create combined component info
-                component_info = {
-                    "indicator": comp["text"],
-                    "wordplay_type": comp["wordplay_type"],
-                    "target": target_comp["text"] if target_comp else "",
-                    "result": target_comp.get("result", "") if target_comp else "",
-                    "description": comp["description"]
-                }
-                
-                # Add target info to description if available
-                if target_comp and target_comp.get("result"):
-                    component_info["description"] += f" → '{target_comp['text']}' gives '{target_comp['result']}'"
-                
-                filtered_final_components.append(component_info)
-                
-            elif comp["role"] in ["definition", "link word"]:
-                # Include definitions and link words as-is
-                filtered_final_components.append({
-                    "indicator": comp["text"],
-                    "wordplay_type": comp["wordplay_type"],
-                    "target": "",
-                    "result": comp.get("result", ""),
-                    "description": comp["description"]
-                })
-            # Skip standalone targets - they're now included with their indicators
-            
-        complete_solution = {
-            "solution": final_solution["solution"],
-            "definition": final_solution["definition_part"],
-            "wordplay_components": filtered_final_components
-        }
-        
-        # Create interactive clue mapping for UI
+        complete_solution = _ui_attempt(final_solution)
         if clue:
-            clue_words = clue.split()
-            word_mapping = []
-            
-            for i, word in enumerate(clue_words):
-                # Find the component that corresponds to this word position
-                component = None
-                for comp in final_solution["wordplay_analysis"]:
-                    if comp["start_pos"] <= i <= comp["end_pos"]:
-                        component = comp
-                        break
-                
-                if component:
-                    # Find related words (targets or indicators)
-                    related_positions = []
-                    
-                    # If this is an indicator, find what it targets
-                    if component["role"] == "indicator":
-                        for comp in final_solution["wordplay_analysis"]:
-                            targeted_by = comp.get("targeted_by")
-                            if (targeted_by is not None and 
-                                targeted_by["start_pos"] == component["start_pos"] and
-                                targeted_by["end_pos"] == component["end_pos"]):
-                                for pos in range(comp["start_pos"], comp["end_pos"] + 1):
-                                    related_positions.append(pos)
-                    
-                    # If this is a target, find its indicator
-                    elif component.get("targeted_by") is not None:
-                        indicator = component["targeted_by"]
-                        if indicator is not None:
-                            for pos in range(indicator["start_pos"], indicator["end_pos"] + 1):
-                                related_positions.append(pos)
-                    
-                    # Remove duplicates and current position
-                    related_positions = list(set(related_positions))
-                    if i in related_positions:
-                        related_positions.remove(i)
-                    
-                    word_info = {
-                        "word": word,
-                        "position": i,
-                        "role": component["role"],
-                        "wordplay_type": component["wordplay_type"],
-                        "description": component["description"],
-                        "result": component.get("result", ""),
-                        "related_positions": related_positions,
-                        "component_id": f"comp_{component['start_pos']}_{component['end_pos']}"
-                    }
-                else:
-                    # Word not part of any component (likely connectors)
-                    word_info = {
-                        "word": word,
-                        "position": i,
-                        "role": "connector",
-                        "wordplay_type": "none",
-                        "description": "Connecting word",
-                        "result": "",
-                        "related_positions": [],
-                        "component_id": None
-                    }
-                
-                word_mapping.append(word_info)
-            
             interactive_clue = {
                 "original_clue": clue,
-                "word_mapping": word_mapping
+                "word_mapping": _ui_word_mapping(clue, final_solution["wordplay_analysis"])
             }
-        else:
-            interactive_clue = None
-    
+
     return {
         "attempted_solutions": attempted_solutions,
         "complete_solution": complete_solution,
         "interactive_clue": interactive_clue
     }
+
+
+def _component_signature(comp: dict) -> tuple:
+    indicator = comp.get("targeted_by")
+    return (
+        _component_key(comp), comp["text"], comp["start_pos"], comp["end_pos"], comp["role"],
+        comp["wordplay_type"], comp["description"], comp.get("result"),
+        _component_key(indicator) if indicator is not None else None
+    )
+
+
+def _attempt_signature(attempt: Optional[dict]) -> Optional[tuple]:
+    if attempt is None:
+        return None
+    return (attempt["solution"], attempt["definition_part"],
+            tuple(_component_signature(comp) for comp in attempt["wordplay_analysis"]))
+
+
+class IncrementalUITransformer:
+    """
+    Transforms successive states of one solve, returning only what changed since the previous call.
+    Used to stream a solve's progress (see /api/submit_clue_stream).
+
+    Each call to update() returns a delta with:
+        attempt_count: number of attempts in the state (always present)
+        attempted_solutions: changed or new attempts, each with its "index"
+        complete_solution: the final solution, if it changed (None if it was cleared)
+        interactive_clue: the clue and the changed entries of its word mapping, if any changed
+    Applying every delta in order with apply_ui_delta gives the same result as transform_state_to_ui_format.
+
+    An attempt is only recorded once it is finished, so only new attempts and the latest one already seen are
+    compared, and the word mapping is only rebuilt when the final solution changes.
+    """
+
+    def __init__(self, clue: str | None = None):
+        self.clue = clue
+        self._attempt_signatures: List[Optional[tuple]] = []
+        self._final_signature: Optional[tuple] = None
+        self._word_mapping: List[dict] = []
+
+    def update(self, state) -> dict:
+        """Return the UI changes since the previous call."""
+        clue = self.clue if self.clue is not None else state.get("clue", "")
+        attempts = state.get("solution_attempts", [])
+        delta = {"attempt_count": len(attempts)}
+
+        changed_attempts = []
+        del self._attempt_signatures[len(attempts):]
+        for index in range(max(0, len(self._attempt_signatures) - 1), len(attempts)):
+            signature = _attempt_signature(attempts[index])
+            if index < len(self._attempt_signatures):
+                if self._attempt_signatures[index] == signature:
+                    continue
+                self._attempt_signatures[index] = signature
+            else:
+                self._attempt_signatures.append(signature)
+            changed_attempts.append({"index": index, **_ui_attempt(attempts[index])})
+        if changed_attempts:
+            delta["attempted_solutions"] = changed_attempts
+
+        final_solution = state.get("final_solution")
+        final_signature = _attempt_signature(final_solution)
+        if final_signature == self._final_signature:
+            return delta
+        self._final_signature = final_signature
+        delta["complete_solution"] = _ui_attempt(final_solution) if final_solution else None
+
+        word_mapping = _ui_word_mapping(clue, final_solution["wordplay_analysis"]) if final_solution and clue else []
+        changed_words = [word for i, word in enumerate(word_mapping)
+                         if i >= len(self._word_mapping) or self._word_mapping[i] != word]
+        if changed_words or len(word_mapping) != len(self._word_mapping):
+            delta["interactive_clue"] = {"original_clue": clue, "word_mapping": changed_words} if word_mapping else None
+        self._word_mapping = word_mapping
+
+        return delta
+
+
+def apply_ui_delta(ui: Optional[dict], delta: dict) -> dict:
+    """Apply a delta from IncrementalUITransformer.update to a UI response (None to start from empty)."""
+    if ui is None:
+        ui = {"attempted_solutions": [], "complete_solution": None, "interactive_clue": None}
+
+    attempts = ui["attempted_solutions"][:delta["attempt_count"]]
+    for change in delta.get("attempted_solutions", []):
+        attempt = {key: value for key, value in change.items() if key != "index"}
+        if change["index"] < len(attempts):
+            attempts[change["index"]] = attempt
+        else:
+            attempts.append(attempt)
+    ui["attempted_solutions"] = attempts
+
+    if "complete_solution" in delta:
+        ui["complete_solution"] = delta["complete_solution"]
+
+    if "interactive_clue" in delta:
+        clue_delta = delta["interactive_clue"]
+        if clue_delta is None:
+            ui["interactive_clue"] = None
+        else:
+            previous = ui["interactive_clue"]["word_mapping"] if ui["interactive_clue"] else []
+            word_mapping = {word["position"]: word for word in previous}
+            word_mapping.update({word["position"]: word for word in clue_delta["word_mapping"]})
+            ui["interactive_clue"] = {
+                "original_clue": clue_delta["original_clue"],
+                "word_mapping": [word_mapping[pos] for pos in sorted(word_mapping)]
+            }
+    return ui
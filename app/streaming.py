@@ -0,0 +1,154 @@
+"""
+Streamed LLM calls that stop as soon as the reply holds everything the solver needs.
+The per-component nodes answer with a function call (see COMPONENT_ANALYSIS_SCHEMA), or in "Label: value" lines
+when Config.STRUCTURED_NODE_OUTPUT is off. A parser reads the answer as it arrives, an ArgumentsParser from the
+function call's arguments and a FieldParser from the text, and once the required fields are complete the stream
+is closed, so the call returns without waiting for (or generating) the rest of the reply. A text reply that has
+produced no field line after Config.STREAM_MALFORMED_CHARS characters is cut off as malformed, so it can be retried
+without waiting for it to finish.
+
+Closing the stream is used rather than stop sequences: which field is the last one needed depends on the values
+of the earlier ones (a synonym needs its result, an indicator does not).
+"""
+import json
+from typing import Callable, Dict, Optional, Sequence
+
+from langchain_core.messages import AIMessage, AIMessageChunk, message_chunk_to_message
+from langchain_core.utils.json import parse_partial_json
+
+from config import Config
+from .rate_limiter import estimate_tokens
+from . import metrics
+
+
+class FieldParser:
+    """Collects "Label: value" lines from a text reply as it streams in. Only complete lines are read."""
+
+    def __init__(self, labels: Sequence[str], is_complete: Callable[[Dict[str, str]], bool]):
+        self.labels = labels
+        self.is_complete = is_complete
+        self.values: Dict[str, str] = {}
+        self.text = ""
+        self.lines_end = 0  # End of the last complete line in text
+        self.calls_tools = False
+
+    def read(self, received: AIMessageChunk) -> None:
+        """Read the reply received so far."""
+        if received.tool_call_chunks:
+            self.calls_tools = True
+            return
+        self.text = received.content if isinstance(received.content, str) else ""
+        end = self.text.find("\n", self.lines_end)
+        while end != -1:
+            self._read_line(self.text[self.lines_end:end])
+            self.lines_end = end + 1
+            end = self.text.find("\n", self.lines_end)
+
+    def _read_line(self, line: str) -> None:
+        line = line.strip()
+        for label in self.labels:
+            if line.startswith(f"{label}:"):
+                self.values.setdefault(label, line[len(label) + 1:].strip())
+                return
+
+    @property
+    def complete(self) -> bool:
+        return not self.calls_tools and self.is_complete(self.values)
+
+    @property
+    def malformed(self) -> bool:
+        return not self.calls_tools and not self.values and len(self.text) > Config.STREAM_MALFORMED_CHARS
+
+    def cut(self, response: AIMessage) -> None:
+        """Keep only the complete lines of a reply that was cut off."""
+        response.content = self.text[:self.lines_end]
+
+
+class ArgumentsParser:
+    """
+    Collects the arguments of a call to one function as they stream in. An argument is complete once the next
+    one has started (or the arguments are closed).
+    """
+
+    def __init__(self, name: str, is_complete: Callable[[Dict], bool]):
+        self.name = name
+        self.is_complete = is_complete
+        self.values: Dict = {}
+        self.call_id: Optional[str] = None
+        self.calls_tools = False
+        self.unparseable = False
+
+    def read(self, received: AIMessageChunk) -> None:
+        """Read the reply received so far."""
+        arguments = None
+        for chunk in received.tool_call_chunks:
+            if chunk.get("name") == self.name and arguments is None:
+                arguments, self.call_id = chunk.get("args") or "", chunk.get("id")
+            else:
+                self.calls_tools = True  # Another call, which is left for the caller to run
+        if not arguments:
+            return
+        try:
+            self.values = json.loads(arguments)
+            return  # Closed
+        except json.JSONDecodeError:
+            pass
+        try:
+            parsed = parse_partial_json(arguments)
+        except json.JSONDecodeError:
+            parsed = None
+        if not isinstance(parsed, dict):
+            self.unparseable = True
+            return
+        self.values = {key: parsed[key] for key in list(parsed)[:-1]}
+
+    @property
+    def complete(self) -> bool:
+        return not self.calls_tools and bool(self.values) and self.is_complete(self.values)
+
+    @property
+    def malformed(self) -> bool:
+        return not self.calls_tools and self.unparseable
+
+    def cut(self, response: AIMessage) -> None:
+        """Keep only the complete arguments of a call that was cut off."""
+        response.tool_calls = [{"name": self.name, "args": dict(self.values), "id": self.call_id, "type": "tool_call"}]
+        response.additional_kwargs.pop("tool_calls", None)
+
+
+def stream_until_complete(llm, messages, parser) -> AIMessage:
+    """
+    Stream a reply, closing the stream once the parser (a FieldParser or ArgumentsParser) has the required fields
+    or finds the reply malformed. A reply that calls tools is always read to the end. A reply that was cut off
+    holds only its complete fields, and its token usage is estimated, since the provider only reports usage at
+    the end of a stream.
+    """
+    received = None
+    stopped = ""
+    stream = llm.stream(messages)
+    try:
+        for chunk in stream:
+            received = chunk if received is None else received + chunk
+            parser.read(received)
+            if parser.complete:
+                stopped = "complete"
+                break
+            if parser.malformed:
+                stopped = "malformed"
+                break
+    finally:
+        stream.close()
+
+    if received is None:
+        return AIMessage(content="")
+    response = message_chunk_to_message(received)
+    if stopped:
+        metrics.increment("stream_early_stops" if stopped == "complete" else "stream_malformed")
+        parser.cut(response)
+        if not response.usage_metadata:
+            prompt_tokens = estimate_tokens("".join(str(m.content) for m in messages))
+            completion_tokens = estimate_tokens(str(received.content) + "".join(
+                chunk.get("args") or "" for chunk in received.tool_call_chunks))
+            response.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                                       "total_tokens": prompt_tokens + completion_tokens}
+    return response
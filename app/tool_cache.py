@@ -0,0 +1,211 @@
+"""
+Memoization of tool calls, so a lookup repeated across components, attempts and solves runs once.
+Results are kept at two levels:
+- the solve scope, holding every result a solve has seen for the rest of that solve (see solve_scope). Impure
+  tools answer consistently within a solve, and the process-wide cache evicting under load does not cost the
+  solve its lookups.
+- a process-wide LRU per tool, shared by every solve, for the tools whose policy allows it.
+
+Each tool declares a CachePolicy in TOOL_CACHE_POLICIES. Pure tools (anagrams, reversals, hidden words) are kept
+process-wide until evicted. get_meanings depends on a remote dictionary, so its results expire after a TTL, and
+an empty result (which is also what a failed lookup returns) is not kept at all. Tools without a policy are only
+cached within a solve. A policy can normalise the arguments results are keyed by: every tool above is keyed by its
+lower-cased string arguments, since the pure tools ignore case and get_meanings is asked about the same word in
+different cases, e.g. "companion" by the prefetch (see app/prefetch.py), "Companion" by the LLM and "ESCORT" by
+the verification. Errors and timeouts are never cached. A call made while the same call is already running
+(e.g. one being prefetched, see app/prefetch.py) waits for that result rather than repeating the call.
+
+Hits, misses and the bytes of tool output served from cache are counted in app/metrics.py
+(tool_cache_hits, tool_cache_misses, tool_cache_bytes_saved) and per tool by ToolCache.stats().
+"""
+import contextvars
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+from . import metrics
+from .cancellation import raise_if_cancelled
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """How one tool's results are memoized."""
+    pure: bool = False  # Same arguments, same result, forever
+    ttl: Optional[float] = None  # Seconds a result stays in the process-wide cache, None for no expiry
+    max_entries: int = 0  # Size of the tool's process-wide LRU, 0 to cache only within a solve
+    keep: Optional[Callable[[Any], bool]] = None  # Whether a result may be cached at all
+    normalise: Optional[Callable[[Dict], Dict]] = None  # Maps a call's arguments to those its result is keyed by
+
+    @property
+    def shared(self) -> bool:
+        """Whether results are kept in the process-wide cache."""
+        return self.max_entries > 0 and (self.pure or bool(self.ttl))
+
+
+def _has_meanings(result) -> bool:
+    return isinstance(result, dict) and bool(result.get("meanings"))
+
+
+def _lower_case(args) -> Dict:
+    if not isinstance(args, dict):
+        return args
+    return {key: value.strip().lower() if isinstance(value, str) else value for key, value in args.items()}
+
+
+TOOL_CACHE_POLICIES = {
+    "generate_anagrams": CachePolicy(pure=True, max_entries=512, normalise=_lower_case),
+    "find_hidden_words": CachePolicy(pure=True, max_entries=512, normalise=_lower_case),
+    "reverse_word": CachePolicy(pure=True, max_entries=2048, normalise=_lower_case),
+    "get_meanings": CachePolicy(ttl=24 * 3600, max_entries=4096, keep=_has_meanings, normalise=_lower_case),
+}
+
+# The running solve's cache, set by solve_scope. Pool threads see it through a copied context.
+_solve_cache: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("solve_tool_cache", default=None)
+
+
+@contextmanager
+def solve_scope():
+    """Cache tool results for the duration of a solve."""
+    token = _solve_cache.set({})
+    try:
+        yield
+    finally:
+        _solve_cache.reset(token)
+
+
+def _size(result) -> int:
+    if isinstance(result, str):
+        return len(result.encode())
+    try:
+        return len(json.dumps(result, ensure_ascii=False).encode())
+    except (TypeError, ValueError):
+        return len(str(result).encode())
+
+
+class ToolCache:
+    """A process-wide LRU per tool, in front of the current solve's cache."""
+
+    def __init__(self, policies: Dict[str, CachePolicy]):
+        self.policies = policies
+        self._lock = threading.Lock()
+        self._entries: Dict[str, OrderedDict] = {}  # Tool name -> key -> (expiry, result, size)
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._running: Dict[str, threading.Event] = {}  # Key -> set once the call is done
+
+    def call(self, name: str, args, compute: Callable[[], Any]):
+        """The result of calling a tool with args, from cache if possible, otherwise from compute()."""
+        if not Config.TOOL_CACHE:
+            return compute()
+        policy = self.policies.get(name, CachePolicy())
+        key = self._key(name, args, policy)
+        found, result = self._lookup(name, key, policy)
+        if found:
+            return result
+
+        with self._lock:
+            running = self._running.get(key)
+            if running is None:
+                done = self._running[key] = threading.Event()
+        if running is not None:
+            while not running.wait(Config.CANCEL_POLL_SECONDS):
+                raise_if_cancelled()
+            found, result = self._lookup(name, key, policy)
+            if found:
+                return result
+            self._count(name, "misses")  # The call failed or its result was not kept
+            return compute()
+
+        try:
+            result = compute()
+            self._count(name, "misses")
+            if policy.keep is None or policy.keep(result):
+                self.put(name, args, result)
+        finally:
+            with self._lock:
+                del self._running[key]
+            done.set()
+        return result
+
+    def put(self, name: str, args, result) -> None:
+        """Cache a result in the current solve and, if the tool's policy allows, process-wide."""
+        policy = self.policies.get(name, CachePolicy())
+        key = self._key(name, args, policy)
+        solve_cache = _solve_cache.get()
+        if solve_cache is not None:
+            solve_cache[key] = result
+        if not policy.shared:
+            return
+        expiry = time.monotonic() + policy.ttl if policy.ttl else None
+        with self._lock:
+            entries = self._entries.setdefault(name, OrderedDict())
+            entries[key] = (expiry, result, _size(result))
+            entries.move_to_end(key)
+            while len(entries) > policy.max_entries:
+                entries.popitem(last=False)
+
+    @staticmethod
+    def _key(name: str, args, policy: CachePolicy) -> str:
+        if policy.normalise is not None:
+            args = policy.normalise(args)
+        return f"{name}:{json.dumps(args, sort_keys=True, default=str)}"
+
+    def _lookup(self, name: str, key: str, policy: CachePolicy):
+        solve_cache = _solve_cache.get()
+        if solve_cache is not None and key in solve_cache:
+            result = solve_cache[key]
+            self._count(name, "hits", _size(result))
+            return True, result
+        if not policy.shared:
+            return False, None
+        with self._lock:
+            entries = self._entries.get(name)
+            entry = entries.get(key) if entries else None
+            if entry is not None and entry[0] is not None and entry[0] < time.monotonic():
+                del entries[key]
+                entry = None
+            if entry is not None:
+                entries.move_to_end(key)
+        if entry is None:
+            return False, None
+        if solve_cache is not None:
+            solve_cache[key] = entry[1]
+        self._count(name, "hits", entry[2])
+        return True, entry[1]
+
+    def _count(self, name: str, outcome: str, size: int = 0) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(name, {"hits": 0, "misses": 0, "bytes_saved": 0})
+            stats[outcome] += 1
+            stats["bytes_saved"] += size
+        metrics.increment(f"tool_cache_{outcome}")
+        if size:
+            metrics.increment("tool_cache_bytes_saved", size)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hits, misses, bytes saved and process-wide entries per tool."""
+        with self._lock:
+            return {name: dict(stats, entries=len(self._entries.get(name, ()))) for name, stats in self._stats.items()}
+
+    def clear(self) -> None:
+        """Drop every process-wide entry and the stats."""
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+
+_tool_cache = ToolCache(TOOL_CACHE_POLICIES)
+
+
+def get_tool_cache() -> ToolCache:
+    """The process-wide tool cache."""
+    return _tool_cache
+
+
+def cached_invoke(tool, args: Dict, name: Optional[str] = None):
+    """tool.invoke(args) through the tool cache. name defaults to the tool's own."""
+    return _tool_cache.call(name or tool.name, args, lambda: tool.invoke(args))
@@ -0,0 +1,98 @@
+"""
+Runs the tool calls of one LLM turn concurrently, as the graph's tools node.
+When the LLM asks for several tools at once (e.g. get_meanings on three candidates and generate_anagrams), the
+calls run side by side on a bounded thread pool shared by every solve, so the turn takes as long as its slowest
+call. Each tool has its own concurrency limit (Config.TOOL_CONCURRENCY, e.g. to spare the dictionary API) and
+timeout (Config.TOOL_TIMEOUTS, defaulting to Config.TOOL_TIMEOUT). The results come back as ToolMessages in the
+order the calls were made. A call that fails or times out gets an error message for the LLM instead of failing
+the solve, but a cancelled solve stops waiting at once. Calls answered from the tool cache (see app/tool_cache.py)
+take no slot. Speculative calls (see app/prefetch.py) run on a separate small pool, so they never hold up the
+calls an LLM turn is waiting for, although they share the per-tool limits.
+"""
+import contextvars
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from langchain_core.messages import ToolMessage
+
+from config import Config
+from .cancellation import SolveCancelled, call_with_timeout, raise_if_cancelled
+from .tool_cache import get_tool_cache
+from . import metrics
+
+
+class ToolExecutor:
+    """Graph node running the pending tool calls of the latest message."""
+
+    def __init__(self, tools: List, max_workers: Optional[int] = None, limits: Optional[Dict[str, int]] = None,
+                 timeouts: Optional[Dict[str, float]] = None):
+        self.tools = {tool.name: tool for tool in tools}
+        max_workers = max_workers or Config.TOOL_MAX_WORKERS
+        limits = Config.TOOL_CONCURRENCY if limits is None else limits
+        self.timeouts = Config.TOOL_TIMEOUTS if timeouts is None else timeouts
+        self._slots = {name: threading.BoundedSemaphore(min(limits.get(name, max_workers), max_workers))
+                       for name in self.tools}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tools")
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=Config.PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+    def __call__(self, state) -> Dict:
+        tool_calls = getattr(state["messages"][-1], "tool_calls", None) or []
+        if len(tool_calls) == 1:
+            return {"messages": [self._run(tool_calls[0])]}
+        # Each call runs in a copy of this context, so it sees the solve's cancellation token
+        futures = [self._pool.submit(contextvars.copy_context().run, self._run, tool_call) for tool_call in tool_calls]
+        return {"messages": [future.result() for future in futures]}
+
+    def _run(self, tool_call: Dict) -> ToolMessage:
+        name = tool_call["name"]
+        tool = self.tools.get(name)
+        if tool is None:
+            return self._message(tool_call, f"Error: {name} is not a valid tool, try one of {sorted(self.tools)}.",
+                                 "error")
+        try:
+            output = get_tool_cache().call(name, tool_call["args"], lambda: self._invoke(tool, tool_call["args"]))
+        except SolveCancelled:
+            raise
+        except TimeoutError as e:
+            print(f"Tool {e}")
+            return self._message(tool_call, f"Error: {e}", "error")
+        except Exception as e:
+            return self._message(tool_call, f"Error: {e!r}\n Please fix your mistakes.", "error")
+        return self._message(tool_call, output)
+
+    def prefetch(self, name: str, calls: List[Dict]) -> List[Future]:
+        """
+        Start calls of one tool in the background to warm the tool cache in the caller's context (e.g. the solve
+        scope). Cancel the futures to drop the calls that have not started. Failures are ignored.
+        """
+        tool = self.tools[name]
+        metrics.increment("tool_prefetches", len(calls))
+        return [self._prefetch_pool.submit(contextvars.copy_context().run, self._prefetch, tool, args) for args in calls]
+
+    def _prefetch(self, tool, args: Dict) -> None:
+        try:
+            get_tool_cache().call(tool.name, args, lambda: self._invoke(tool, args))
+        except Exception as e:
+            print(f"Prefetch of {tool.name} {args} failed: {e}")
+
+    def _invoke(self, tool, args: Dict):
+        """Call a tool once one of its slots is free, within its timeout."""
+        slot = self._slots[tool.name]
+        while not slot.acquire(timeout=Config.CANCEL_POLL_SECONDS):
+            raise_if_cancelled()
+        try:
+            return call_with_timeout(lambda: tool.invoke(args), self.timeouts.get(tool.name, Config.TOOL_TIMEOUT),
+                                     tool.name)
+        finally:
+            slot.release()
+
+    @staticmethod
+    def _message(tool_call: Dict, output, status: str = "success") -> ToolMessage:
+        if not isinstance(output, str):
+            try:
+                output = json.dumps(output, ensure_ascii=False)
+            except (TypeError, ValueError):
+                output = str(output)
+        return ToolMessage(content=output, name=tool_call["name"], tool_call_id=tool_call["id"], status=status)
@@ -4,6 +4,7 @@ import requests
 import itertools
 from langchain_core.tools import tool
 from .utils import check_given_letters, clean_wiktionary_string
+from .http_client import request_with_retries
 
 # Tools for the agent
 @tool
@@ -36,7 +37,11 @@ def get_meanings(word: str) -> Dict:
     endpoint = 'https://en.wiktionary.org/api/rest_v1/page/definition'
     url = f"{endpoint}/{word}"
     headers = {"origin": "test"}
-    response = requests.get(url, headers=headers)
+    try:
+        response = request_with_retries("GET", url, "wiktionary", headers=headers)
+    except requests.exceptions.RequestException as e:
+        print(f"Error: {e}")
+        return {"word": word, "meanings": []}
     if response.status_code != 200:
         print(f"Error: {response.status_code}")
         return {"word": word, "meanings": []}
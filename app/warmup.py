@@ -0,0 +1,85 @@
+"""
+Background warm-up of the expensive parts of the application.
+Heavy imports (langchain, langgraph) and solver construction are deferred until after boot
+and run on a background thread, so the mock endpoint and health checks are served straight away.
+"""
+import os
+import threading
+import time
+
+# Warm-up tasks in registration order: name -> callable
+# A task returns False if its component is disabled by configuration, anything else means ready.
+_tasks = {}
+_status = {}
+_lock = threading.Lock()
+_thread = None
+
+
+def register_warmup(name, func):
+    """Register a named warm-up task to run in the background after boot."""
+    with _lock:
+        _tasks[name] = func
+        _status.setdefault(name, {"status": "pending"})
+
+
+def start_warmup():
+    """Start the background warm-up thread if it is not already running in this process."""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+        _thread.start()
+
+
+def run_warmup():
+    """
+    Run every registered warm-up task, recording the outcome of each. Tasks registered while warming up (by the
+    modules a task imports) are run too, until none is left pending.
+    """
+    done = set()
+    while True:
+        with _lock:
+            tasks = [(name, func) for name, func in _tasks.items() if name not in done]
+        if not tasks:
+            return
+        for name, func in tasks:
+            done.add(name)
+            with _lock:
+                if _status.get(name, {}).get("status") in ("ready", "disabled"):
+                    continue
+                _status[name] = {"status": "warming"}
+            start = time.perf_counter()
+            try:
+                result = func()
+                status = {"status": "disabled" if result is False else "ready"}
+            except Exception as e:
+                print(f"Warm-up of {name} failed: {e}")
+                status = {"status": "failed", "error": str(e)}
+            status["seconds"] = round(time.perf_counter() - start, 3)
+            with _lock:
+                _status[name] = status
+
+
+def readiness():
+    """Report whether every registered component has finished warming up, and the errors of those that failed."""
+    with _lock:
+        components = {name: dict(status) for name, status in _status.items()}
+    ready = all(c["status"] in ("ready", "disabled") for c in components.values())
+    errors = {name: c["error"] for name, c in components.items() if c["status"] == "failed"}
+    return {"ready": ready, "errors": errors, "components": components}
+
+
+def _reset_after_fork():
+    # Threads do not survive a fork, so a worker forked from a preloaded master must start its own.
+    global _thread, _lock
+    _lock = threading.Lock()
+    if _thread is not None:
+        _thread = None
+        for name, status in _status.items():
+            if status["status"] == "warming":
+                _status[name] = {"status": "pending"}
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Benchmark the solver modes against the clue corpus in app/data/benchmark_clues.json.
+Reports latency, LLM calls, token usage, cost and accuracy per mode, and the savings of each mode relative to the
+first. The langgraph mode runs with the configured settings, and the other langgraph modes override them
+(see MODE_CONFIG): langgraph_strong uses the strong model for every node, and langgraph_text has the per-component
+nodes answer in text lines rather than with structured output.
+
+Usage:
+    python benchmark.py --modes two_stage single_call --provider openai --limit 5
+"""
+import argparse
+import json
+import os
+import time
+
+from config import Config
+from app import metrics
+from app.tool_cache import get_tool_cache
+from app.get_solution import get_openai_solution, get_claude_solution, get_langgraph_solver, solve_with_fast_path
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'app', 'data', 'benchmark_clues.json')
+MODES = ["two_stage", "single_call", "langgraph", "langgraph_strong", "langgraph_text", "langgraph_fast"]
+
+# Config overrides per mode
+MODE_CONFIG = {
+    "langgraph_strong": {"MODEL_ROUTES": {}},
+    "langgraph_text": {"STRUCTURED_NODE_OUTPUT": False},
+}
+
+# USD per million tokens: (uncached prompt, cached prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4": (30.00, 30.00, 60.00),
+    "claude-3-5-sonnet-20241022": (3.00, 0.30, 15.00),
+}
+
+
+def cost(model, stats):
+    """Cost in USD of a model's LLM usage, or None if its prices are not known."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    uncached = stats["prompt_tokens"] - stats["cached_tokens"]
+    return (uncached * prices[0] + stats["cached_tokens"] * prices[1] + stats["completion_tokens"] * prices[2]) / 1e6
+
+
+def load_corpus(limit=None):
+    """Load the benchmark clues: a list of {clue, length, answer}."""
+    with open(CORPUS_PATH, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    return corpus[:limit] if limit else corpus
+
+
+def solve_with_mode(mode, provider, entry):
+    """Solve one clue in the given mode and return the proposed answer ('' if none)."""
+    clue = f"{entry['clue']} ({entry['length']})"
+    if mode.startswith("langgraph"):
+        solver = get_langgraph_solver()
+        if solver is None:
+            raise RuntimeError("LangGraph solver is not available (check OPENAI_API_KEY)")
+        if mode == "langgraph_fast":
+            state = solve_with_fast_path(solver, entry["clue"], {}, entry["length"])
+        else:
+            state = solver.solve(entry["clue"], {}, entry["length"])
+        final_solution = state.get("final_solution")
+        return final_solution["solution"] if final_solution else ""
+
+    Config.LEGACY_SINGLE_CALL = mode == "single_call"
+    result = get_openai_solution(clue) if provider == "openai" else get_claude_solution(clue)
+    if not isinstance(result, dict) or "error" in result:
+        return ""
+    return (result.get("complete_solution") or {}).get("solution", "")
+
+
+def run_mode(mode, provider, corpus):
+    """Run every clue through one mode and summarise latency, usage and accuracy."""
+    latencies = []
+    totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    nodes = {}
+    models = {}
+    counters = {}
+    correct = 0
+    get_tool_cache().clear()  # Each mode starts with a cold tool cache
+
+    for entry in corpus:
+        metrics.reset()
+        overrides = MODE_CONFIG.get(mode, {})
+        saved = {name: getattr(Config, name) for name in overrides}
+        for name, value in overrides.items():
+            setattr(Config, name, value)
+        start = time.perf_counter()
+        try:
+            answer = solve_with_mode(mode, provider, entry)
+        except Exception as e:
+            print(f"  [{mode}] {entry['clue']}: failed ({e})")
+            answer = ""
+        finally:
+            for name, value in saved.items():
+                setattr(Config, name, value)
+        latencies.append(time.perf_counter() - start)
+
+        usage = metrics.snapshot()
+        for key in totals:
+            totals[key] += usage["llm_total"][key]
+        for node, stats in usage["llm"].items():
+            node_totals = nodes.setdefault(node, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+            for key in node_totals:
+                node_totals[key] += stats[key]
+        for model, stats in usage["llm_models"].items():
+            model_totals = models.setdefault(model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                                     "cached_tokens": 0, "seconds": 0.0})
+            for key in model_totals:
+                model_totals[key] += stats[key]
+        for name, value in usage["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+
+        is_correct = answer.replace(" ", "").upper() == entry["answer"]
+        correct += is_correct
+        print(f"  [{mode}] {entry['clue']} -> {answer or '-'} ({'ok' if is_correct else 'expected ' + entry['answer']}, {latencies[-1]:.1f}s)")
+
+    n = len(corpus)
+    latencies.sort()
+    model_costs = {model: cost(model, stats) for model, stats in models.items()}
+    return {
+        "mode": mode,
+        "clues": n,
+        "accuracy": correct / n,
+        "mean_latency": sum(latencies) / n,
+        "p95_latency": latencies[min(n - 1, int(n * 0.95))],
+        "calls_per_clue": totals["calls"] / n,
+        "prompt_tokens_per_clue": totals["prompt_tokens"] / n,
+        "completion_tokens_per_clue": totals["completion_tokens"] / n,
+        "cached_token_ratio": totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0,
+        "wasted_calls_per_clue": counters.get("wasted_llm_calls", 0) / n,
+        "cost_per_clue": sum(c for c in model_costs.values() if c is not None) / n,
+        "unpriced_models": sorted(model for model, c in model_costs.items() if c is None),
+        "nodes": nodes,
+        "models": models,
+        "counters": counters,
+    }
+
+
+def print_report(results):
+    """Print a summary per mode and the savings relative to the first mode."""
+    print("\n" + "=" * 70)
+    for r in results:
+        print(f"{r['mode']}: {r['clues']} clues, accuracy {r['accuracy']:.0%}")
+        print(f"  latency     mean {r['mean_latency']:.2f}s, p95 {r['p95_latency']:.2f}s")
+        print(f"  LLM calls   {r['calls_per_clue']:.1f} per clue, {r['wasted_calls_per_clue']:.2f} wasted on unparseable answers")
+        print(f"  tokens      {r['prompt_tokens_per_clue']:.0f} prompt + {r['completion_tokens_per_clue']:.0f} completion per clue"
+              f" ({r['cached_token_ratio']:.0%} of prompt tokens cached)")
+        print(f"  cost        ${r['cost_per_clue']:.4f} per clue"
+              + (f" (no prices for {', '.join(r['unpriced_models'])})" if r["unpriced_models"] else ""))
+        for model, stats in sorted(r["models"].items()):
+            mean_seconds = stats["seconds"] / stats["calls"] if stats["calls"] else 0.0
+            print(f"    {model}: {stats['calls']} calls, {mean_seconds:.2f}s per call, "
+                  f"{stats['prompt_tokens']} prompt + {stats['completion_tokens']} completion tokens")
+        for node, stats in sorted(r["nodes"].items()):
+            ratio = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+            print(f"    {node}: {stats['calls']} calls, {ratio:.0%} of prompt tokens cached")
+        for name, value in sorted(r["counters"].items()):
+            print(f"  {name}: {value}")
+        if r["counters"].get("fast_path_runs"):
+            print(f"  fast path hit rate {r['counters'].get('fast_path_hits', 0) / r['counters']['fast_path_runs']:.0%}")
+        lookups = r["counters"].get("tool_cache_hits", 0) + r["counters"].get("tool_cache_misses", 0)
+        if lookups:
+            print(f"  tool cache hit rate {r['counters'].get('tool_cache_hits', 0) / lookups:.0%}, "
+                  f"{r['counters'].get('tool_cache_bytes_saved', 0) / 1024:.1f} KiB of tool output reused")
+
+    baseline = results[0]
+    for r in results[1:]:
+        def saving(key):
+            return 1 - r[key] / baseline[key] if baseline[key] else 0.0
+        print(f"\n{r['mode']} vs {baseline['mode']}: "
+              f"latency {saving('mean_latency'):+.0%} saved, "
+              f"calls {saving('calls_per_clue'):+.0%} saved, "
+              f"prompt tokens {saving('prompt_tokens_per_clue'):+.0%} saved, "
+              f"completion tokens {saving('completion_tokens_per_clue'):+.0%} saved, "
+              f"cost {saving('cost_per_clue'):+.0%} saved, "
+              f"wasted calls {saving('wasted_calls_per_clue'):+.0%} saved, "
+              f"accuracy {r['accuracy'] - baseline['accuracy']:+.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cryptic crossword solver modes")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["two_stage", "single_call"])
+    parser.add_argument("--provider", choices=["openai", "anthropic"], default="openai", help="Provider for the legacy modes")
+    parser.add_argument("--limit", type=int, default=None, help="Only run the first N clues")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.limit)
+    results = []
+    for mode in args.modes:
+        print(f"Running {mode} on {len(corpus)} clues...")
+        results.append(run_mode(mode, args.provider, corpus))
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,89 @@ class Config:
     API_PROVIDER = os.environ.get('LLM_API_PROVIDER', 'openai')  # Changed from API_PROVIDER
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY') or 'your_default_openai_api_key'
     ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY') or 'your_default_anthropic_api_key'
-    API_RATE_LIMIT = int(os.environ.get('API_RATE_LIMIT', 5)) or 5
+
+    # Outbound rate limits per provider: (requests per minute, tokens per minute), 0 disables a limit
+    RATE_LIMITS = {
+        'openai': (int(os.environ.get('OPENAI_RPM', 500)), int(os.environ.get('OPENAI_TPM', 30000))),
+        'anthropic': (int(os.environ.get('ANTHROPIC_RPM', 50)), int(os.environ.get('ANTHROPIC_TPM', 40000))),
+    }
+    RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', 30))  # Seconds a call may queue for quota
+    RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB')  # Shared by all workers, defaults to a file in the temp dir
+
+    # Outbound HTTP: pooled keep-alive sessions with timeouts and retry/backoff on 429/5xx
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5))
+    HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 60))
+    HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 3))
+    HTTP_BACKOFF_BASE = float(os.environ.get('HTTP_BACKOFF_BASE', 0.5))  # Seconds, doubled on each retry
+    HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))  # Keep-alive connections per provider
+
+    # Hedged LLM requests: send a duplicate when a call is slower than the given latency percentile
+    HEDGE_ENABLED = os.environ.get('HEDGE_ENABLED', 'False').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 95))
+    HEDGE_MIN_SAMPLES = int(os.environ.get('HEDGE_MIN_SAMPLES', 20))  # Calls observed before hedging starts
+    HEDGE_BUDGET_RATIO = float(os.environ.get('HEDGE_BUDGET_RATIO', 0.1))  # Max hedges per primary call
+    HEDGE_MAX_IN_FLIGHT = int(os.environ.get('HEDGE_MAX_IN_FLIGHT', 2))
+    HEDGE_POOL_SIZE = int(os.environ.get('HEDGE_POOL_SIZE', 8))
+    HEDGE_CROSS_PROVIDER = os.environ.get('HEDGE_CROSS_PROVIDER', 'False').lower() == 'true'  # Legacy path: hedge OpenAI with Claude and vice versa
     
     # Solver Configuration
     USE_LANGGRAPH = os.environ.get('USE_LANGGRAPH', 'True').lower() == 'true'
     MAX_SOLVER_ITERATIONS = int(os.environ.get('MAX_SOLVER_ITERATIONS', 3))
+    LEGACY_SINGLE_CALL = os.environ.get('LEGACY_SINGLE_CALL', 'False').lower() == 'true'  # Legacy path: reasoning and structure in one call
+    BATCH_ANALYSIS = os.environ.get('BATCH_ANALYSIS', 'True').lower() == 'true'  # Analyse the whole clue in one call per attempt, per word only when uncertain
+    # Model cascade: nodes routed to the fast model escalate to the strong model when its answer is unusable
+    MODEL_STRONG = os.environ.get('MODEL_STRONG', 'gpt-4o')
+    MODEL_FAST = os.environ.get('MODEL_FAST', 'gpt-4o-mini')  # Empty to use the strong model everywhere
+    # Model tier per node, e.g. "analyse_component=fast,find_target=fast". Nodes not listed use the strong model
+    MODEL_ROUTES = dict(route.split('=', 1) for route in os.environ.get(
+        'MODEL_ROUTES', 'batch_analyse=fast,analyse_component=fast,find_target=fast').split(',') if route)
+    CASCADE_UNCERTAIN_RATIO = float(os.environ.get('CASCADE_UNCERTAIN_RATIO', 0.5))  # Fast batch analyses with more uncertain spans than this are escalated
+    STRUCTURED_NODE_OUTPUT = os.environ.get('STRUCTURED_NODE_OUTPUT', 'True').lower() == 'true'  # Per-component nodes answer with a schema-validated function call instead of text lines
+    STREAM_EARLY_STOP = os.environ.get('STREAM_EARLY_STOP', 'True').lower() == 'true'  # Stream per-component replies and close them once the needed fields have arrived
+    STREAM_MALFORMED_CHARS = int(os.environ.get('STREAM_MALFORMED_CHARS', 300))  # Streamed replies with no field line after this many characters are cut off as malformed
+    PRELABEL_CONFIDENCE = float(os.environ.get('PRELABEL_CONFIDENCE', 0.9))  # Local classifier confidence to label a span without the LLM, 0 disables
+    CONVERGENCE_AGREEMENT = int(os.environ.get('CONVERGENCE_AGREEMENT', 2))  # Attempts proposing the same fitting answer before stopping
+    STALL_ATTEMPTS = int(os.environ.get('STALL_ATTEMPTS', 2))  # Attempts in a row with no new answer before giving up
+    ATTEMPT_REUSE = os.environ.get('ATTEMPT_REUSE', 'True').lower() == 'true'  # Carry analyses not implicated in an attempt's failure over to the next attempt
+    FAST_PATH = os.environ.get('FAST_PATH', 'True').lower() == 'true'  # Race a mechanical solver (hidden words, reversals, anagrams) against the graph
+    FAST_PATH_HEAD_START = float(os.environ.get('FAST_PATH_HEAD_START', 0.5))  # Seconds the fast path runs alone, so a confident answer skips the LLM
+    FAST_PATH_SKIP_CONFIDENCE = float(os.environ.get('FAST_PATH_SKIP_CONFIDENCE', 0.85))  # Fast answers this confident within the head start skip the LLM
+    FAST_PATH_MIN_CONFIDENCE = float(os.environ.get('FAST_PATH_MIN_CONFIDENCE', 0.6))  # Fast answers this confident cancel the graph
+    FAST_PATH_MAX_WAIT = float(os.environ.get('FAST_PATH_MAX_WAIT', 2.0))  # Seconds to wait for the fast path once the graph has finished unsolved, within the solve's budget
+    TOOL_OUTPUT_MAX_CHARS = int(os.environ.get('TOOL_OUTPUT_MAX_CHARS', 2000))  # Larger tool outputs are summarised in state
+    TOOL_OUTPUT_SUMMARY_ITEMS = int(os.environ.get('TOOL_OUTPUT_SUMMARY_ITEMS', 25))  # List items kept in a summary
+    MAX_MESSAGE_CHARS = int(os.environ.get('MAX_MESSAGE_CHARS', 12000))  # Hard cap on the message window per solve
+    PROMPT_MAX_TOKENS = int(os.environ.get('PROMPT_MAX_TOKENS', 2500))  # Ceiling on each node prompt, instructions included
+    PROMPT_TOOL_RESULT_ITEMS = int(os.environ.get('PROMPT_TOOL_RESULT_ITEMS', 10))  # List items kept per tool result in a prompt (e.g. top anagram hits)
+    WARMUP_ON_BOOT = os.environ.get('WARMUP_ON_BOOT', 'True').lower() == 'true'  # Build the solver in the background after boot
+
+    # Default per-solve budgets, overridable per request, 0 disables a limit
+    SOLVE_MAX_SECONDS = float(os.environ.get('SOLVE_MAX_SECONDS', 120))
+    SOLVE_MAX_LLM_CALLS = int(os.environ.get('SOLVE_MAX_LLM_CALLS', 0))
+    SOLVE_MAX_TOKENS = int(os.environ.get('SOLVE_MAX_TOKENS', 0))
+    NODE_TIMEOUT = float(os.environ.get('NODE_TIMEOUT', 90))  # Seconds a node's LLM call may take, 0 disables
+    TOOL_TIMEOUT = float(os.environ.get('TOOL_TIMEOUT', 15))  # Seconds a tool call may take, 0 disables
+    # Per-tool overrides of TOOL_TIMEOUT, e.g. "get_meanings=10,generate_anagrams=5"
+    TOOL_TIMEOUTS = {name: float(value) for name, value in (item.split('=', 1) for item in os.environ.get(
+        'TOOL_TIMEOUTS', '').split(',') if item)}
+    TOOL_MAX_WORKERS = int(os.environ.get('TOOL_MAX_WORKERS', 8))  # Threads running the tool calls of LLM turns, shared by all solves
+    # Tool calls of one tool that may run at once, across all solves. Unlisted tools may use every worker
+    TOOL_CONCURRENCY = {name: int(value) for name, value in (item.split('=', 1) for item in os.environ.get(
+        'TOOL_CONCURRENCY', 'get_meanings=4,generate_anagrams=2').split(',') if item)}
+    TOOL_CACHE = os.environ.get('TOOL_CACHE', 'True').lower() == 'true'  # Memoize tool calls per solve and process-wide (policies in app/tool_cache.py)
+    PREFETCH = os.environ.get('PREFETCH', 'True').lower() == 'true'  # Look up the clue's words and likely definitions as a solve starts
+    PREFETCH_SPAN_WORDS = int(os.environ.get('PREFETCH_SPAN_WORDS', 3))  # Longest phrase at either end of the clue looked up as a likely definition
+    PREFETCH_MAX_LOOKUPS = int(os.environ.get('PREFETCH_MAX_LOOKUPS', 12))  # Lookups prefetched per solve
+    PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 4))  # Threads making prefetch lookups, shared by all solves
+    CANCEL_POLL_SECONDS = float(os.environ.get('CANCEL_POLL_SECONDS', 0.2))  # How often waits check for cancellation and client disconnects
+
+    # Optional SQLite checkpointing of solves (requires langgraph-checkpoint-sqlite), disabled when unset
+    CHECKPOINT_DB = os.environ.get('CHECKPOINT_DB')
+    CHECKPOINT_BATCH_SIZE = int(os.environ.get('CHECKPOINT_BATCH_SIZE', 20))  # Writes per commit
+    CHECKPOINT_FLUSH_SECONDS = float(os.environ.get('CHECKPOINT_FLUSH_SECONDS', 1.0))  # Max time a write stays uncommitted
+    CHECKPOINT_MAX_AGE = float(os.environ.get('CHECKPOINT_MAX_AGE', 7 * 24 * 3600))  # Seconds
+    CHECKPOINT_MAX_BYTES = int(os.environ.get('CHECKPOINT_MAX_BYTES', 200 * 1024 * 1024))
+    CHECKPOINT_PRUNE_INTERVAL = float(os.environ.get('CHECKPOINT_PRUNE_INTERVAL', 300))  # Seconds between prunes
     
     # Flask Configuration
     DEBUG = os.environ.get('TEST_MODE', 'False').lower() == 'true'
@@ -6,6 +6,7 @@ Flask app runner for UI testing with mock mode enabled by default.
 import os
 from flask import Flask, render_template
 from app.api import api_blueprint
+from app.warmup import start_warmup
 
 def create_test_app():
     """Create Flask app configured for UI testing."""
@@ -25,6 +26,7 @@ def create_test_app():
         """Render the main page but with mock mode enabled by default."""
         return render_template('index.html', mock_mode=True)
     
+    start_warmup()
     return app
 
 def main():
@@ -36,10 +36,13 @@ PORT=5000
 # LLM API Configuration
 LLM_API_PROVIDER=openai
 TEST_MODE=false
+LEGACY_SINGLE_CALL=false
 
 # LangGraph Configuration
 USE_LANGGRAPH=true
 MAX_SOLVER_ITERATIONS=3
+WARMUP_ON_BOOT=true
+# CHECKPOINT_DB=checkpoints.sqlite  # Enable resumable solves (needs langgraph-checkpoint-sqlite)
 
 # OpenAI API (required for LangGraph solver)
 OPENAI_API_KEY=your_openai_api_key_here
@@ -47,8 +50,12 @@ OPENAI_API_KEY=your_openai_api_key_here
 # Anthropic API (alternative)
 ANTHROPIC_API_KEY=your_anthropic_api_key_here
 
-# Rate limiting (seconds between API calls)
-API_RATE_LIMIT=5
+# Outbound rate limits (requests / tokens per minute, shared by all workers)
+OPENAI_RPM=500
+OPENAI_TPM=30000
+ANTHROPIC_RPM=50
+ANTHROPIC_TPM=40000
+RATE_LIMIT_MAX_WAIT=30
 """)
         print(f"✓ Created {env_file}.example - please copy to {env_file} and configure")
     else:
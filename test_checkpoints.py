@@ -0,0 +1,57 @@
+"""
+Tests for pruning the SQLite checkpoints of old solves.
+"""
+import time
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.sqlite")
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.checkpoints import create_checkpointer
+from config import Config
+
+
+@pytest.fixture
+def checkpointer(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "CHECKPOINT_DB", str(tmp_path / "checkpoints.sqlite"))
+    return create_checkpointer()
+
+
+def _write_solves(checkpointer, count, payload=""):
+    """Checkpoint `count` solves, solve-0 being the least recently updated."""
+    now = time.time()
+    for i in range(count):
+        thread_id = f"solve-{i}"
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"clue": payload}
+        checkpointer.put({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}, checkpoint, {}, {})
+        checkpointer.record_solve(thread_id, "Shredded corset for companion (6)", "finished")
+        checkpointer.conn.execute("UPDATE solves SET updated = ? WHERE thread_id = ?", (now - (count - i) * 60, thread_id))
+    checkpointer.flush()
+
+
+def _threads(checkpointer, table):
+    return {row[0] for row in checkpointer.conn.execute(f"SELECT DISTINCT thread_id FROM {table}")}
+
+
+def test_solves_past_the_max_age_are_deleted(checkpointer):
+    _write_solves(checkpointer, 6)
+    checkpointer.prune(max_age_seconds=3.5 * 60, max_bytes=10 ** 9)  # Keeps the three updated in the last 3.5 minutes
+
+    kept = {"solve-3", "solve-4", "solve-5"}
+    assert {solve["solve_id"] for solve in checkpointer.list_solves()} == kept
+    assert _threads(checkpointer, "checkpoints") == kept
+
+
+def test_oldest_solves_are_deleted_until_under_the_size_limit(checkpointer):
+    _write_solves(checkpointer, 30, payload="x" * 20000)
+    max_bytes = checkpointer._used_bytes() // 2
+    checkpointer.prune(max_age_seconds=10 ** 6, max_bytes=max_bytes)
+
+    kept = _threads(checkpointer, "checkpoints")
+    assert checkpointer._used_bytes() <= max_bytes
+    assert "solve-0" not in kept and "solve-29" in kept
+    assert kept == {solve["solve_id"] for solve in checkpointer.list_solves(100)}
+    # Only the oldest solves were deleted
+    assert kept == {f"solve-{i}" for i in range(30 - len(kept), 30)}
@@ -0,0 +1,139 @@
+"""
+Tests for the deterministic fast path and its race against the LangGraph solver, with a fake dictionary.
+"""
+import time
+
+import pytest
+
+import app.fast_path as fast_path
+from app import metrics
+from app.tool_cache import get_tool_cache
+from app.cancellation import SolveCancelled, raise_if_cancelled
+from app.get_solution import solve_with_fast_path
+from config import Config
+
+MEANINGS = {
+    "rout": ["A disorderly retreat; a defeat."],
+    "star": ["A luminous body.", "A celebrity; a famous person."],
+    "celebrity": ["A famous person; a star."],
+    "companion": ["A friend or partner.", "An escort."],
+    "escort": ["A companion or guide."],
+}
+
+
+class FakeMeanings:
+    def invoke(self, args):
+        return {"word": args["word"], "meanings": MEANINGS.get(args["word"], [])}
+
+
+class FakeSolver:
+    """Stands in for the LangGraph solver: runs until cancelled, or answers after `seconds`."""
+
+    def __init__(self, seconds=5.0, solved=True, error=None):
+        self.seconds = seconds
+        self.solved = solved
+        self.error = error
+        self.started = False
+        self.cancelled = False
+
+    def solve(self, clue, givens, length, solve_id=None, budget=None, on_progress=None):
+        self.started = True
+        deadline = time.perf_counter() + self.seconds
+        while time.perf_counter() < deadline:
+            try:
+                raise_if_cancelled()
+            except SolveCancelled:
+                self.cancelled = True
+                raise
+            time.sleep(0.01)
+        if self.error:
+            raise self.error
+        return {"solved": self.solved, "final_solution": {"solution": "GRAPH"}, "confidence": 1.0}
+
+
+class HangingFastPath:
+    """A fast path that runs until cancelled."""
+
+    def __init__(self):
+        self.cancelled = False
+
+    def __call__(self, clue, givens, length):
+        while True:
+            try:
+                raise_if_cancelled()
+            except SolveCancelled:
+                self.cancelled = True
+                raise
+            time.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def dictionary(monkeypatch):
+    monkeypatch.setattr(fast_path, "get_meanings", FakeMeanings())
+    get_tool_cache().clear()
+
+
+@pytest.mark.parametrize("clue, length, answer, wordplay_type", [
+    ("Defeat in some trout", 4, "ROUT", "hidden"),
+    ("Celebrity rats returned", 4, "STAR", "reversal"),
+    ("Shredded corset for companion", 6, "ESCORT", "anagram"),
+])
+def test_mechanical_clues(clue, length, answer, wordplay_type):
+    result = fast_path.solve_fast(clue, {}, length)
+    assert result["solved"] and result["stop_reason"] == "fast_path"
+    assert result["final_solution"]["solution"] == answer
+    roles = {c["role"]: c for c in result["final_solution"]["wordplay_analysis"]}
+    assert roles["indicator"]["wordplay_type"] == wordplay_type
+    assert roles["target"]["targeted_by"]["id"] == roles["indicator"]["id"]
+
+
+def test_candidates_must_fit_and_match_the_definition():
+    assert fast_path.solve_fast("Defeat in some trout", {0: "X"}, 4) is None
+    assert fast_path.solve_fast("Planet's heart broken", {}, 5) is None
+    assert fast_path.solve_fast("Defeat in some trout", {}, None) is None
+
+
+def test_confident_fast_answer_skips_the_llm():
+    solver = FakeSolver()
+    result = solve_with_fast_path(solver, "Celebrity rats returned", {}, 4)
+    assert result["final_solution"]["solution"] == "STAR"
+    assert not solver.started
+    assert metrics.snapshot()["counters"]["fast_path_llm_skipped"] >= 1
+
+
+def test_fast_answer_cancels_the_graph(monkeypatch):
+    monkeypatch.setattr(Config, "FAST_PATH_SKIP_CONFIDENCE", 1.0)
+    monkeypatch.setattr(Config, "FAST_PATH_HEAD_START", 0)
+    solver = FakeSolver()
+    result = solve_with_fast_path(solver, "Defeat in some trout", {}, 4)
+    assert result["final_solution"]["solution"] == "ROUT"
+    time.sleep(0.1)
+    assert solver.cancelled
+
+
+def test_graph_answers_when_the_fast_path_cannot():
+    result = solve_with_fast_path(FakeSolver(0.1), "Planet's heart broken", {}, 5)
+    assert result["final_solution"]["solution"] == "GRAPH"
+
+
+def test_unsolved_graph_waits_for_the_fast_path_only_briefly(monkeypatch):
+    monkeypatch.setattr(Config, "FAST_PATH_HEAD_START", 0)
+    monkeypatch.setattr(Config, "FAST_PATH_MAX_WAIT", 0.2)
+    hanging = HangingFastPath()
+    monkeypatch.setattr(fast_path, "solve_fast", hanging)
+    start = time.perf_counter()
+    result = solve_with_fast_path(FakeSolver(0.1, solved=False), "Planet's heart broken", {}, 5)
+
+    assert time.perf_counter() - start < 1 and not result["solved"]
+    time.sleep(0.1)
+    assert hanging.cancelled
+
+
+def test_failed_graph_cancels_the_fast_path(monkeypatch):
+    monkeypatch.setattr(Config, "FAST_PATH_HEAD_START", 0)
+    hanging = HangingFastPath()
+    monkeypatch.setattr(fast_path, "solve_fast", hanging)
+    with pytest.raises(RuntimeError):
+        solve_with_fast_path(FakeSolver(0.1, error=RuntimeError("graph failed")), "Planet's heart broken", {}, 5)
+    time.sleep(0.1)
+    assert hanging.cancelled
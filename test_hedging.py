@@ -0,0 +1,48 @@
+"""
+Tests for hedged LLM calls.
+"""
+import time
+
+from config import Config
+from app import hedging
+
+
+def _prime(key, seconds, count=20):
+    for _ in range(count):
+        hedging.latency_tracker.record(key, seconds)
+
+
+def test_slow_primary_is_beaten_by_hedge(monkeypatch):
+    monkeypatch.setattr(Config, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "hedge_budget", hedging.HedgeBudget(ratio=1.0))
+    _prime("test:slow", 0.01)
+
+    start = time.perf_counter()
+    result = hedging.hedged_call("test:slow", lambda: time.sleep(0.5) or "primary", hedge=lambda: "hedge")
+
+    assert result == "hedge"
+    assert time.perf_counter() - start < 0.4
+
+
+def test_invalid_hedge_does_not_win(monkeypatch):
+    monkeypatch.setattr(Config, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "hedge_budget", hedging.HedgeBudget(ratio=1.0))
+    _prime("test:invalid", 0.01)
+
+    result = hedging.hedged_call(
+        "test:invalid",
+        lambda: time.sleep(0.1) or {"solution": "TEA"},
+        hedge=lambda: {"error": "failed"},
+        is_valid=lambda r: "error" not in r
+    )
+
+    assert result == {"solution": "TEA"}
+
+
+def test_budget_limits_hedges():
+    budget = hedging.HedgeBudget(ratio=0.5, max_in_flight=5)
+    budget.earn()
+    assert not budget.try_spend()
+    budget.earn()
+    assert budget.try_spend()
+    assert not budget.try_spend()
@@ -0,0 +1,501 @@
+"""
+Tests for the LangGraph solver, run against a scripted fake LLM.
+"""
+import json
+import threading
+import time
+
+import pytest
+from typing import Dict
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.tools import tool
+
+import app.langgraph_solver as langgraph_solver
+from app.langgraph_solver import CrypticCrosswordSolver
+from app.rate_limiter import TokenBucketLimiter
+from app.span_classifier import prelabel
+from app.budget import parse_budget
+from app.cancellation import run_cancellable, cancel_solve, SolveCancelled
+from app import hedging, metrics
+from app.tool_cache import get_tool_cache
+from config import Config
+
+CLUE = "Shredded corset for companion"
+
+# Per-word answers: word -> (role, wordplay type, result)
+WORD_ANALYSES = {
+    "Shredded": ("indicator", "anagram", ""),
+    "corset": ("synonym", "synonym", "ESCORT"),
+    "for": ("link word", "link word", ""),
+    "companion": ("definition", "synonym", "ESCORT"),
+}
+
+BATCH_SPANS = [
+    {"start": 0, "end": 0, "role": "indicator", "wordplay_type": "anagram", "description": "anagram indicator",
+     "target_start": 1, "target_end": 1, "target_result": "ESCORT", "uncertain": False},
+    {"start": 2, "end": 2, "role": "link word", "wordplay_type": "link word", "description": "link", "uncertain": True},
+    {"start": 3, "end": 3, "role": "definition", "wordplay_type": "synonym", "result": "escort",
+     "description": "definition", "uncertain": False},
+]
+
+
+def _answer(prompt, name, args):
+    """A reply giving args, as a call to the answer function if the prompt asks for one, otherwise in text lines."""
+    if name in prompt:
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": "call_1"}])
+    return AIMessage(content="\n".join(f"{label}: {value or ''}" for label, value in args.items()))
+
+
+class FakeLLM:
+    """Answers each node's prompt from the tables above and records the prompts it was sent."""
+
+    def __init__(self, batch_spans=None):
+        self.batch_spans = batch_spans
+        self.prompts = []
+        self.chunks_streamed = 0
+
+    def invoke(self, messages, **kwargs):
+        prompt = messages[-1].content
+        self.prompts.append(prompt)
+        if "Unresolved clue words:" in prompt:
+            if self.batch_spans is None:
+                return AIMessage(content="no structured output")
+            return AIMessage(content="", tool_calls=[{"name": "analyse_clue", "args": {"spans": self.batch_spans}, "id": "call_1"}])
+        if "identified as an INDICATOR" in prompt:
+            if "record_target" in prompt:
+                return _answer(prompt, "record_target", {"target_index": 1, "target_text": "corset", "role": "target",
+                                                         "wordplay_type": "anagram", "result": "ESCORT", "description": "anagram"})
+            return AIMessage(content="Target Index: 1\nTarget Text: corset\nRole: target\nResult: ESCORT\nDescription: anagram")
+        role, wordplay_type, result = "unknown", "unknown", ""
+        for word, analysis in WORD_ANALYSES.items():
+            if f"Word being analyzed: '{word}'" in prompt:
+                role, wordplay_type, result = analysis
+        if "record_component_analysis" in prompt:
+            return _answer(prompt, "record_component_analysis", {"role": role, "wordplay_type": wordplay_type,
+                                                                 "result": result or None, "description": "-"})
+        return AIMessage(content=f"Role: {role}\nWordplay Type: {wordplay_type}\nResult: {result}\nDescription: -")
+
+    def stream(self, messages, **kwargs):
+        """The invoke reply, a line of text or a few characters of function arguments at a time."""
+        reply = self.invoke(messages, **kwargs)
+        for line in reply.content.splitlines(keepends=True):
+            self.chunks_streamed += 1
+            yield AIMessageChunk(content=line)
+        for index, call in enumerate(reply.tool_calls):
+            arguments = json.dumps(call["args"])
+            for i in range(0, len(arguments), 8):
+                self.chunks_streamed += 1
+                first = i == 0
+                yield AIMessageChunk(content="", tool_call_chunks=[{
+                    "index": index, "id": call["id"] if first else None, "name": call["name"] if first else None,
+                    "args": arguments[i:i + 8]
+                }])
+
+
+class SlowLLM(FakeLLM):
+    """Hangs on every call."""
+
+    def invoke(self, messages, **kwargs):
+        time.sleep(2)
+        return super().invoke(messages, **kwargs)
+
+
+class FakeMeanings:
+    def invoke(self, args):
+        return {"word": args["word"], "meanings": ["a companion"]}
+
+
+looked_up = []
+
+
+@tool("get_meanings")
+def fake_get_meanings(word: str) -> Dict:
+    """Retrieve all meanings of a word."""
+    looked_up.append(word)
+    return {"word": word, "meanings": ["a companion"]}
+
+
+@pytest.fixture
+def solver(monkeypatch, tmp_path):
+    return _make_solver(monkeypatch, tmp_path, None)
+
+
+@pytest.fixture
+def checkpointed_solver(monkeypatch, tmp_path):
+    return _make_solver(monkeypatch, tmp_path, str(tmp_path / "checkpoints.sqlite"))
+
+
+def _make_solver(monkeypatch, tmp_path, checkpoint_db):
+    monkeypatch.setattr(Config, "CHECKPOINT_DB", checkpoint_db)
+    # A private limiter with no limits, so the fake calls are never queued
+    limiter = TokenBucketLimiter(str(tmp_path / "ratelimit.sqlite"), {})
+    monkeypatch.setattr(langgraph_solver, "get_rate_limiter", lambda: limiter)
+    solver = CrypticCrosswordSolver("sk-test")
+    # Patched after construction, since the real tool is bound to the LLM
+    monkeypatch.setattr(langgraph_solver, "get_meanings", FakeMeanings())
+    solver.tool_node.tools["get_meanings"] = fake_get_meanings
+    get_tool_cache().clear()  # Lookups cached by earlier tests would bypass the fake
+    return solver
+
+
+def _use_llm(solver, llm, fast_llm=None):
+    for tier, binding in solver.llms:
+        solver.llms[tier, binding] = fast_llm or llm if tier == "fast" else llm
+    return llm
+
+
+class GarbledLLM(FakeLLM):
+    """A fast model whose answers cannot be parsed."""
+
+    def invoke(self, messages, **kwargs):
+        self.prompts.append(messages[-1].content)
+        return AIMessage(content="I think this word is probably part of the wordplay.")
+
+
+class RamblingLLM(FakeLLM):
+    """Answers with a long description, or answers with nothing but a long explanation."""
+
+    RAMBLING = "".join(f"\nThis word could also be read in another way, number {i}." for i in range(20))
+
+    def __init__(self, answer=True):
+        super().__init__()
+        self.answer = answer
+        self.chunks_sent = 0
+
+    def invoke(self, messages, **kwargs):
+        reply = super().invoke(messages, **kwargs)
+        if not self.answer:
+            reply = AIMessage(content=self.RAMBLING)
+        elif reply.tool_calls:
+            reply.tool_calls[0]["args"]["description"] = self.RAMBLING
+        else:
+            reply.content += self.RAMBLING
+        self.chunks_sent += len(reply.content.splitlines()) + sum(
+            len(range(0, len(json.dumps(call["args"])), 8)) for call in reply.tool_calls)
+        return reply
+
+
+class DriftingLLM(FakeLLM):
+    """Answers with fields the parser cannot use: a role outside the schema, or text lines without a Role line."""
+
+    def invoke(self, messages, **kwargs):
+        reply = super().invoke(messages, **kwargs)
+        if reply.tool_calls and reply.tool_calls[0]["name"] == "record_component_analysis":
+            reply.tool_calls[0]["args"]["role"] = "indicator (probably)"
+        elif "Role:" in reply.content and "Target Index:" not in reply.content:
+            reply.content = reply.content.replace("Role:", "**Role**:")
+        return reply
+
+
+def test_batch_analysis_resolves_confident_spans_in_one_call(solver, monkeypatch):
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    llm = _use_llm(solver, FakeLLM(BATCH_SPANS))
+    result = solver.solve(CLUE, {}, 6)
+
+    assert result["solved"]
+    assert result["final_solution"]["solution"] == "ESCORT"
+    # One batched call, then one per-word call for the uncertain link word
+    assert len(llm.prompts) == 2
+    assert "Word being analyzed: 'for'" in llm.prompts[1]
+    target = next(c for c in result["final_solution"]["wordplay_analysis"] if c["role"] == "target")
+    assert target["text"] == "corset" and target["targeted_by"]["text"] == "Shredded"
+
+
+def test_failed_batch_analysis_falls_back_to_per_word_calls(solver, monkeypatch):
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    llm = _use_llm(solver, FakeLLM(batch_spans=None))
+    result = solver.solve(CLUE, {}, 6)
+
+    assert result["final_solution"]["solution"] == "ESCORT"
+    assert sum("Word being analyzed" in prompt for prompt in llm.prompts) >= 3
+
+
+def test_unparseable_fast_model_answers_are_escalated(solver, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    monkeypatch.setattr(Config, "MODEL_ROUTES", {"analyse_component": "fast"})
+    fast = GarbledLLM()
+    strong = _use_llm(solver, FakeLLM(), fast)
+    escalations = metrics.snapshot()["counters"].get("cascade_escalations", 0)
+    result = solver.solve(CLUE, {}, 6)
+
+    assert result["final_solution"]["solution"] == "ESCORT"
+    # Every component analysis was tried on the fast model, then redone on the strong one
+    analyses = [p for p in strong.prompts if "Word being analyzed" in p]
+    assert fast.prompts == analyses
+    assert metrics.snapshot()["counters"]["cascade_escalations"] == escalations + len(analyses)
+
+
+def test_confident_fast_model_answers_are_kept(solver, monkeypatch):
+    monkeypatch.setattr(Config, "MODEL_ROUTES", {"batch_analyse": "fast"})
+    fast = FakeLLM(BATCH_SPANS)
+    strong = _use_llm(solver, FakeLLM(BATCH_SPANS), fast)
+    result = solver.solve(CLUE, {}, 6)
+
+    assert result["final_solution"]["solution"] == "ESCORT"
+    assert len(fast.prompts) == 1 and not any("Unresolved clue words:" in p for p in strong.prompts)
+
+
+@pytest.mark.parametrize("structured", [True, False])
+def test_streamed_replies_stop_once_the_fields_have_arrived(solver, monkeypatch, structured):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    monkeypatch.setattr(Config, "STRUCTURED_NODE_OUTPUT", structured)
+    llm = _use_llm(solver, RamblingLLM())
+    result = solver.solve(CLUE, {}, 6)
+
+    assert result["final_solution"]["solution"] == "ESCORT"
+    assert llm.chunks_streamed <= llm.chunks_sent // 4
+    companion = next(c for c in result["final_solution"]["wordplay_analysis"] if c["text"] == "companion")
+    assert companion["result"] == "ESCORT"
+
+
+def test_malformed_streamed_replies_are_cut_off_and_escalated(solver, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    monkeypatch.setattr(Config, "STRUCTURED_NODE_OUTPUT", False)
+    monkeypatch.setattr(Config, "MODEL_ROUTES", {"analyse_component": "fast"})
+    fast = RamblingLLM(answer=False)
+    _use_llm(solver, FakeLLM(), fast)
+    malformed = metrics.snapshot()["counters"].get("stream_malformed", 0)
+    result = solver.solve(CLUE, {}, 6)
+
+    assert result["final_solution"]["solution"] == "ESCORT"
+    assert fast.chunks_streamed <= fast.chunks_sent // 2
+    assert metrics.snapshot()["counters"]["stream_malformed"] == malformed + len(fast.prompts)
+
+
+@pytest.mark.parametrize("structured", [True, False])
+def test_unusable_answers_are_counted_as_wasted_calls(solver, monkeypatch, structured):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    monkeypatch.setattr(Config, "STRUCTURED_NODE_OUTPUT", structured)
+    llm = _use_llm(solver, DriftingLLM())
+    wasted = metrics.snapshot()["counters"].get("wasted_llm_calls", 0)
+    result = solver.solve(CLUE, {}, 6, max_iterations=1)
+
+    analyses = [p for p in llm.prompts if "Word being analyzed" in p]
+    assert metrics.snapshot()["counters"]["wasted_llm_calls"] == wasted + len(analyses)
+    assert result["final_solution"] is None
+    assert not result["word_analyses"]
+
+
+def test_structured_answers_are_requested_from_the_answer_functions(solver, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    llm = _use_llm(solver, FakeLLM())
+    result = solver.solve(CLUE, {}, 6)
+
+    assert result["final_solution"]["solution"] == "ESCORT"
+    assert all("record_component_analysis" in p for p in llm.prompts if "Word being analyzed" in p)
+    assert any("record_target" in p for p in llm.prompts)
+    assert not any("Respond in the format" in p for p in llm.prompts)
+
+
+class ToolCallingLLM(FakeLLM):
+    """Looks up the definition with two tools in one turn before analysing it."""
+
+    def invoke(self, messages, **kwargs):
+        prompt = messages[-1].content
+        if "Word being analyzed: 'companion'" in prompt and "Tool Results:" not in prompt:
+            self.prompts.append(prompt)
+            return AIMessage(content="", tool_calls=[
+                {"name": "reverse_word", "args": {"word": "companion"}, "id": "call_1"},
+                {"name": "generate_anagrams", "args": {"text": "abc"}, "id": "call_2"},
+            ])
+        return super().invoke(messages, **kwargs)
+
+
+def test_tool_calls_of_one_turn_are_all_answered(solver, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    llm = _use_llm(solver, ToolCallingLLM())
+    result = solver.solve(CLUE, {}, 6)
+
+    assert result["final_solution"]["solution"] == "ESCORT"
+    final = next(p for p in llm.prompts if "Tool Results:" in p)
+    assert "reverse_word: NOINAPMOC" in final and 'generate_anagrams: ["ABC"' in final
+
+
+class LookupLLM(FakeLLM):
+    """Looks up the definition before analysing it."""
+
+    def invoke(self, messages, **kwargs):
+        prompt = messages[-1].content
+        if "Word being analyzed: 'companion'" in prompt and "Tool Results:" not in prompt:
+            self.prompts.append(prompt)
+            return AIMessage(content="", tool_calls=[{"name": "get_meanings", "args": {"word": "companion"}, "id": "call_1"}])
+        return super().invoke(messages, **kwargs)
+
+
+def test_clue_words_are_prefetched_for_the_tool_calls(solver, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    looked_up.clear()
+    llm = _use_llm(solver, LookupLLM())
+    result = solver.solve(CLUE, {}, 6)
+
+    assert result["final_solution"]["solution"] == "ESCORT"
+    assert {"shredded", "corset", "companion"} <= set(looked_up)
+    assert looked_up.count("companion") == 1
+    assert get_tool_cache().stats()["get_meanings"]["hits"] >= 1
+    assert any("get_meanings: " in p for p in llm.prompts if "Tool Results:" in p)
+
+
+def test_classifier_labels_only_confident_single_role_lexicon_spans():
+    assert prelabel("Shredded")[:2] == ("indicator", "anagram")
+    assert prelabel("with") == ("link word", "link word", pytest.approx(1, abs=0.05))
+    assert prelabel("corset") is None
+    # Listed under several roles, so left to the LLM
+    for phrase in ("for", "in", "upset", "about", "becomes", "a"):
+        assert prelabel(phrase) is None, phrase
+
+
+def test_prelabelled_spans_skip_llm_analysis(solver, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    llm = _use_llm(solver, FakeLLM())
+    skipped = metrics.snapshot()["counters"].get("classifier_skipped_llm_calls", 0)
+    result = solver.solve(CLUE, {}, 6)
+
+    assert result["final_solution"]["solution"] == "ESCORT"
+    assert not any("Word being analyzed: 'Shredded'" in p for p in llm.prompts)
+    assert any("Word being analyzed: 'for'" in p for p in llm.prompts)  # Link word and substitution indicator
+    assert metrics.snapshot()["counters"]["classifier_skipped_llm_calls"] >= skipped + 1
+
+
+class NoMeanings:
+    def invoke(self, args):
+        return None
+
+
+def test_attempts_agreeing_on_an_unverified_answer_converge(solver, monkeypatch):
+    monkeypatch.setattr(langgraph_solver, "get_meanings", NoMeanings())
+    _use_llm(solver, FakeLLM(BATCH_SPANS))
+    result = solver.solve(CLUE, {}, 6, max_iterations=5)
+
+    assert not result["solved"]
+    assert result["stop_reason"] == "converged" and result["attempt_count"] == 2
+    assert result["final_solution"]["solution"] == "ESCORT"
+    assert result["confidence"] == 0.75
+
+
+def test_wrong_length_answers_stall_and_are_surfaced(solver, monkeypatch):
+    _use_llm(solver, FakeLLM(BATCH_SPANS))
+    result = solver.solve(CLUE, {}, 7, max_iterations=5)
+
+    assert result["stop_reason"] == "stalled" and result["attempt_count"] == 2
+    assert not result["solved"] and result["final_solution"]["solution"] == "ESCORT"
+
+
+def test_later_attempts_reanalyse_only_the_implicated_spans(solver, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    llm = _use_llm(solver, FakeLLM())
+    result = solver.solve(CLUE, {}, 7, max_iterations=3)  # ESCORT is too short, so the definition is redone
+
+    assert result["attempt_count"] == 2
+    assert sum("Word being analyzed: 'companion'" in p for p in llm.prompts) == 2
+    assert sum("Word being analyzed: 'Shredded'" in p for p in llm.prompts) == 1
+    assert sum("identified as an INDICATOR" in p for p in llm.prompts) == 1
+    assert any("gave the rejected answer ESCORT" in p for p in llm.prompts)
+    assert all(len(attempt["wordplay_analysis"]) == 4 for attempt in result["solution_attempts"])
+
+
+def test_attempts_without_answers_stop_when_stalled(solver, monkeypatch):
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    monkeypatch.setitem(WORD_ANALYSES, "companion", ("unknown", "unknown", ""))
+    _use_llm(solver, FakeLLM(batch_spans=None))
+    result = solver.solve(CLUE, {}, 6, max_iterations=5)
+
+    assert result["stop_reason"] == "stalled" and result["attempt_count"] == 2
+    assert result["final_solution"]["solution"] == "" and result["confidence"] == 0.0
+    assert result["final_solution"]["wordplay_analysis"]  # The partial analysis is surfaced
+
+
+def test_exhausted_budget_returns_partial_analysis(solver, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    llm = _use_llm(solver, FakeLLM())
+    result = solver.solve(CLUE, {}, 6, budget={"max_llm_calls": 1})
+
+    assert len(llm.prompts) == 1
+    assert result["stop_reason"] == "budget_llm_calls"
+    assert result["budget"]["llm_calls"] == 1 and result["budget"]["exhausted"] == "llm_calls"
+    assert not result["solved"] and len(result["final_solution"]["wordplay_analysis"]) == 1
+
+
+def test_budget_limits_are_validated():
+    assert parse_budget({"max_seconds": 5, "max_tokens": None}) == {"max_seconds": 5}
+    for bad in ({"max_seconds": -1}, {"max_calls": 3}, {"max_tokens": "lots"}, [5]):
+        with pytest.raises(ValueError):
+            parse_budget(bad)
+
+
+def test_cancelled_solve_stops_without_waiting_for_the_llm(solver, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    _use_llm(solver, SlowLLM())
+    threading.Timer(0.3, cancel_solve, ["solve-1"]).start()
+    start = time.perf_counter()
+    with pytest.raises(SolveCancelled):
+        run_cancellable(lambda: solver.solve(CLUE, {}, 6), "solve-1")
+    assert time.perf_counter() - start < 1.5
+    assert not cancel_solve("solve-1")  # No longer running
+
+
+def test_hung_llm_calls_time_out(solver, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_ANALYSIS", False)
+    monkeypatch.setattr(Config, "PRELABEL_CONFIDENCE", 0)
+    monkeypatch.setattr(Config, "NODE_TIMEOUT", 0.2)
+    _use_llm(solver, SlowLLM())
+    start = time.perf_counter()
+    result = solver.solve(CLUE, {}, 6, budget={"max_seconds": 0.5})
+
+    # Each 2s call is abandoned after 0.2s, so the solve ends soon after its deadline
+    assert time.perf_counter() - start < 1.5
+    assert result["stop_reason"] == "budget_deadline"
+    assert not result["word_analyses"]
+
+
+class Interrupted(BaseException):
+    """Stands in for the worker dying mid-solve."""
+
+
+class InterruptingLLM(FakeLLM):
+    """Outlives the solve's deadline and dies on the first call after the batched analysis."""
+
+    def __init__(self):
+        super().__init__(BATCH_SPANS[:1])  # The definition is left for per-word analysis
+        self.interrupt = True
+
+    def invoke(self, messages, **kwargs):
+        if self.interrupt and "Unresolved clue words:" not in messages[-1].content:
+            self.interrupt = False
+            time.sleep(0.3)
+            raise Interrupted()
+        return super().invoke(messages, **kwargs)
+
+
+def test_resumed_solve_runs_on_the_new_requests_budget(checkpointed_solver, monkeypatch):
+    llm = _use_llm(checkpointed_solver, InterruptingLLM())
+    with pytest.raises(Interrupted):
+        checkpointed_solver.solve(CLUE, {}, 6, solve_id="resume-test", budget={"max_seconds": 0.2})
+    batch_calls = sum("Unresolved clue words:" in p for p in llm.prompts)
+
+    result = checkpointed_solver.solve(CLUE, {}, 6, solve_id="resume-test", budget={"max_seconds": 30})
+
+    assert result["solved"] and result["stop_reason"] == "solved"
+    assert result["final_solution"]["solution"] == "ESCORT"
+    assert sum("Unresolved clue words:" in p for p in llm.prompts) == batch_calls  # Not redone
+    assert checkpointed_solver.checkpointer.list_solves(10)[0]["status"] == "finished"
+
+
+def test_llm_latency_is_tracked_per_node(solver, monkeypatch):
+    monkeypatch.setattr(Config, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "latency_tracker", hedging.LatencyTracker(min_samples=1000))
+    _use_llm(solver, FakeLLM(BATCH_SPANS))
+    solver.solve(CLUE, {}, 6)
+
+    keys = set(hedging.latency_tracker._samples)
+    assert any(key.endswith(":batch_analyse") for key in keys)
+    assert len(keys) > 1 and all(key.count(":") == 2 for key in keys)
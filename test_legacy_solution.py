@@ -0,0 +1,160 @@
+"""
+Tests for the legacy (non-LangGraph) solving path: the single-call mode and its fallback, and cancellation and
+timeouts with a hanging provider.
+"""
+import json
+import threading
+import time
+
+import pytest
+
+import app.get_solution as get_solution
+from app import metrics
+from app.prompt_templates import get_template
+from app.cancellation import run_cancellable, cancel_solve
+from app.rate_limiter import TokenBucketLimiter
+from config import Config
+
+
+@pytest.fixture
+def hanging_provider(monkeypatch, tmp_path):
+    calls = []
+
+    def post_json(url, headers, data, provider):
+        calls.append(data["model"])
+        time.sleep(1)
+        raise AssertionError("should have been abandoned")
+
+    limiter = TokenBucketLimiter(str(tmp_path / "ratelimit.sqlite"), {})
+    monkeypatch.setattr(get_solution, "get_rate_limiter", lambda: limiter)
+    monkeypatch.setattr(get_solution, "post_json", post_json)
+    monkeypatch.setattr(Config, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(Config, "LEGACY_SINGLE_CALL", False)
+    return calls
+
+
+def test_hung_stages_time_out(hanging_provider, monkeypatch):
+    monkeypatch.setattr(Config, "NODE_TIMEOUT", 0.2)
+    start = time.perf_counter()
+    result = get_solution.get_openai_solution("Shredded corset for companion (6)")
+
+    assert time.perf_counter() - start < 0.8
+    assert result["error_code"] == "TIMEOUT"
+    assert hanging_provider == ["gpt-4"]  # No structuring stage after the reasoning stage failed
+
+
+def test_cancelled_solve_makes_no_further_stages(hanging_provider, monkeypatch):
+    monkeypatch.setattr(Config, "DEBUG", False)
+    monkeypatch.setattr(Config, "API_PROVIDER", "anthropic")  # Keeps the LangGraph solver out of it
+    monkeypatch.setattr(Config, "ANTHROPIC_API_KEY", "sk-test")
+    threading.Timer(0.2, lambda: cancel_solve("legacy-test")).start()
+    start = time.perf_counter()
+    result = run_cancellable(lambda: get_solution.get_llm_solution("Shredded corset for companion (6)", {}),
+                             "legacy-test")
+
+    assert time.perf_counter() - start < 0.8
+    assert result["error_code"] == "CANCELLED"
+    assert len(hanging_provider) == 1
+
+
+SOLUTION = {
+    "reasoning_analysis": "Shredded is an anagram indicator for CORSET, giving ESCORT, a companion.",
+    "complete_solution": {
+        "solution": "ESCORT",
+        "definition": "companion",
+        "wordplay_components": [{"indicator": "Shredded", "wordplay_type": "anagram", "target": "corset"}]
+    }
+}
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def _function_call(name, arguments):
+    return {"choices": [{"message": {"function_call": {"name": name, "arguments": arguments}}}]}
+
+
+class Stages(list):
+    """The stages called, and the reply to the single call."""
+    single_call_reply = None
+
+
+@pytest.fixture
+def openai_stages(monkeypatch, tmp_path):
+    """Fakes the OpenAI stages, with the single-call reply set by the test."""
+    stages = Stages()
+
+    def post_stage(url, headers, data, provider):
+        function = data.get("function_call", {}).get("name")
+        stages.append(function or "reasoning")
+        if function == "solve_cryptic_clue_single_call":
+            return FakeResponse(stages.single_call_reply)
+        if function == "solve_cryptic_clue":
+            return FakeResponse(_function_call(function, json.dumps({"complete_solution": SOLUTION["complete_solution"]})))
+        return FakeResponse({"choices": [{"message": {"content": "Two-stage reasoning"}}]})
+
+    limiter = TokenBucketLimiter(str(tmp_path / "ratelimit.sqlite"), {})
+    monkeypatch.setattr(get_solution, "get_rate_limiter", lambda: limiter)
+    monkeypatch.setattr(get_solution, "post_stage", post_stage)
+    monkeypatch.setattr(Config, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(Config, "LEGACY_SINGLE_CALL", True)
+    return stages
+
+
+def _fallbacks():
+    return metrics.snapshot()["counters"].get("legacy_single_call_fallbacks", 0)
+
+
+def test_valid_single_call_result_is_returned(openai_stages):
+    openai_stages.single_call_reply = _function_call("solve_cryptic_clue_single_call", json.dumps(SOLUTION))
+    fallbacks = _fallbacks()
+    result = get_solution.get_openai_solution("Shredded corset for companion (6)")
+
+    assert result == SOLUTION
+    assert openai_stages == ["solve_cryptic_clue_single_call"]
+    assert _fallbacks() == fallbacks
+
+
+@pytest.mark.parametrize("reply", [
+    _function_call("solve_cryptic_clue_single_call", json.dumps({"complete_solution": {"solution": "ESCORT"}})),
+    {"choices": [{"message": {"content": "No function call"}}]},
+    _function_call("solve_cryptic_clue_single_call", '{"reasoning_analysis": "cut off'),
+], ids=["schema-invalid", "no-function-call", "malformed-json"])
+def test_unusable_single_call_result_falls_back_to_two_stages(openai_stages, reply):
+    openai_stages.single_call_reply = reply
+    fallbacks = _fallbacks()
+    result = get_solution.get_openai_solution("Shredded corset for companion (6)")
+
+    assert openai_stages == ["solve_cryptic_clue_single_call", "reasoning", "solve_cryptic_clue"]
+    assert result["complete_solution"]["solution"] == "ESCORT"
+    assert result["reasoning_analysis"] == "Two-stage reasoning"
+    assert _fallbacks() == fallbacks + 1
+
+
+def test_claude_requests_mark_the_static_prefix_for_caching(monkeypatch, tmp_path):
+    sent = []
+
+    def post_stage(url, headers, data, provider):
+        sent.append(data)
+        return FakeResponse({"content": [{"type": "tool_use", "name": "solve_cryptic_clue_single_call",
+                                          "input": SOLUTION}]})
+
+    limiter = TokenBucketLimiter(str(tmp_path / "ratelimit.sqlite"), {})
+    monkeypatch.setattr(get_solution, "get_rate_limiter", lambda: limiter)
+    monkeypatch.setattr(get_solution, "post_stage", post_stage)
+    monkeypatch.setattr(Config, "ANTHROPIC_API_KEY", "sk-test")
+    monkeypatch.setattr(Config, "LEGACY_SINGLE_CALL", True)
+    assert get_solution.get_claude_solution("Shredded corset for companion (6)") == SOLUTION
+
+    prefix, context = sent[0]["messages"][0]["content"]
+    assert prefix == {"type": "text", "text": get_template("single_call_prompt").prefix,
+                      "cache_control": {"type": "ephemeral"}}
+    assert "Shredded corset for companion (6)" in context["text"] and "cache_control" not in context
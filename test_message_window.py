@@ -0,0 +1,59 @@
+"""
+Tests for the message-window policy and tool-output summaries.
+"""
+import json
+
+from app.message_window import apply_window, clip_text, get_tool_output, summarise_tool_output
+from config import Config
+
+
+class FakeMessage:
+    def __init__(self, content, tool_calls=None, tool_call_id=None):
+        self.content = content
+        self.tool_calls = tool_calls or []
+        self.additional_kwargs = {"tool_calls": tool_calls} if tool_calls else {}
+        if tool_call_id:
+            self.tool_call_id = tool_call_id
+
+    def model_copy(self, update):
+        return FakeMessage(update.get("content", self.content), self.tool_calls, getattr(self, "tool_call_id", None))
+
+
+def test_long_list_is_summarised_with_reference():
+    anagrams = [f"WORD{i}" for i in range(500)]
+    content = json.dumps(anagrams)
+
+    summary = summarise_tool_output(content, max_chars=200, max_items=5)
+
+    assert summary.startswith(json.dumps(anagrams[:5]))
+    assert "495 more" in summary
+    ref = summary.split("full output: ")[1].rstrip(")")
+    assert get_tool_output(ref) == content
+
+
+def test_short_output_is_unchanged():
+    assert summarise_tool_output('["TEA", "EAT"]', max_chars=200, max_items=5) == '["TEA", "EAT"]'
+
+
+def test_window_keeps_only_latest_tool_exchange():
+    messages = [
+        FakeMessage("old prompt"),
+        FakeMessage("", tool_calls=[{"name": "reverse_word"}]),
+        FakeMessage("DRAW", tool_call_id="1"),
+        FakeMessage("new prompt"),
+        FakeMessage("", tool_calls=[{"name": "generate_anagrams"}]),
+        FakeMessage(json.dumps([f"W{i}" for i in range(2000)]), tool_call_id="2"),
+    ]
+
+    window = apply_window(messages)
+
+    assert len(window) == 2
+    assert window[0] is messages[4]
+    assert len(window[1].content) < len(messages[5].content)
+
+
+def test_text_kept_in_state_is_clipped(monkeypatch):
+    monkeypatch.setattr(Config, "TOOL_OUTPUT_MAX_CHARS", 50)
+    assert clip_text("short") == "short"
+    clipped = clip_text("x" * 500)
+    assert clipped.startswith("x" * 50) and clipped.endswith("(truncated)") and len(clipped) < 80
@@ -0,0 +1,58 @@
+"""
+Tests for the prompt template registry, the prefix-stable prompt layout and token-budgeted context assembly.
+"""
+import pytest
+
+from app.prompt_templates import PromptTemplate, get_template, CONTEXT_MARKER
+from app.prompt_generation import ContextBuilder, _get_tokenizer, count_tokens, summarise_tool_result
+
+
+def test_template_splits_static_prefix_from_context():
+    template = PromptTemplate("t", f"Static {{{{braces}}}}\n{CONTEXT_MARKER}\nClue: {{clue}}")
+    assert template.prefix == "Static {braces}"
+    assert template.fields == ("clue",)
+    assert template.render(clue="abc") == "Static {braces}\n\nClue: abc"
+    assert template.text.format(clue="abc") == template.render(clue="abc")
+
+
+def test_fields_in_prefix_are_rejected():
+    with pytest.raises(ValueError):
+        PromptTemplate("t", f"Clue: {{clue}}\n{CONTEXT_MARKER}\nmore")
+
+
+def test_node_prompts_share_their_prefix():
+    analyse = get_template("analyse_comp_prompt")
+    first = analyse.render(context="Cryptic crossword clue: 'a b'", guidance="", word="a")
+    second = analyse.render(context="Cryptic crossword clue: 'c d e'", guidance="Consider the givens.\n\n", word="d")
+    assert first.startswith(analyse.prefix) and second.startswith(analyse.prefix)
+    assert get_template("analyse_comp_prompt") is analyse
+    assert set(get_template("find_target_prompt").fields) == {
+        "clue_text", "indicator_text", "wordplay_type", "candidates_string", "context"
+    }
+
+
+def test_context_builder_truncates_lowest_priority_first():
+    builder = ContextBuilder(60)
+    builder.add(["Clue: 'Shredded corset for companion'"], priority=0)
+    builder.add([f"  {i}. previous analysis number {i}" for i in range(20)], priority=3, header="Previous:")
+    builder.add(["  anagrams: ESCORT, SECTOR"], priority=1, header="Tool Results:")
+    context = builder.build()
+
+    assert context.startswith("Clue:")
+    assert "Tool Results:\n  anagrams: ESCORT, SECTOR" in context
+    assert "more omitted)" in context
+    assert count_tokens(context) <= 60
+
+
+def test_tool_results_keep_top_items():
+    hits = ["TSCROE", "ESCORT", "SECTOR"] + [f"X{i}" for i in range(20)]
+    summary = summarise_tool_result(str(hits).replace("'", '"'), 2, {0: "E"})
+    assert summary.startswith('["ESCORT", "SECTOR"]')
+    assert "(top 2 of 23)" in summary
+
+
+def test_prompt_tokens_are_counted_by_the_tokenizer():
+    # Without tiktoken and its encoding every budget silently falls back to the length estimate
+    tokenizer = _get_tokenizer()
+    assert tokenizer is not None
+    assert count_tokens("Shredded corset for companion") == len(tokenizer.encode("Shredded corset for companion"))
@@ -0,0 +1,43 @@
+"""
+Tests for the SQLite-backed token bucket rate limiter.
+"""
+import pytest
+
+from app.rate_limiter import TokenBucketLimiter, RateLimitExceeded
+
+
+def test_requests_within_quota_are_not_queued(tmp_path):
+    limiter = TokenBucketLimiter(str(tmp_path / "limits.sqlite"), {"openai": (60, 0)}, max_wait=0.5)
+    for _ in range(60):
+        assert limiter.acquire("openai", "gpt-4o") < 0.1
+
+
+def test_caller_is_queued_until_bucket_refills(tmp_path):
+    # 6000 TPM refills 100 tokens a second
+    limiter = TokenBucketLimiter(str(tmp_path / "limits.sqlite"), {"openai": (0, 6000)}, max_wait=1)
+    limiter.acquire("openai", "gpt-4o", tokens=6000)
+    assert limiter.acquire("openai", "gpt-4o", tokens=10) >= 0.05
+
+
+def test_bounded_wait_raises(tmp_path):
+    limiter = TokenBucketLimiter(str(tmp_path / "limits.sqlite"), {"openai": (0, 1000)}, max_wait=0.1)
+    limiter.acquire("openai", "gpt-4o", tokens=1000)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("openai", "gpt-4o", tokens=500)
+
+
+def test_buckets_are_shared_between_limiters_and_separate_per_model(tmp_path):
+    db_path = str(tmp_path / "limits.sqlite")
+    worker_a = TokenBucketLimiter(db_path, {"openai": (0, 1000)}, max_wait=0.1)
+    worker_b = TokenBucketLimiter(db_path, {"openai": (0, 1000)}, max_wait=0.1)
+    worker_a.acquire("openai", "gpt-4o", tokens=1000)
+    with pytest.raises(RateLimitExceeded):
+        worker_b.acquire("openai", "gpt-4o", tokens=500)
+    worker_b.acquire("openai", "gpt-4o-mini", tokens=500)
+
+
+def test_adjust_refunds_unused_tokens(tmp_path):
+    limiter = TokenBucketLimiter(str(tmp_path / "limits.sqlite"), {"openai": (0, 1000)}, max_wait=0.1)
+    limiter.acquire("openai", "gpt-4o", tokens=1000)
+    limiter.adjust("openai", "gpt-4o", -600)
+    limiter.acquire("openai", "gpt-4o", tokens=500)
@@ -0,0 +1,29 @@
+"""
+Tests for choosing the next span of the clue to analyse.
+"""
+from app.span_scheduler import candidate_spans, choose_span
+from app.state import Attempt, CurrentAttempt, SpanIndex
+
+
+def _state(clue, definition=""):
+    words = clue.split()
+    return {
+        "clue_words": words,
+        "word_analyses": SpanIndex(len(words)),
+        "current_attempt": CurrentAttempt(Attempt(definition_part=definition), None,
+                                          list(range(len(words))), list(range(len(words))))
+    }
+
+
+def test_candidate_spans_are_runs_of_unresolved_words():
+    assert candidate_spans([0, 1, 3], max_words=3) == [(0, 0), (0, 1), (1, 1), (3, 3)]
+
+
+def test_multi_word_indicator_is_chosen_as_one_span():
+    assert choose_span(_state("We hear you got a sheep", definition="sheep")) == (0, 1)
+
+
+def test_link_words_are_chosen_last():
+    state = _state("Shredded corset for companion", definition="companion")
+    state["current_attempt"].remaining_word_idxs = [1, 2]
+    assert choose_span(state) == (1, 1)
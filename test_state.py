@@ -0,0 +1,109 @@
+"""
+Tests for the compact solver state and its conversion to the API dict shape.
+"""
+import json
+
+from app.state import SolverState, Attempt, SpanIndex, new_component, export_state
+from app.state_transformer import transform_state_to_ui_format, IncrementalUITransformer, apply_ui_delta
+
+
+def _solved_state():
+    clue = "Shredded corset for companion"
+    words = clue.split()
+    state = SolverState(
+        clue=clue, clue_words=words, target_length=6, given_letters={}, components=[],
+        word_analyses=SpanIndex(len(words)), solution_attempts=[], current_attempt=None,
+        max_attempts=3, final_solution=None, solved=True, stage="verify_solution",
+        tool_count=0, tool_limit=3, messages=[]
+    )
+    indicator = new_component(state, "Shredded", 0, 0, role="indicator", wordplay_type="anagram")
+    target = new_component(state, "corset", 1, 1, role="target", wordplay_type="anagram",
+                           result="ESCORT", targeted_by=indicator.id)
+    definition = new_component(state, "companion", 3, 3, role="definition", wordplay_type="synonym", result="ESCORT")
+    for comp in (indicator, target, definition):
+        state["word_analyses"].add(comp.start_pos, comp.end_pos, comp.id)
+
+    attempt = Attempt(solution="ESCORT", definition_part="companion",
+                      component_ids=[indicator.id, target.id, definition.id], clue_with_synonyms=list(words))
+    state["solution_attempts"].append(attempt)
+    state["final_solution"] = attempt
+    return state
+
+
+def test_span_index():
+    index = SpanIndex(3)
+    index.add(0, 1, 5)
+    index.add(0, 1, 7)
+    index.add(2, 2, 1)
+    assert index.get(0, 1) == [5, 7]
+    assert index.get(1, 1) == []
+    assert dict(index.spans()) == {(0, 1): [5, 7], (2, 2): [1]}
+
+
+def test_export_resolves_ids_to_nested_components():
+    exported = export_state(_solved_state())
+
+    target = exported["final_solution"]["wordplay_analysis"][1]
+    assert target["targeted_by"]["text"] == "Shredded"
+    assert target["targeted_by"] is exported["final_solution"]["wordplay_analysis"][0]
+    assert exported["word_analyses"][(3, 3)][0]["role"] == "definition"
+
+
+def test_exported_state_transforms_to_ui_format():
+    ui = transform_state_to_ui_format(export_state(_solved_state()))
+
+    components = ui["complete_solution"]["wordplay_components"]
+    assert components[0]["target"] == "corset"
+    assert components[0]["result"] == "ESCORT"
+
+
+def test_incremental_transformer_emits_only_changes():
+    state = _solved_state()
+    final = state["final_solution"]
+    state["final_solution"] = None
+    transformer = IncrementalUITransformer()
+
+    first = transformer.update(export_state(state))
+    assert [a["index"] for a in first["attempted_solutions"]] == [0]
+    ui = apply_ui_delta(None, first)
+
+    assert transformer.update(export_state(state)) == {"attempt_count": 1}
+
+    state["final_solution"] = final
+    state["components"][2].description = "Synonym of the answer"
+    second = transformer.update(export_state(state))
+    assert [a["index"] for a in second["attempted_solutions"]] == [0]
+    assert second["complete_solution"]["solution"] == "ESCORT"
+    assert [w["position"] for w in second["interactive_clue"]["word_mapping"]] == [0, 1, 2, 3]
+
+    ui = apply_ui_delta(ui, second)
+    assert ui == transform_state_to_ui_format(export_state(state))
+    assert ui["interactive_clue"]["word_mapping"][0]["related_positions"] == [1]
+
+
+def test_streamed_solve_deltas_rebuild_the_response(monkeypatch):
+    import app.api as api
+    from app import create_app
+    from config import Config
+
+    monkeypatch.setattr(Config, "WARMUP_ON_BOOT", False)
+    state = _solved_state()
+    final = state["final_solution"]
+
+    def fake_solution(clue, givens, length=None, solve_id=None, budget=None, on_progress=None):
+        state["final_solution"] = None
+        on_progress(export_state(state))
+        state["final_solution"] = final
+        on_progress(export_state(state))
+        return export_state(state)
+
+    monkeypatch.setattr(api, "get_llm_solution", fake_solution)
+    response = create_app().test_client().post("/api/submit_clue_stream", json={"clue": state["clue"]})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert [("delta" in line, "response" in line) for line in lines] == [(True, False), (True, False), (False, True)]
+    ui = None
+    for line in lines[:-1]:
+        ui = apply_ui_delta(ui, line["delta"])
+    assert lines[-1]["status"] == 200
+    assert ui == lines[-1]["response"]["solution"]
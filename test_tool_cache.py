@@ -0,0 +1,67 @@
+"""
+Tests for the tool cache.
+"""
+import time
+
+from app import metrics
+from app.tool_cache import TOOL_CACHE_POLICIES, CachePolicy, ToolCache, solve_scope
+
+
+class CountingTool:
+    def __init__(self, result=None):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self, word):
+        self.calls += 1
+        return self.result if self.result is not None else word.upper()
+
+
+def test_pure_results_are_shared_and_evicted_least_recently_used():
+    cache = ToolCache({"reverse": CachePolicy(pure=True, max_entries=2)})
+    reverse = CountingTool()
+    metrics.reset()
+
+    for word in ("ab", "cd", "ab", "ef", "cd"):
+        cache.call("reverse", {"word": word}, lambda: reverse(word))
+
+    assert reverse.calls == 4  # "cd" was evicted by "ef"
+    assert cache.stats()["reverse"] == {"hits": 1, "misses": 4, "bytes_saved": 2, "entries": 2}
+    counters = metrics.snapshot()["counters"]
+    assert counters["tool_cache_hits"] == 1 and counters["tool_cache_bytes_saved"] == 2
+
+
+def test_impure_results_expire_and_empty_ones_are_not_kept():
+    cache = ToolCache({"meanings": CachePolicy(ttl=0.2, max_entries=10, keep=bool)})
+    lookup = CountingTool()
+    cache.call("meanings", {"word": "a"}, lambda: lookup("a"))
+    cache.call("meanings", {"word": "a"}, lambda: lookup("a"))
+    assert lookup.calls == 1
+    time.sleep(0.3)
+    cache.call("meanings", {"word": "a"}, lambda: lookup("a"))
+    assert lookup.calls == 2
+
+    failing = CountingTool(result="")
+    cache.call("meanings", {"word": "b"}, lambda: failing("b"))
+    cache.call("meanings", {"word": "b"}, lambda: failing("b"))
+    assert failing.calls == 2
+
+
+def test_tools_without_a_policy_are_cached_within_a_solve_only():
+    cache = ToolCache({})
+    lookup = CountingTool()
+    with solve_scope():
+        cache.call("lookup", {"word": "a"}, lambda: lookup("a"))
+        cache.call("lookup", {"word": "a"}, lambda: lookup("a"))
+    with solve_scope():
+        cache.call("lookup", {"word": "a"}, lambda: lookup("a"))
+    cache.call("lookup", {"word": "a"}, lambda: lookup("a"))
+    assert lookup.calls == 3
+
+
+def test_lookups_of_a_word_in_any_case_share_a_result():
+    cache = ToolCache(TOOL_CACHE_POLICIES)
+    lookup = CountingTool(result={"meanings": ["a companion"]})
+    for word in ("escort", "Escort", " ESCORT"):
+        cache.call("get_meanings", {"word": word}, lambda: lookup(word))
+    assert lookup.calls == 1
@@ -0,0 +1,64 @@
+"""
+Tests for the concurrent tool executor.
+"""
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from app.tool_executor import ToolExecutor
+
+_running = {"now": 0, "max": 0}
+_lock = threading.Lock()
+
+
+@tool
+def slow_lookup(word: str) -> str:
+    """Look a word up slowly."""
+    with _lock:
+        _running["now"] += 1
+        _running["max"] = max(_running["max"], _running["now"])
+    time.sleep(0.3)
+    with _lock:
+        _running["now"] -= 1
+    return word.upper()
+
+
+@tool
+def hang(word: str) -> str:
+    """Never answer in time."""
+    time.sleep(2)
+    return word
+
+
+def _turn(*calls):
+    tool_calls = [{"name": name, "args": {"word": word}, "id": f"call_{i}"} for i, (name, word) in enumerate(calls)]
+    return {"messages": [AIMessage(content="", tool_calls=tool_calls)]}
+
+
+def test_calls_run_concurrently_and_return_in_order():
+    executor = ToolExecutor([slow_lookup], max_workers=4, limits={})
+    start = time.perf_counter()
+    messages = executor(_turn(("slow_lookup", "a"), ("slow_lookup", "b"), ("slow_lookup", "c")))["messages"]
+
+    assert time.perf_counter() - start < 0.6
+    assert [m.content for m in messages] == ["A", "B", "C"]
+    assert [m.tool_call_id for m in messages] == ["call_0", "call_1", "call_2"]
+
+
+def test_per_tool_limit_bounds_concurrency():
+    _running["max"] = 0
+    executor = ToolExecutor([slow_lookup], max_workers=4, limits={"slow_lookup": 1})
+    executor(_turn(("slow_lookup", "a"), ("slow_lookup", "b")))
+    assert _running["max"] == 1
+
+
+def test_failed_calls_become_error_messages():
+    executor = ToolExecutor([slow_lookup, hang], max_workers=4, limits={}, timeouts={"hang": 0.2})
+    start = time.perf_counter()
+    messages = executor(_turn(("hang", "a"), ("missing", "b"), ("slow_lookup", "c")))["messages"]
+
+    assert time.perf_counter() - start < 1
+    assert [m.status for m in messages] == ["error", "error", "success"]
+    assert "timed out" in messages[0].content and "not a valid tool" in messages[1].content
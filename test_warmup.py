@@ -0,0 +1,64 @@
+"""
+Tests for the background warm-up registry and readiness reporting.
+"""
+from app import warmup
+
+
+def test_readiness_reports_each_component():
+    warmup.register_warmup("test_ready", lambda: True)
+    warmup.register_warmup("test_disabled", lambda: False)
+    assert warmup.readiness()["components"]["test_ready"]["status"] == "pending"
+
+    warmup.run_warmup()
+
+    status = warmup.readiness()
+    assert status["components"]["test_ready"]["status"] == "ready"
+    assert status["components"]["test_disabled"]["status"] == "disabled"
+
+
+def test_failed_component_is_not_ready():
+    def broken():
+        raise RuntimeError("no lexicon")
+
+    warmup.register_warmup("test_broken", broken)
+    warmup.run_warmup()
+
+    status = warmup.readiness()
+    assert status["components"]["test_broken"]["status"] == "failed"
+    assert "no lexicon" in status["components"]["test_broken"]["error"]
+    assert status["ready"] is False
+
+
+def test_components_registered_while_warming_up_are_warmed_up():
+    warmup.register_warmup("test_loader", lambda: warmup.register_warmup("test_loaded", lambda: True))
+    warmup.run_warmup()
+
+    status = warmup.readiness()
+    assert status["components"]["test_loader"]["status"] == "ready"
+    assert status["components"]["test_loaded"]["status"] == "ready"
+
+
+def test_solver_that_fails_to_build_is_not_ready(monkeypatch):
+    import app.get_solution as get_solution
+    import app.langgraph_solver as langgraph_solver
+    from app import create_app
+    from config import Config
+
+    def broken_solver(api_key):
+        raise ValueError("bad model name")
+
+    monkeypatch.setattr(Config, "API_PROVIDER", "openai")
+    monkeypatch.setattr(Config, "WARMUP_ON_BOOT", False)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(langgraph_solver, "CrypticCrosswordSolver", broken_solver)
+    monkeypatch.setattr(get_solution, "_langgraph_solver", None)
+    monkeypatch.setattr(get_solution, "_solver_initialised", False)
+    monkeypatch.setattr(get_solution, "_solver_error", None)
+    monkeypatch.setitem(warmup._status, "solver", {"status": "pending"})
+    warmup.run_warmup()
+
+    response = create_app().test_client().get("/api/ready")
+    assert response.status_code == 503
+    assert response.json["ready"] is False
+    assert "bad model name" in response.json["errors"]["solver"]
+    assert response.json["components"]["solver"]["status"] == "failed"